@@ -1,8 +1,40 @@
+import json
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_weights(raw: str) -> dict:
+    """Parse "expert:6,pro:3,free:1" into {"expert": 6, "pro": 3, "free": 1}"""
+    weights = {}
+    for part in raw.split(","):
+        if ":" in part:
+            name, value = part.split(":", 1)
+            weights[name.strip()] = float(value)
+    return weights
+
+
+def _parse_routes(raw: str) -> dict:
+    """
+    LLM_ROUTES is JSON mapping a task name or agent role to
+    {"model", "temperature", "fallback"}; entries are merged over the defaults
+    """
+    default_model = os.getenv("GROQ_MODEL", "groq/llama-3.3-70b-versatile")
+    small_model = os.getenv("GROQ_SMALL_MODEL", "groq/llama-3.1-8b-instant")
+    routes = {
+        "default": {"model": default_model, "temperature": 0.7, "fallback": small_model},
+        # Short, formulaic outputs - an 8B model is plenty
+        "competitor_gaps": {"model": small_model, "temperature": 0.7, "fallback": default_model},
+        "roi_prediction": {"model": small_model, "temperature": 0.3, "fallback": default_model},
+    }
+    if raw:
+        for name, route in json.loads(raw).items():
+            routes[name] = {**routes.get(name, {}), **route}
+    return routes
+
+
 class Settings:
     PROJECT_NAME: str = "AgentForge"
     VERSION: str = "2.0.0-production"
@@ -25,6 +57,101 @@ class Settings:
     # AI & API Keys
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     SERPAPI_KEY: str = os.getenv("SERPAPI_KEY", "")
+    GROQ_MODEL: str = os.getenv("GROQ_MODEL", "groq/llama-3.3-70b-versatile")
+    LLM_ROUTES: dict = _parse_routes(os.getenv("LLM_ROUTES", ""))
+    LLM_CONTEXT_WINDOW: int = int(os.getenv("LLM_CONTEXT_WINDOW", "131072"))
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+    # Provider output mode for crew tasks: "json_object" (Groq JSON mode, every model),
+    # "json_schema" (schema-constrained, only some Groq models) or "off" (prose + parsing)
+    LLM_STRUCTURED_OUTPUT: str = os.getenv("LLM_STRUCTURED_OUTPUT", "json_object").lower()
+    
+    # Shared HTTP connection pool for LLM calls (per process)
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+    LLM_HTTP_MAX_KEEPALIVE: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "16"))
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))  # seconds idle
+    LLM_HTTP_CONNECT_TIMEOUT: float = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+    LLM_HTTP_WARM_CONNECTIONS: int = int(os.getenv("LLM_HTTP_WARM_CONNECTIONS", "3"))  # opened at startup
+    
+    # Circuit breaker around Groq, failing over to a secondary OpenAI-compatible endpoint
+    BREAKER_WINDOW: int = int(os.getenv("BREAKER_WINDOW", "20"))              # recent calls considered
+    BREAKER_MIN_CALLS: int = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+    BREAKER_ERROR_RATE: float = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))  # failed or slow share that opens it
+    BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "30"))
+    BREAKER_OPEN_SECONDS: float = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    LLM_FALLBACK_BASE_URL: str = os.getenv("LLM_FALLBACK_BASE_URL", "")  # e.g. http://localhost:11434/v1
+    LLM_FALLBACK_API_KEY: str = os.getenv("LLM_FALLBACK_API_KEY", "")
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", "llama3.1:8b")
+    
+    # Cluster-wide Groq budget (token buckets in Redis, shared by all workers)
+    GROQ_RPM_LIMIT: int = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+    GROQ_TPM_LIMIT: int = int(os.getenv("GROQ_TPM_LIMIT", "12000"))
+    LLM_COMPLETION_TOKEN_ESTIMATE: int = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "1500"))
+    LLM_BUDGET_MAX_WAIT: int = int(os.getenv("LLM_BUDGET_MAX_WAIT", "120"))
+    
+    # LLM response cache (shared across crew runs)
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "auto")  # auto, redis, disk, off
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "604800"))
+    LLM_CACHE_DIR: str = os.getenv("LLM_CACHE_DIR", ".cache/llm")
+    LLM_CACHE_MAX_BYTES: int = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    
+    # Crew Execution
+    CREW_EXECUTOR: str = os.getenv("CREW_EXECUTOR", "thread")  # "thread" or "process"
+    CREW_MAX_CONCURRENCY: int = int(os.getenv("CREW_MAX_CONCURRENCY", "4"))
+    
+    # Job Queue & Worker
+    JOB_VISIBILITY_TIMEOUT: int = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))  # seconds
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_TTL_SECONDS: int = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "2"))
+    
+    # Strategy cache (stale-while-revalidate)
+    STRATEGY_CACHE_SOFT_TTL: int = int(os.getenv("STRATEGY_CACHE_SOFT_TTL", "86400"))     # serve fresh
+    STRATEGY_CACHE_HARD_TTL: int = int(os.getenv("STRATEGY_CACHE_HARD_TTL", "604800"))    # serve stale + refresh
+    STRATEGY_REVALIDATE_COOLDOWN: int = int(os.getenv("STRATEGY_REVALIDATE_COOLDOWN", "300"))
+    LOCAL_CACHE_MAX_BYTES: int = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    LOCAL_CACHE_TTL: int = int(os.getenv("LOCAL_CACHE_TTL", "300"))
+    
+    # Lite mode (one LLM call instead of the crew) for these tiers unless ?mode= says otherwise
+    LITE_MODE_TIERS: list = [t.strip() for t in os.getenv("LITE_MODE_TIERS", "free").split(",") if t.strip()]
+    
+    # Crew stage scheduling (tasks run as a DAG over their context= dependencies)
+    CREW_STAGE_CONCURRENCY: int = int(os.getenv("CREW_STAGE_CONCURRENCY", "3"))
+    CREW_RELAX_OPTIONAL_EDGES: bool = os.getenv("CREW_RELAX_OPTIONAL_EDGES", "false").lower() == "true"
+    CREW_CONTEXT_COMPACTION: bool = os.getenv("CREW_CONTEXT_COMPACTION", "true").lower() == "true"
+    CREW_TASK_RETRIES: int = int(os.getenv("CREW_TASK_RETRIES", "3"))  # per task, transient Groq errors only
+    CREW_RETRY_BASE_DELAY: float = float(os.getenv("CREW_RETRY_BASE_DELAY", "1.0"))
+    CREW_RETRY_MAX_DELAY: float = float(os.getenv("CREW_RETRY_MAX_DELAY", "20"))
+    CREW_REQUEST_DEADLINE: int = int(os.getenv("CREW_REQUEST_DEADLINE", "180"))  # seconds per generation
+    CREW_VERBOSE: bool = os.getenv("CREW_VERBOSE", "false").lower() == "true"  # CrewAI step-by-step logging
+    
+    # How long POST /api/strategy waits before answering with partial results
+    # (X-Request-Deadline header > TIER_DEADLINES > REQUEST_DEADLINE_DEFAULT; unset or 0 = no limit)
+    REQUEST_DEADLINE_DEFAULT: Optional[float] = float(os.getenv("REQUEST_DEADLINE_DEFAULT")) \
+        if os.getenv("REQUEST_DEADLINE_DEFAULT") else None
+    TIER_DEADLINES: dict = _parse_weights(os.getenv("TIER_DEADLINES", ""))
+    DRAFT_POLL_INTERVAL: float = float(os.getenv("DRAFT_POLL_INTERVAL", "1.0"))  # /strategy/{id}/events
+    SECTION_REPAIR_ATTEMPTS: int = int(os.getenv("SECTION_REPAIR_ATTEMPTS", "1"))  # re-asks per invalid section
+    
+    # Per-stage crew output cache (personas, gaps, ... reused across goals)
+    STAGE_CACHE_ENABLED: bool = os.getenv("STAGE_CACHE_ENABLED", "true").lower() == "true"
+    STAGE_CACHE_TTL: int = int(os.getenv("STAGE_CACHE_TTL", "604800"))
+    CHECKPOINT_TTL: int = int(os.getenv("CHECKPOINT_TTL", "3600"))  # finished tasks of an in-progress job
+    
+    # Near-duplicate brief matching (MinHash/LSH over goal + audience)
+    NEAR_DUP_ENABLED: bool = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+    NEAR_DUP_THRESHOLD: float = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))  # estimated Jaccard
+    NEAR_DUP_MAX_CANDIDATES: int = int(os.getenv("NEAR_DUP_MAX_CANDIDATES", "50"))
+    MINHASH_PERMUTATIONS: int = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+    LSH_BANDS: int = int(os.getenv("LSH_BANDS", "16"))
+    
+    # Single-flight coalescing of identical concurrent generations
+    SINGLEFLIGHT_LOCK_TTL: int = int(os.getenv("SINGLEFLIGHT_LOCK_TTL", "90"))  # seconds, renewed while running
+    SINGLEFLIGHT_WAIT_TIMEOUT: int = int(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", "180"))
+    SINGLEFLIGHT_POLL_INTERVAL: float = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "0.5"))
+    
+    # Scheduling priority per tier (higher = served first; 0 = only when others are idle)
+    TIER_WEIGHTS: dict = _parse_weights(os.getenv("TIER_WEIGHTS", "expert:6,pro:3,free:1"))
     
     # Payments
     RAZORPAY_KEY_ID: str = os.getenv("RAZORPAY_KEY_ID", "")
@@ -7,6 +7,9 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from app.core.config import settings
 from app.routers import auth, strategy, health
+from app.services.cache import start_cache_invalidation_listener
+from app.services.executor import shutdown_crew_executor
+from app.services.http import warm_up_llm_connections, close_http_clients
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address, default_limits=[f"{settings.RATE_LIMIT_PER_MINUTE}/minute"])
@@ -18,6 +21,7 @@ app = FastAPI(
 )
 
 # Startup Logging
+import asyncio
 import logging
 from datetime import datetime
 
@@ -37,6 +41,13 @@ async def startup_event():
         logger.warning("⚠️  CrewAI Status: DISABLED (Missing GROQ_API_KEY)")
         logger.warning("    -> App will use DEMO MODE for strategy generation.")
 
+    logger.info(f"⚙️  Crew Executor: {settings.CREW_EXECUTOR} pool, max {settings.CREW_MAX_CONCURRENCY} concurrent")
+    start_cache_invalidation_listener()
+
+    # Open Groq connections now so the first strategy doesn't pay the TLS handshake
+    if settings.GROQ_API_KEY and settings.CREW_EXECUTOR == "thread":
+        await asyncio.get_running_loop().run_in_executor(None, warm_up_llm_connections)
+
     # Admin Key Status
     if settings.ADMIN_SECRET and settings.ADMIN_SECRET != "agentforge-admin-2026-change-now":
         logger.info("🔒  Admin Security: CONFIGURED")
@@ -47,6 +58,11 @@ async def startup_event():
         
     logger.info("================================================================")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_crew_executor()
+    await close_http_clients()
+
 # Add rate limiter to app
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -84,7 +84,7 @@ class StrategicGuidance(BaseModel):
     """Execution guidance (WHAT/HOW/WHERE/WHY/WHEN)"""
     what_to_do: List[str] = Field(..., description="5-7 specific content types to create")
     how_to_do_it: List[str] = Field(..., description="5-7 tactical execution tips")
-    where_to_post: Dict = Field(..., description="Platform-specific posting locations")
+    where_to_post: Dict = Field(default_factory=dict, description="Platform-specific posting locations")
     when_to_post: Dict = Field(..., description="Timing strategy (days/times/frequency)")
     what_to_focus_on: List[str] = Field(..., description="5 key success metrics")
     why_it_works: List[str] = Field(..., description="5 psychological/strategic reasons")
@@ -135,6 +135,25 @@ class ContentStrategy(BaseModel):
         }
 
 
+# Crew task outputs (response_model of each task). JSON mode needs an object at
+# the root, so list sections are wrapped in a key named after the section
+class PersonasOutput(BaseModel):
+    personas: List[PersonaModel]
+
+
+class CompetitorGapsOutput(BaseModel):
+    competitor_gaps: List[CompetitorGap]
+
+
+class KeywordsOutput(BaseModel):
+    keywords: List[KeywordModel]
+
+
+class CalendarOutput(BaseModel):
+    calendar: List[CalendarItem]
+    sample_posts: List[SamplePost]
+
+
 class StrategyResponse(BaseModel):
     """API response wrapper"""
     success: bool
@@ -1,6 +1,14 @@
 from fastapi import APIRouter
 from app.core.database import mongo_client, REDIS_ENABLED
 from app.core.config import settings
+from app.services.cache import get_cache_stats
+from app.services.executor import get_executor_stats
+from app.services.queue import get_queue_depth
+from app.services.llm import get_llm_cache_stats, get_token_stats
+from app.services.ratelimit import get_budget_stats
+from app.services.retry import get_retry_stats
+from app.services.breaker import get_breaker_stats
+from app.services.repair import get_parse_stats
 from datetime import datetime, timezone
 
 router = APIRouter(tags=["Health"])
@@ -18,5 +26,14 @@ async def health_check():
         "database": db_status,
         "redis": "healthy" if REDIS_ENABLED else "disabled",
         "crewai": "enabled" if settings.GROQ_API_KEY else "demo mode",
+        "crew_executor": get_executor_stats(),
+        "queue_depth": get_queue_depth() if REDIS_ENABLED else None,
+        "cache": get_cache_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "llm_tokens": get_token_stats(),
+        "groq_budget": get_budget_stats(),
+        "crew_retries": get_retry_stats(),
+        "llm_breakers": get_breaker_stats(),
+        "crew_parsing": get_parse_stats(),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
@@ -1,18 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from app.models.schemas import StrategyInput, StrategyResponse, HistoryResponse
 from app.core.security import get_current_user
-from app.core.database import strategies_collection, redis_client, REDIS_ENABLED, db
+from app.core.database import strategies_collection, REDIS_ENABLED, db
+from app.services.cache import (
+    generate_cache_key, get_cache_entry, get_cached_strategy, set_cached_strategy, claim_revalidation,
+    find_near_duplicate
+)
+from app.services.crew import SECTION_ORDER
+from app.services.executor import run_in_crew_executor, make_progress_queue
 from app.core.config import settings
-from app.services.logic import generate_experience_based_strategy, generate_demo_strategy
-from app.services.crew import create_content_strategy_crew
+from app.services.pipeline import (
+    build_strategy, build_draft, is_cacheable, save_strategy, update_strategy, mark_strategy_failed,
+    get_strategy_status, resolve_mode
+)
+from app.services.queue import enqueue_job, get_job
+from app.services.singleflight import run_once
 from datetime import datetime, timedelta, timezone
-import hashlib
+from queue import Empty
+from typing import Awaitable, Callable, Optional
+import asyncio
 import json
 import time
 from bson import ObjectId
 
 router = APIRouter(prefix="/api", tags=["Strategy"])
 
+# Strong references to fire-and-forget generation tasks
+_background_tasks = set()
+
+# cache key -> future of the final (strategy, message, generation_time) for a run
+# that handed out a deadline-partial result and keeps going in the background.
+# Single-flight followers that received that partial attach to it.
+_pending_upgrades = {}
+UPGRADE_LINGER_SECONDS = 60  # followers look it up right after the partial is handed out
+
 # ============================================================================
 # RATE LIMITING HELPERS
 # ============================================================================
@@ -67,128 +89,293 @@ def check_rate_limit(user_id: str, tier: str = "free") -> dict:
         "limit": limit
     }
 
+
 # ============================================================================
-# CACHING UTILITIES
+# GENERATION HELPERS
 # ============================================================================
 
-def generate_cache_key(strategy_input: StrategyInput) -> str:
-    version = "v2"
-    input_str = f"{version}|{strategy_input.goal}|{strategy_input.audience}|{strategy_input.industry}|{strategy_input.platform}|{strategy_input.contentType}|{strategy_input.experience}"
-    return hashlib.md5(input_str.encode()).hexdigest()
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
-def get_cached_strategy(cache_key: str):
-    if not REDIS_ENABLED:
+
+def _leader_upgrade(cache_key: str, strategy_dict: dict, coalesced: bool) -> Optional[asyncio.Future]:
+    """Background completion of the leader's run, if this follower was handed its partial result"""
+    if not coalesced or not strategy_dict.get("provisional_sections"):
         return None
+    return _pending_upgrades.get(cache_key)
+
+
+def _forget_upgrade(cache_key: str, final: asyncio.Future):
+    if _pending_upgrades.get(cache_key) is final:
+        del _pending_upgrades[cache_key]
+
+
+async def _follow_upgrade(upgrade: asyncio.Future, strategy_id: str):
+    """Replace a follower's saved partial strategy once the leader's run completes"""
     try:
-        cached = redis_client.get(f"strategy:{cache_key}")
-        return json.loads(cached) if cached else None
-    except:
+        final_dict, final_message, final_time = await asyncio.shield(upgrade)
+    except Exception as e:
+        print(f"[WARNING] Background completion for {strategy_id} failed: {e}")
+        return
+    update_strategy(strategy_id, final_dict, final_time, status="complete", message=final_message,
+                    provisional_sections=final_dict.get("provisional_sections", []))
+    print(f"⬆️ [DEADLINE] Coalesced strategy {strategy_id} upgraded ({final_time:.2f}s)")
+
+
+def resolve_deadline(header_seconds: Optional[float], tier: str) -> Optional[float]:
+    """
+    Seconds the client will wait: X-Request-Deadline header, else the tier's
+    TIER_DEADLINES entry, else REQUEST_DEADLINE_DEFAULT. The first one that is set
+    wins, so an explicit 0 means unbounded (None) rather than "use the next one".
+    """
+    if header_seconds is not None:
+        seconds = header_seconds
+    elif tier in settings.TIER_DEADLINES:
+        seconds = settings.TIER_DEADLINES[tier]
+    else:
+        seconds = settings.REQUEST_DEADLINE_DEFAULT
+    return seconds if seconds is not None and seconds > 0 else None
+
+
+async def _generate_and_cache(strategy_input: StrategyInput, cache_key: str,
+                              tier: str, user_id: str = None, mode: str = "full",
+                              deadline_at: Optional[float] = None,
+                              on_upgrade: Optional[Callable[[dict, str, float], Awaitable]] = None) -> tuple[dict, str, float]:
+    """
+    Run the pipeline on the crew executor and cache a successful result.
+
+    Past `deadline_at` (epoch seconds) the result is partial, with provisional
+    sections. If `on_upgrade` is given the crew keeps running instead: the partial
+    strategy is returned at the deadline and on_upgrade(strategy, message,
+    generation_time) is awaited once the final one is cached.
+    """
+    start_time = time.time()
+    progress = make_progress_queue() if on_upgrade and deadline_at else None
+    job = asyncio.ensure_future(run_in_crew_executor(
+        build_strategy, strategy_input, progress.put if progress else None, mode, None,
+        deadline_at, progress is not None, tier=tier, user_id=user_id
+    ))
+
+    async def finish() -> tuple[dict, str, float]:
+        strategy_dict, message = await job
+        generation_time = time.time() - start_time
+        if is_cacheable(message):
+            set_cached_strategy(cache_key, strategy_dict, strategy_input=strategy_input, mode=mode)
+        return strategy_dict, message, generation_time
+
+    async def upgrade(final: asyncio.Future):
+        try:
+            result = await finish()
+            final.set_result(result)
+            await on_upgrade(*result)
+        except Exception as e:
+            if not final.done():
+                final.set_exception(e)
+                final.exception()  # mark retrieved when no follower is waiting
+            print(f"[WARNING] Background completion failed for {cache_key}: {e}")
+        finally:
+            asyncio.get_running_loop().call_later(UPGRADE_LINGER_SECONDS, _forget_upgrade, cache_key, final)
+
+    while progress is not None and not job.done():
+        try:
+            kind, _, fields = progress.get_nowait()
+        except Empty:
+            await asyncio.sleep(0.1)
+            continue
+        if kind == "partial":
+            final = asyncio.get_running_loop().create_future()
+            _pending_upgrades[cache_key] = final
+            _spawn(upgrade(final))
+            return fields["strategy"], fields["message"], time.time() - start_time
+    return await finish()
+
+
+def _load_shared(cache_key: str):
+    """Result produced by a concurrent identical request (single-flight follower)"""
+    shared = get_cached_strategy(cache_key)
+    if shared is None:
         return None
+    return shared, "Strategy generated by a concurrent identical request", 0.0
 
-def set_cached_strategy(cache_key: str, strategy: dict, ttl: int = 86400):
-    if not REDIS_ENABLED:
-        return
-    try:
-        redis_client.setex(f"strategy:{cache_key}", ttl, json.dumps(strategy))
-    except:
-        pass
+
+def _schedule_revalidation(strategy_input: StrategyInput, cache_key: str, tier: str, mode: str = "full"):
+    """Refresh a stale cache entry in the background (at most once per cooldown, cluster-wide)"""
+    if not claim_revalidation(cache_key):
+        return False
+
+    async def revalidate():
+        try:
+            await run_once(cache_key,
+                           lambda: _generate_and_cache(strategy_input, cache_key, tier, mode=mode),
+                           lambda: _load_shared(cache_key))
+            print(f"♻️ [CACHE] Revalidated stale strategy {cache_key}")
+        except Exception as e:
+            print(f"[WARNING] Background revalidation failed for {cache_key}: {e}")
+
+    _spawn(revalidate())
+    return True
+
+
+def _serve_draft(strategy_input: StrategyInput, cache_key: str, tier: str, user_id: str,
+                 mode: str, rate_info: dict) -> dict:
+    """
+    Speculative response: save and return the deterministic draft right away, then
+    run the crew in the background and replace the draft in Mongo (and the cache)
+    """
+    draft = build_draft(strategy_input)
+    message = "📝 Draft strategy - the AI version replaces it when ready"
+    strategy_id = save_strategy(user_id, strategy_input, draft, cache_key, 0.0, mode=mode,
+                                provisional_sections=draft["provisional_sections"],
+                                status="draft", message=message)
+
+    async def replace_draft():
+        try:
+            (final_dict, final_message, final_time), coalesced = await run_once(
+                cache_key,
+                lambda: _generate_and_cache(strategy_input, cache_key, tier, user_id, mode),
+                lambda: _load_shared(cache_key)
+            )
+            # Coalesced onto a run that returned at its deadline: wait for its final result
+            upgrade = _leader_upgrade(cache_key, final_dict, coalesced)
+            if upgrade is not None:
+                final_dict, final_message, final_time = await asyncio.shield(upgrade)
+            update_strategy(strategy_id, final_dict, final_time, status="complete", message=final_message,
+                            provisional_sections=final_dict.get("provisional_sections", []))
+            print(f"⬆️ [DRAFT] Strategy {strategy_id} upgraded ({final_time:.2f}s)")
+        except Exception as e:
+            print(f"❌ [DRAFT] Generation for {strategy_id} failed: {e}")
+            mark_strategy_failed(strategy_id, str(e))
+
+    _spawn(replace_draft())
+    return {
+        "success": True,
+        "strategy": draft,
+        "strategy_id": strategy_id,
+        "cached": False,
+        "draft": True,
+        "mode": mode,
+        "provisional_sections": draft["provisional_sections"],
+        "finishing_in_background": True,
+        "status_url": f"/api/strategy/{strategy_id}/status",
+        "events_url": f"/api/strategy/{strategy_id}/events",
+        "generation_time": 0.0,
+        "message": message,
+        "usage": rate_info,
+        "tier": tier
+    }
 
 
 @router.post("/strategy")
 async def generate_strategy(
     strategy_input: StrategyInput,
+    mode: str = Query(None, pattern="^(full|lite)$", description="full: 6-agent crew, lite: single LLM call (default depends on tier)"),
+    background: bool = Query(False, description="At the deadline, return the partial strategy and finish the provisional sections in the background"),
+    speculative: bool = Query(False, description="Return a deterministic draft immediately; the AI strategy replaces it when ready"),
+    x_request_deadline: Optional[float] = Header(None, ge=0, description="Seconds the client will wait for a result (0 = no deadline)"),
     current_user: dict = Depends(get_current_user)
 ):
     user_id = current_user["id"]
     tier = current_user.get("tier", "free")
+    mode = resolve_mode(mode, tier)
+    request_start = time.time()
+    deadline = resolve_deadline(x_request_deadline, tier)
+    deadline_at = request_start + deadline if deadline else None
     
     # Rate Limiting
     rate_info = check_rate_limit(user_id, tier)
     if rate_info["exceeded"]:
         raise HTTPException(status_code=429, detail=rate_info)
     
-    # Check cache
-    cache_key = generate_cache_key(strategy_input)
-    cached_strategy = get_cached_strategy(cache_key)
+    # Check cache (stale entries are served instantly and refreshed in the background)
+    cache_key = generate_cache_key(strategy_input, mode)
+    cache_entry = get_cache_entry(cache_key)
     
-    if cached_strategy:
+    if cache_entry:
+        revalidating = _schedule_revalidation(strategy_input, cache_key, tier, mode) if cache_entry["stale"] else False
         return {
             "success": True,
-            "strategy": cached_strategy,
+            "strategy": cache_entry["strategy"],
             "cached": True,
+            "approximate": False,
+            "stale": cache_entry["stale"],
+            "revalidating": revalidating,
+            "cache_age": cache_entry["age"],
+            "mode": mode,
             "generation_time": 0.0,
-            "message": "Strategy retrieved from cache"
+            "message": "Strategy retrieved from cache" + (" (refreshing in background)" if revalidating else "")
         }
     
-    # Generate Strategy
-    start_time = time.time()
-    
-    # 1. Blueprint Logic
-    blueprint_input = strategy_input.dict()
-    blueprint_input["topic"] = strategy_input.goal[:50]
-    blueprint_html, sample_posts = generate_experience_based_strategy(blueprint_input)
-    
-    # 2. AI Logic
-    if settings.GROQ_API_KEY:
-        try:
-            print(f"🤖 [CREWAI] Starting Strategy Generation for: {strategy_input.goal}")
-            print(f"via Agent Crew (Model: Llama-3.3-70B)")
-            strategy_dict = create_content_strategy_crew(strategy_input)
-            message = "Strategy generated successfully"
-            print(f"✅ [CREWAI] Generation Complete! (Time: {time.time() - start_time:.2f}s)")
-        except Exception as e:
-            print(f"❌ [CREWAI] Error: {str(e)}")
-            print("⚠️ [FALLBACK] Switching to Demo Mode...")
-            strategy_dict = generate_demo_strategy(strategy_input)
-            message = f"⚠️ CrewAI error, using demo: {str(e)}"
-    else:
-        print("⚠️ [DEMO MODE] No Groq API Key found. Using demo strategy.")
-        strategy_dict = generate_demo_strategy(strategy_input)
-        message = "⚠️ DEMO MODE: No Groq API Key found"
-    
-    # 3. Merge - KEEP ALL CrewAI data!
-    strategy_dict["tactical_blueprint"] = blueprint_html
-    strategy_dict["sample_posts"] = sample_posts
-    
-    generation_time = time.time() - start_time
-    
-    # Cache result
-    if "CrewAI error" not in message:
-        set_cached_strategy(cache_key, strategy_dict)
+    # Near-identical brief (same industry/platform/format) already generated?
+    similar_entry = find_near_duplicate(strategy_input, mode)
+    if similar_entry:
+        return {
+            "success": True,
+            "strategy": similar_entry["strategy"],
+            "cached": True,
+            "approximate": True,
+            "similarity": similar_entry["similarity"],
+            "stale": False,
+            "cache_age": similar_entry["age"],
+            "mode": mode,
+            "generation_time": 0.0,
+            "message": f"Strategy retrieved from cache (matched a {similar_entry['similarity']:.0%} similar brief)"
+        }
     
-    # Use FULL strategy_dict - NO data loss!
-    clean_strategy = strategy_dict.copy()
+    if speculative:
+        return _serve_draft(strategy_input, cache_key, tier, user_id, mode, rate_info)
 
-    # Save to MongoDB
-    strategy_doc = {
-        "user_id": user_id,
-        "goal": strategy_input.goal,
-        "audience": strategy_input.audience,
-        "industry": strategy_input.industry,
-        "platform": strategy_input.platform,
-        "output_data": clean_strategy,
-        "cache_key": cache_key,
-        "generation_time": int(generation_time),
-        "created_at": datetime.now(timezone.utc)
-    }
-    result = strategies_collection.insert_one(strategy_doc)
+    # Finishing in the background updates the saved strategy once the crew is done
+    strategy_id_ready = asyncio.get_running_loop().create_future()
+
+    async def upgrade_saved(final_dict: dict, final_message: str, final_time: float):
+        update_strategy(await strategy_id_ready, final_dict, final_time, status="complete", message=final_message,
+                        provisional_sections=final_dict.get("provisional_sections", []))
+        print(f"⬆️ [DEADLINE] Provisional strategy {cache_key} upgraded ({final_time:.2f}s)")
+
+    # Generate Strategy (blueprint + crew) off the event loop.
+    # Identical concurrent briefs share a single crew run (single-flight).
+    try:
+        (strategy_dict, message, generation_time), coalesced = await run_once(
+            cache_key,
+            lambda: _generate_and_cache(strategy_input, cache_key, tier, user_id, mode,
+                                        deadline_at, upgrade_saved if background else None),
+            lambda: _load_shared(cache_key)
+        )
+    except asyncio.CancelledError:
+        # Client went away: the shared run carries on for any followers, but this
+        # request never saves a strategy, so there is nothing to upgrade
+        strategy_id_ready.cancel()
+        raise
+    provisional_sections = strategy_dict.get("provisional_sections", [])
+    # A follower handed the leader's partial result is upgraded along with the leader
+    upgrade = _leader_upgrade(cache_key, strategy_dict, coalesced)
+    finishing = bool(provisional_sections) and (background and not coalesced or upgrade is not None)
     
-    # Increment Redis Usage
-    if REDIS_ENABLED:
-        try:
-            current_month = datetime.now().strftime("%Y-%m")
-            count_key = f"strategy_count:{user_id}:{current_month}"
-            current_val = redis_client.get(count_key)
-            new_count = int(current_val) + 1 if current_val else 1
-            redis_client.setex(count_key, 86400, new_count)
-        except Exception as e:
-            print(f"[WARNING] Failed to increment usage: {e}")
+    # Save to MongoDB
+    try:
+        strategy_id = save_strategy(user_id, strategy_input, strategy_dict, cache_key, generation_time,
+                                    mode=mode, provisional_sections=provisional_sections,
+                                    status="draft" if finishing else "complete", message=message)
+    except Exception:
+        strategy_id_ready.cancel()
+        raise
+    strategy_id_ready.set_result(strategy_id)
+    if upgrade is not None:
+        _spawn(_follow_upgrade(upgrade, strategy_id))
 
-    # Return flattened data for frontend (clean_strategy already has all fields at top level)
+    # Return flattened data for frontend (strategy_dict already has all fields at top level)
     return {
         "success": True,
-        "strategy": clean_strategy,  # Already flattened with ALL 6 modes!
+        "strategy": strategy_dict,  # Already flattened with ALL 6 modes!
+        "strategy_id": strategy_id,
         "cached": False,
+        "coalesced": coalesced,
+        "mode": mode,
+        "provisional_sections": provisional_sections,
+        "finishing_in_background": finishing,
         "generation_time": generation_time,
         "message": message,
         "usage": rate_info,
@@ -196,6 +383,190 @@ async def generate_strategy(
     }
 
 
+@router.post("/strategy/stream")
+async def stream_strategy_generation(
+    strategy_input: StrategyInput,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate a strategy and stream progress with Server-Sent Events.
+    Each crew section (personas, gaps, guidance, keywords, calendar, ROI) is
+    pushed the moment its task finishes, followed by the complete strategy.
+    """
+    user_id = current_user["id"]
+    tier = current_user.get("tier", "free")
+
+    rate_info = check_rate_limit(user_id, tier)
+    if rate_info["exceeded"]:
+        raise HTTPException(status_code=429, detail=rate_info)
+
+    cache_key = generate_cache_key(strategy_input)
+    cached_strategy = get_cached_strategy(cache_key)
+    if cached_strategy is None:
+        similar_entry = find_near_duplicate(strategy_input)
+        cached_strategy = similar_entry["strategy"] if similar_entry else None
+    progress = make_progress_queue()
+
+    async def generate_and_store():
+        start_time = time.time()
+        strategy_dict, message = await run_in_crew_executor(
+            build_strategy, strategy_input, progress.put, tier=tier, user_id=user_id
+        )
+        generation_time = time.time() - start_time
+        if is_cacheable(message):
+            set_cached_strategy(cache_key, strategy_dict, strategy_input=strategy_input)
+        save_strategy(user_id, strategy_input, strategy_dict, cache_key, generation_time)
+        return strategy_dict, message, generation_time
+
+    def sse(payload: dict) -> str:
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def event_generator():
+        if cached_strategy:
+            yield sse({"status": "complete", "cached": True, "progress": 100, "strategy": cached_strategy})
+            return
+
+        yield sse({"status": "starting", "sections": SECTION_ORDER, "progress": 0})
+
+        # Runs to completion (and is saved) even if the client disconnects
+        job = _spawn(generate_and_store())
+
+        completed = 0
+        while True:
+            try:
+                kind, section, fields = progress.get_nowait()
+            except Empty:
+                if job.done():
+                    break
+                await asyncio.sleep(0.1)
+                continue
+            if kind == "item":
+                # One persona / keyword / calendar entry, streamed before its section completes
+                yield sse({"status": "item", "section": section, "path": fields["path"],
+                           "index": fields["index"], "data": fields["item"]})
+                continue
+            completed += 1
+            yield sse({
+                "status": "section",
+                "section": section,
+                "data": fields,
+                "progress": int(completed * 100 / len(SECTION_ORDER))
+            })
+
+        try:
+            strategy_dict, message, generation_time = await job
+            yield sse({
+                "status": "complete",
+                "cached": False,
+                "progress": 100,
+                "strategy": strategy_dict,
+                "message": message,
+                "generation_time": generation_time,
+                "usage": rate_info,
+                "tier": tier
+            })
+        except Exception as e:
+            yield sse({"status": "error", "message": f"Error: {str(e)}"})
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============================================================================
+# QUEUED GENERATION (consumed by `python -m app.worker`)
+# ============================================================================
+
+@router.post("/strategy/queue")
+async def queue_strategy_generation(
+    strategy_input: StrategyInput,
+    current_user: dict = Depends(get_current_user)
+):
+    """Enqueue a strategy generation and return a job_id to poll"""
+    if not REDIS_ENABLED:
+        raise HTTPException(status_code=503, detail="Job queue unavailable (Redis disabled)")
+
+    user_id = current_user["id"]
+    tier = current_user.get("tier", "free")
+
+    rate_info = check_rate_limit(user_id, tier)
+    if rate_info["exceeded"]:
+        raise HTTPException(status_code=429, detail=rate_info)
+
+    cache_key = generate_cache_key(strategy_input)
+    cached_strategy = get_cached_strategy(cache_key)
+    if cached_strategy is None:
+        similar_entry = find_near_duplicate(strategy_input)
+        cached_strategy = similar_entry["strategy"] if similar_entry else None
+    if cached_strategy:
+        return {
+            "job_id": None,
+            "status": "complete",
+            "cached": True,
+            "strategy": cached_strategy,
+            "usage": rate_info
+        }
+
+    job_id = enqueue_job(user_id, strategy_input, tier)
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "usage": rate_info,
+        "message": f"Strategy generation queued. Poll /api/strategy/queue/{job_id} for status"
+    }
+
+
+@router.get("/strategy/queue/{job_id}")
+async def get_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = get_job(job_id)
+    if not job or job.get("user_id") != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+# ============================================================================
+# DRAFT / BACKGROUND COMPLETION STATUS
+# ============================================================================
+
+@router.get("/strategy/{strategy_id}/status")
+async def get_generation_status(strategy_id: str, current_user: dict = Depends(get_current_user)):
+    """draft -> complete (or failed) for speculative and background-finished strategies"""
+    status_doc = get_strategy_status(strategy_id, current_user["id"])
+    if status_doc is None:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    return status_doc
+
+
+@router.get("/strategy/{strategy_id}/events")
+async def stream_generation_status(strategy_id: str, current_user: dict = Depends(get_current_user)):
+    """Server-Sent Events: one { status: "complete" | "failed", strategy? } once the draft is replaced"""
+    user_id = current_user["id"]
+    if get_strategy_status(strategy_id, user_id, include_strategy=False) is None:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+
+    async def event_generator():
+        # Polls Mongo, so it works whichever node is running the crew
+        give_up_at = time.time() + settings.CREW_REQUEST_DEADLINE + 30
+        while time.time() < give_up_at:
+            status_doc = get_strategy_status(strategy_id, user_id, include_strategy=False)
+            if status_doc is None or status_doc["status"] != "draft":
+                break
+            yield ": waiting\n\n"
+            await asyncio.sleep(settings.DRAFT_POLL_INTERVAL)
+        status_doc = get_strategy_status(strategy_id, user_id) or {"status": "failed", "error": "Strategy deleted"}
+        if status_doc["status"] == "draft":
+            status_doc = {**status_doc, "status": "pending", "strategy": None}
+        yield f"data: {json.dumps(status_doc, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history")
 async def get_history(current_user: dict = Depends(get_current_user)):
     strategies = list(strategies_collection.find({
@@ -0,0 +1,106 @@
+"""
+Circuit Breaker - Stop waiting on a degraded LLM provider
+
+Every Groq completion reports its outcome here. Over the last BREAKER_WINDOW
+calls, failures (transient errors: 429, 5xx, timeouts, connection errors) and
+calls slower than BREAKER_SLOW_CALL_SECONDS both count against the provider.
+Once their share reaches BREAKER_ERROR_RATE the circuit opens:
+    - open: calls are refused immediately (the gateway fails over to the
+      secondary endpoint, or fails fast) for BREAKER_OPEN_SECONDS
+    - half-open: one probe call is let through; success closes the circuit,
+      failure opens it again
+State is per process - each worker learns about an outage from its own calls.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from app.core.config import settings
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self._clock = clock  # injectable so tests can move time without sleeping
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=settings.BREAKER_WINDOW)  # True = bad call
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """May a call go to the provider now?"""
+        with self._lock:
+            if self.state == OPEN and self._clock() - self.opened_at >= settings.BREAKER_OPEN_SECONDS:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def cancel(self):
+        """An allowed call never reached the provider; free the half-open probe slot"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def record(self, ok: bool, latency: float):
+        slow = ok and latency > settings.BREAKER_SLOW_CALL_SECONDS
+        bad = not ok or slow
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["failures"] += not ok
+            self._stats["slow"] += slow
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if bad:
+                    self._open(f"probe {'slow' if slow else 'failed'}")
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print(f"[BREAKER] {self.name} closed (probe succeeded)")
+                return
+            self._outcomes.append(bad)
+            if self.state == CLOSED and len(self._outcomes) >= settings.BREAKER_MIN_CALLS:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if rate >= settings.BREAKER_ERROR_RATE:
+                    self._open(f"{rate:.0%} of the last {len(self._outcomes)} calls failed or were slow")
+
+    def _open(self, reason: str):
+        self.state = OPEN
+        self.opened_at = self._clock()
+        self._stats["opened"] += 1
+        print(f"[BREAKER] {self.name} open for {settings.BREAKER_OPEN_SECONDS}s: {reason}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, **self._stats}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def get_breaker_stats() -> dict:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,372 @@
+"""
+Strategy Cache - Two-tier cache of generated strategies
+Keyed by an MD5 of the normalised strategy inputs (case and whitespace only), with a MinHash/LSH index
+for serving near-identical briefs (see app.services.similarity)
+
+Tiers:
+    - local: in-process LRU, byte-budgeted with a short TTL; hits skip the Redis
+      round trip and the json.loads of a 20-50 KB payload
+    - redis: shared by every API node and worker
+Writes publish an invalidation on Redis pub/sub so other processes drop their
+local copy instead of serving an outdated one.
+
+Individual crew stage outputs are cached too (stage:{key}), keyed by only the
+inputs each task depends on, so a new goal for a known audience reuses personas.
+Finished stages of a running job are checkpointed (checkpoint:{request_id}) so a
+redelivered job skips them.
+
+Entries have two lifetimes (stale-while-revalidate):
+    - soft TTL: after this the entry is stale - still served instantly, but a
+      background regeneration is triggered
+    - hard TTL: the Redis expiry; only past this does a request block on a crew run
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import redis_client, REDIS_ENABLED
+from app.models.schemas import StrategyInput
+from app.services.similarity import (
+    canonical_fields, exact_fields, similarity_scope, minhash_signature, lsh_bands, estimate_similarity
+)
+
+INVALIDATION_CHANNEL = "strategy-cache:invalidate"
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ============================================================================
+# LOCAL TIER (in-process LRU)
+# ============================================================================
+
+class LocalLRUCache:
+    """Thread-safe LRU bounded by total payload bytes, with per-entry expiry"""
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, size, expires_at = item
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value, size: int, ttl: Optional[float] = None):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.time() + min(ttl or self.ttl, self.ttl))
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.current_bytes, "max_bytes": self.max_bytes}
+
+
+local_cache = LocalLRUCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL)
+
+_stats = {"local": {"hits": 0, "misses": 0}, "redis": {"hits": 0, "misses": 0},
+          "stage": {"hits": 0, "misses": 0}}
+_stats_lock = threading.Lock()
+
+def _count(tier: str, outcome: str):
+    with _stats_lock:
+        _stats[tier][outcome] += 1
+
+def get_cache_stats() -> dict:
+    """Hit/miss counters per tier (since process start) plus local memory usage"""
+    with _stats_lock:
+        snapshot = {tier: dict(counts) for tier, counts in _stats.items()}
+    for counts in snapshot.values():
+        total = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / total, 3) if total else None
+    snapshot["local"].update(local_cache.stats())
+    return snapshot
+
+
+# ============================================================================
+# CROSS-PROCESS INVALIDATION (Redis pub/sub)
+# ============================================================================
+
+_listener_started = False
+
+def _publish_invalidation(cache_key: str):
+    try:
+        redis_client.publish(INVALIDATION_CHANNEL, f"{NODE_ID}|{cache_key}")
+    except Exception:
+        pass
+
+def _listen_for_invalidations():
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if not message:
+                    continue
+                origin, _, cache_key = message["data"].partition("|")
+                if origin != NODE_ID:
+                    local_cache.delete(cache_key)
+        except Exception as e:
+            print(f"[WARNING] Cache invalidation listener reconnecting: {e}")
+            time.sleep(2)
+
+def start_cache_invalidation_listener():
+    """Subscribe this process to cross-node invalidations (idempotent)"""
+    global _listener_started
+    if _listener_started or not REDIS_ENABLED:
+        return
+    _listener_started = True
+    threading.Thread(target=_listen_for_invalidations, name="cache-invalidation", daemon=True).start()
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def generate_cache_key(strategy_input: StrategyInput, mode: str = "full") -> str:
+    version = "v4"
+    fields = exact_fields(strategy_input)
+    input_str = f"{version}|{fields['goal']}|{fields['audience']}|{fields['industry']}|{fields['platform']}|{fields['contentType']}|{fields['experience']}"
+    if mode != "full":
+        # Lite outputs never answer a full-mode request (and vice versa)
+        input_str = f"{mode}|{input_str}"
+    return hashlib.md5(input_str.encode()).hexdigest()
+
+def _to_entry(data) -> dict:
+    if isinstance(data, dict) and "strategy" in data and "cached_at" in data:
+        age = time.time() - data["cached_at"]
+        return {"strategy": data["strategy"], "cached_at": data["cached_at"], "age": age,
+                "stale": age > settings.STRATEGY_CACHE_SOFT_TTL}
+    # Entries written before soft TTLs existed are treated as fresh
+    return {"strategy": data, "cached_at": None, "age": None, "stale": False}
+
+def _remaining_hard_ttl(envelope) -> Optional[float]:
+    if isinstance(envelope, dict) and envelope.get("cached_at"):
+        return envelope["cached_at"] + settings.STRATEGY_CACHE_HARD_TTL - time.time()
+    return None
+
+def get_cache_entry(cache_key: str) -> Optional[dict]:
+    """
+    Returns {"strategy", "cached_at", "age", "stale"} or None on a miss.
+    The returned strategy may be shared with other requests - treat it as read-only.
+    """
+    envelope = local_cache.get(cache_key)
+    if envelope is not None:
+        _count("local", "hits")
+        return _to_entry(envelope)
+    _count("local", "misses")
+
+    if not REDIS_ENABLED:
+        return None
+    try:
+        cached = redis_client.get(f"strategy:{cache_key}")
+        if not cached:
+            _count("redis", "misses")
+            return None
+        envelope = json.loads(cached)
+    except:
+        _count("redis", "misses")
+        return None
+
+    _count("redis", "hits")
+    local_cache.put(cache_key, envelope, len(cached), ttl=_remaining_hard_ttl(envelope))
+    return _to_entry(envelope)
+
+def get_cached_strategy(cache_key: str):
+    """Fresh entries only - stale ones count as a miss"""
+    entry = get_cache_entry(cache_key)
+    if entry is None or entry["stale"]:
+        return None
+    return entry["strategy"]
+
+def set_cached_strategy(cache_key: str, strategy: dict, ttl: Optional[int] = None,
+                        strategy_input: Optional[StrategyInput] = None, mode: str = "full"):
+    """Cache a strategy; pass `strategy_input` to make it findable by near-duplicate briefs"""
+    envelope = {"strategy": strategy, "cached_at": time.time()}
+    payload = json.dumps(envelope)
+    local_cache.put(cache_key, envelope, len(payload))
+    if not REDIS_ENABLED:
+        return
+    try:
+        ttl = ttl or settings.STRATEGY_CACHE_HARD_TTL
+        redis_client.setex(f"strategy:{cache_key}", ttl, payload)
+        _publish_invalidation(cache_key)
+        if strategy_input is not None and settings.NEAR_DUP_ENABLED:
+            _index_brief(cache_key, strategy_input, ttl, mode)
+    except:
+        pass
+
+# ============================================================================
+# NEAR-DUPLICATE LOOKUP (MinHash + LSH over goal/audience)
+# ============================================================================
+#   minhash:{cache_key}              comma-joined signature
+#   lsh:{scope_hash}:{band}:{bucket} SET of cache keys sharing that band bucket
+# scope = exact industry/platform/contentType/experience (+ generation mode), so
+# only briefs that agree on those are ever compared.
+
+def _lsh_prefix(fields: dict, mode: str = "full") -> str:
+    scope = similarity_scope(fields) if mode == "full" else f"{mode}|{similarity_scope(fields)}"
+    return f"lsh:{hashlib.md5(scope.encode()).hexdigest()[:12]}:"
+
+def _index_brief(cache_key: str, strategy_input: StrategyInput, ttl: int, mode: str = "full"):
+    signature = minhash_signature(canonical_fields(strategy_input))
+    prefix = _lsh_prefix(exact_fields(strategy_input), mode)
+    pipe = redis_client.pipeline()
+    pipe.setex(f"minhash:{cache_key}", ttl, ",".join(map(str, signature)))
+    for bucket in lsh_bands(signature):
+        pipe.sadd(f"{prefix}{bucket}", cache_key)
+        pipe.expire(f"{prefix}{bucket}", ttl)
+    pipe.execute()
+
+def find_near_duplicate(strategy_input: StrategyInput, mode: str = "full") -> Optional[dict]:
+    """
+    Best fresh cache entry for a near-identical brief, or None.
+    Returned entry has the extra keys "cache_key" and "similarity".
+    """
+    if not (REDIS_ENABLED and settings.NEAR_DUP_ENABLED):
+        return None
+    try:
+        signature = minhash_signature(canonical_fields(strategy_input))
+        prefix = _lsh_prefix(exact_fields(strategy_input), mode)
+        candidates = redis_client.sunion([f"{prefix}{bucket}" for bucket in lsh_bands(signature)])
+        candidates = list(candidates)[:settings.NEAR_DUP_MAX_CANDIDATES]
+        if not candidates:
+            return None
+
+        stored = redis_client.mget([f"minhash:{key}" for key in candidates])
+        scored = [
+            (estimate_similarity(signature, [int(v) for v in raw.split(",")]), key)
+            for key, raw in zip(candidates, stored) if raw
+        ]
+        for similarity, key in sorted(scored, reverse=True):
+            if similarity < settings.NEAR_DUP_THRESHOLD:
+                break
+            entry = get_cache_entry(key)
+            if entry and not entry["stale"]:
+                entry.update({"cache_key": key, "similarity": round(similarity, 3)})
+                return entry
+    except Exception as e:
+        print(f"[WARNING] Near-duplicate lookup failed: {e}")
+    return None
+
+def invalidate_strategy(cache_key: str):
+    """Drop a strategy from every tier on every node"""
+    local_cache.delete(cache_key)
+    if not REDIS_ENABLED:
+        return
+    try:
+        redis_client.delete(f"strategy:{cache_key}")
+        _publish_invalidation(cache_key)
+    except:
+        pass
+
+def claim_revalidation(cache_key: str) -> bool:
+    """
+    At most one background refresh per key per cooldown window, cluster-wide.
+    Stops a failing crew from being retried on every stale hit.
+    """
+    if not REDIS_ENABLED:
+        return False
+    try:
+        return bool(redis_client.set(f"revalidate:{cache_key}", 1, nx=True,
+                                     ex=settings.STRATEGY_REVALIDATE_COOLDOWN))
+    except:
+        return False
+
+
+# ============================================================================
+# STAGE CACHE (raw output of one crew task)
+# ============================================================================
+#   stage:{stage_key}   raw task output; the key covers only the inputs that task
+#                       reads plus its upstream stage keys (see crew.stage_cache_key)
+
+def get_stage_output(stage_key: str) -> Optional[str]:
+    raw = local_cache.get(f"stage:{stage_key}")
+    if raw is None and REDIS_ENABLED:
+        try:
+            raw = redis_client.get(f"stage:{stage_key}")
+        except:
+            raw = None
+        if raw:
+            local_cache.put(f"stage:{stage_key}", raw, len(raw))
+    _count("stage", "hits" if raw else "misses")
+    return raw or None
+
+def set_stage_output(stage_key: str, raw: str):
+    local_cache.put(f"stage:{stage_key}", raw, len(raw))
+    if not REDIS_ENABLED:
+        return
+    try:
+        redis_client.setex(f"stage:{stage_key}", settings.STAGE_CACHE_TTL, raw)
+    except:
+        pass
+
+
+# ============================================================================
+# CHECKPOINTS (finished stages of one in-progress generation)
+# ============================================================================
+#   checkpoint:{request_id}   HASH section -> JSON {stage_key, raw, parsed}
+# Lets a redelivered job resume where a dead worker stopped instead of paying
+# for every task again. Cleared once the run completes. Redis only: a resume
+# happens on whichever worker claims the job next, never from this process's memory.
+
+def load_checkpoint(request_id: str) -> dict:
+    """Finished stages recorded for `request_id` (section -> entry)"""
+    if not REDIS_ENABLED:
+        return {}
+    try:
+        return {section: json.loads(entry)
+                for section, entry in redis_client.hgetall(f"checkpoint:{request_id}").items()}
+    except:
+        return {}
+
+def save_checkpoint(request_id: str, section: str, entry: dict):
+    if not REDIS_ENABLED:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(f"checkpoint:{request_id}", section, json.dumps(entry))
+        pipe.expire(f"checkpoint:{request_id}", settings.CHECKPOINT_TTL)
+        pipe.execute()
+    except:
+        pass
+
+def clear_checkpoint(request_id: str):
+    if not REDIS_ENABLED:
+        return
+    try:
+        redis_client.delete(f"checkpoint:{request_id}")
+    except:
+        pass
@@ -3,12 +3,35 @@ CrewAI Multi-Agent System - 4 Elite Agents for Content Strategy
 Each agent has a specific role, goal, and backstory designed for maximum performance
 """
 
-from crewai import Agent, Task, Crew, Process
-from langchain_groq import ChatGroq
-from app.models.schemas import StrategyInput, ContentStrategy
+from crewai import Agent, Task
+from crewai.agents.cache.cache_handler import CacheHandler
+from crewai.utilities.formatter import DIVIDERS
+from app.models.schemas import (
+    StrategyInput, StrategicGuidance, ROIPrediction,
+    PersonasOutput, CompetitorGapsOutput, KeywordsOutput, CalendarOutput,
+)
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from string import Formatter
+from typing import Any, Callable, NamedTuple, Optional
+import contextvars
+import hashlib
 import json
 import os
+import threading
+import time
 from app.core.config import settings
+from app.services.cache import (
+    get_stage_output, set_stage_output, load_checkpoint, save_checkpoint, clear_checkpoint
+)
+from app.services.jsonstream import extract_json
+from app.services.llm import (
+    GatewayLLM, resolve_route, stream_sink, cache_key_log, evict_cached_responses, accept_failed_generation,
+    call_cancelled,
+)
+from app.services.logic import generate_demo_strategy
+from app.services.repair import SectionError, count_parse, load_json, validate_section
+from app.services.retry import retry_transient
+from app.services.similarity import exact_fields
 
 # SerpAPI Tool for Real Keyword Research
 try:
@@ -21,28 +44,370 @@ except ImportError:
     SERPAPI_ENABLED = False
     print("⚠️  crewai-tools not installed. SerpAPI disabled.")
 
-# Initialize Groq LLM (Llama-3.3-70B)
-llm = ChatGroq(
-    model="groq/llama-3.3-70b-versatile",
-    temperature=0.7,
-    groq_api_key=settings.GROQ_API_KEY
-)
+# Groq LLM behind the gateway (response cache, budget). Each call is routed to a
+# model by task name (settings.LLM_ROUTES): Llama-3.3-70B by default, 8B for small tasks
+llm = GatewayLLM()
+
+# Section emitted by each task, in execution order
+SECTION_ORDER = ["personas", "competitor_gaps", "strategic_guidance", "keywords", "calendar", "roi_prediction"]
+
+
+def _task_raw(task_or_output) -> str:
+    output = getattr(task_or_output, "output", task_or_output)
+    return output.raw if hasattr(output, 'raw') else str(output)
 
-def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
+
+def parse_section(section: str, raw: str) -> dict:
     """
-    Creates and executes a 4-agent CrewAI workflow for content strategy generation
+    Parse one task's raw output into its validated ContentStrategy fields
+    (repairing malformed JSON). Raises SectionError if it can't be salvaged.
+    """
+    data = load_json(section, raw)
+    if section == "personas":
+        fields = {"personas": data.get("personas", [data]) if isinstance(data, dict) else data}
+    elif section == "calendar":
+        if not isinstance(data, dict):
+            raise SectionError(section, "expected an object with calendar and sample_posts")
+        fields = {"calendar": data.get("calendar", []), "sample_posts": data.get("sample_posts", [])}
+    else:
+        fields = {section: data}
+    return {name: validate_section(name, value) for name, value in fields.items()}
+
+
+def demo_section(section: str, strategy_input: StrategyInput) -> dict:
+    """Demo fields standing in for a section the LLM could not produce"""
+    demo = generate_demo_strategy(strategy_input)
+    names = ("calendar", "sample_posts") if section == "calendar" else (section,)
+    return {name: demo[name] for name in names}
+
+
+def fill_provisional(strategy: dict, sections: list, strategy_input: StrategyInput) -> dict:
+    """`strategy` with every section it lacks taken from the demo strategy, listed in "provisional_sections" """
+    filled = dict(strategy)
+    missing = [section for section in sections if section not in strategy]
+    for section in missing:
+        filled.update(demo_section(section, strategy_input))
+    filled["provisional_sections"] = missing
+    return filled
+
+
+# Input fields each task's prompt actually reads. A stage's cache key is these
+# (case/whitespace-normalised) plus its upstream stages' keys, so e.g. personas
+# and gaps are reused when only the goal changes.
+STAGE_INPUTS = {
+    "personas": ("audience", "industry", "platform", "contentType"),
+    "competitor_gaps": ("industry", "audience", "platform"),
+    "strategic_guidance": ("goal", "audience", "industry", "platform", "contentType", "experience"),
+    "keywords": ("goal", "audience", "industry", "platform"),
+    "calendar": ("goal", "platform", "industry", "contentType"),
+    "roi_prediction": ("platform", "contentType", "industry", "audience"),
+}
+STAGE_CACHE_VERSION = "v3"  # bump when a task prompt changes
+
+# Context edges a stage can do without (CREW_RELAX_OPTIONAL_EDGES, off by default since
+# the keywords and ROI prompts are written to build on them). Dropping them turns the
+# six-call chain into personas -> {gaps, keywords} -> {guidance, roi} -> calendar
+OPTIONAL_EDGES = {
+    "keywords": {"competitor_gaps", "strategic_guidance"},
+    "roi_prediction": {"calendar"},
+}
+
+
+# What each stage actually reads from its upstream stages:
+# {stage: {upstream section: (item fields kept, max items)}}. Lists inside an
+# item are cut to CONTEXT_LIST_LIMIT entries. Passing this digest instead of the
+# raw upstream text keeps later prompts from growing with every stage.
+CONTEXT_FIELDS = {
+    "competitor_gaps": {
+        "personas": (("name", "age_range", "pain_points", "content_preferences"), 3),
+    },
+    "strategic_guidance": {
+        "personas": (("name", "age_range", "pain_points", "desires", "objections"), 3),
+        "competitor_gaps": (("gap", "impact"), 5),
+    },
+    "keywords": {
+        "personas": (("name", "pain_points", "desires"), 3),
+        "competitor_gaps": (("gap",), 5),
+        "strategic_guidance": (("what_to_do", "what_to_focus_on"), None),
+    },
+    "calendar": {
+        "personas": (("name", "age_range", "pain_points", "content_preferences"), 3),
+        "competitor_gaps": (("gap", "implementation"), 5),
+        "strategic_guidance": (("what_to_do", "how_to_do_it", "when_to_post"), None),
+        "keywords": (("term", "hashtags"), 10),
+    },
+    "roi_prediction": {
+        "personas": (("name", "age_range"), 3),
+        "keywords": (("term", "difficulty", "monthly_searches"), 10),
+        "calendar": (("week", "format"), 12),
+    },
+}
+CONTEXT_LIST_LIMIT = 3
+
+
+def _project(value, keep: tuple):
+    if not isinstance(value, dict):
+        return value
+    return {k: value[k][:CONTEXT_LIST_LIMIT] if isinstance(value[k], list) else value[k]
+            for k in keep if k in value}
+
+
+def compact_context(section: str, upstream: dict) -> str:
+    """
+    Structured digest of the upstream sections `section` needs.
+    `upstream` maps section name -> parsed fields (as returned by parse_section).
+    """
+    parts = []
+    for name, parsed in upstream.items():
+        data = parsed.get(name)
+        spec = CONTEXT_FIELDS.get(section, {}).get(name)
+        if spec is not None:
+            keep, max_items = spec
+            if isinstance(data, list):
+                data = [_project(item, keep) for item in data[:max_items]]
+            else:
+                data = _project(data, keep)
+        parts.append(f"{name.upper()} (from previous agent): {json.dumps(data, separators=(',', ':'))}")
+    return "\n\n".join(parts)
+
+
+def stage_cache_key(section: str, fields: dict, upstream_keys: list) -> str:
+    parts = [STAGE_CACHE_VERSION, section, resolve_route(section).model]
+    parts += [fields[name] for name in STAGE_INPUTS[section]] + upstream_keys
+    return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def _report_section(on_section: Callable[[tuple], Any], section: str, fields: dict, kind: str = "section"):
+    try:
+        on_section((kind, section, fields))
+    except Exception as e:
+        # Progress reporting must never break the crew run
+        print(f"[WARNING] Could not report section '{section}': {e}")
+
+
+def stage_dependencies(tasks: dict, relax_optional: bool = False) -> dict:
+    """Upstream sections of each stage, derived from the tasks' declared context"""
+    section_of = {id(task): section for section, task in tasks.items()}
+    deps = {}
+    for section, task in tasks.items():
+        upstream = [section_of[id(t)] for t in task.context] if isinstance(task.context, list) else []
+        if relax_optional:
+            upstream = [name for name in upstream if name not in OPTIONAL_EDGES.get(section, ())]
+        deps[section] = upstream
+    return deps
+
+
+def run_stages(tasks: dict, strategy_input: StrategyInput,
+               on_section: Optional[Callable[[tuple], Any]] = None,
+               deadline: Optional[float] = None,
+               request_id: Optional[str] = None,
+               finish_in_background: bool = False) -> dict:
+    """
+    Execute the crew's tasks as a DAG: every stage whose upstream stages are done
+    runs concurrently (CREW_STAGE_CONCURRENCY), and cached stages are skipped.
+    Each task gets a compact digest of its upstream outputs (CONTEXT_FIELDS), or the
+    raw outputs like Process.sequential when CREW_CONTEXT_COMPACTION is off.
+    A section that fails validation is re-asked (SECTION_REPAIR_ATTEMPTS) and
+    then filled from the demo strategy, listed under "fallback_sections".
+    Transient Groq errors retry only the failing task, with backoff.
+    
+    When `deadline` passes, the sections finished so far are returned with the rest
+    filled from the demo strategy and listed under "provisional_sections". With
+    `finish_in_background` that snapshot is reported instead as ("partial", None,
+    strategy) and the run goes on until CREW_REQUEST_DEADLINE.
     
     Args:
-        strategy_input: Validated input containing goal, audience, industry, platform
+        tasks: section name -> Task
+        deadline: time.monotonic() by which the caller needs a result
+            (never later than CREW_REQUEST_DEADLINE seconds from now)
+        request_id: Checkpoint finished stages under this id (e.g. the job id);
+            a rerun with the same id resumes instead of starting over
         
     Returns:
-        dict: Complete content strategy matching ContentStrategy schema
+        dict: Parsed sections merged into one ContentStrategy-shaped dict
     """
-    
-    # ============================================================================
+    hard_deadline = time.monotonic() + settings.CREW_REQUEST_DEADLINE
+    deadline = min(deadline, hard_deadline) if deadline is not None else hard_deadline
+    # Retrying past the caller's deadline is only useful if the run will carry on
+    retry_until = hard_deadline if finish_in_background else deadline
+    deps = stage_dependencies(tasks, settings.CREW_RELAX_OPTIONAL_EDGES)
+    fields = exact_fields(strategy_input)
+    raw_outputs, parsed_outputs, stage_keys, final_strategy = {}, {}, {}, {}
+    fallback_sections = []
+    checkpoint = load_checkpoint(request_id) if request_id else {}
+    if checkpoint:
+        print(f"[CHECKPOINT] Resuming {request_id}: {', '.join(checkpoint)} already done")
+    # An Agent keeps per-call executor state, so one agent never runs two tasks at once
+    agent_locks = {id(task.agent): threading.Lock() for task in tasks.values()}
+    # Set once this call returns; stages still running then stop at their next LLM call
+    abandoned = threading.Event()
+
+    def run_stage(section: str):
+        task = tasks[section]
+        call_cancelled.set(abandoned)
+        if on_section:
+            # Stream each persona / keyword / calendar item as soon as it closes
+            stream_sink.set(lambda path, index, item: _report_section(
+                on_section, section, {"path": path, "index": index, "item": item}, kind="item"))
+        if section in checkpoint:
+            entry = checkpoint[section]
+            return entry["stage_key"], entry["raw"], entry["parsed"], False
+        stage_key = stage_cache_key(section, fields, [stage_keys[name] for name in deps[section]])
+
+        raw = get_stage_output(stage_key) if settings.STAGE_CACHE_ENABLED else None
+        if raw is not None:
+            try:
+                parsed = parse_section(section, raw)
+                print(f"[CACHE] Stage '{section}' reused ({stage_key[:8]})")
+                return stage_key, raw, parsed, False
+            except SectionError as e:
+                print(f"[CACHE] Stage '{section}' cached output no longer validates, regenerating: {e}")
+
+        raw_context = DIVIDERS.join(raw_outputs[name] for name in deps[section])
+        if settings.CREW_CONTEXT_COMPACTION:
+            context = compact_context(section, {name: parsed_outputs[name] for name in deps[section]})
+        else:
+            context = raw_context
+        if context:
+            print(f"[CONTEXT] {section}: ~{len(context) // 4} tokens of upstream context "
+                  f"(raw would be ~{len(raw_context) // 4})")
+
+        def execute(note: str) -> str:
+            # The agent lock is released between retries so backoff never blocks a sibling task
+            with agent_locks[id(task.agent)]:
+                return _task_raw(task.execute_sync(agent=task.agent, context=(context + note) or None))
+
+        note = ""
+        for attempt in range(settings.SECTION_REPAIR_ATTEMPTS + 1):
+            cache_keys = []
+            log_token = cache_key_log.set(cache_keys)
+            accept_token = accept_failed_generation.set(True)  # parse_section below repairs or rejects it
+            try:
+                raw = retry_transient(lambda: execute(note), section, retry_until)
+            finally:
+                accept_failed_generation.reset(accept_token)
+                cache_key_log.reset(log_token)
+            try:
+                parsed = parse_section(section, raw)
+                count_parse(section, "parsed")
+                break
+            except SectionError as e:
+                count_parse(section, "rejected")
+                # Don't let the response cache replay the rejected answer
+                evict_cached_responses(cache_keys)
+                print(f"[REPAIR] {section} unusable (attempt {attempt + 1}): {e.reason}")
+                note = (DIVIDERS if context else "") + (
+                    f"Your previous answer to this task was rejected: {e.reason}. "
+                    "Reply with ONLY valid JSON in exactly the structure requested."
+                )
+        else:
+            # Keep every other section; only this one falls back to demo data
+            print(f"[REPAIR] {section}: giving up, using demo data for this section")
+            count_parse(section, "fallbacks")
+            parsed = demo_section(section, strategy_input)
+            return f"demo:{stage_key}", json.dumps(parsed), parsed, True
+
+        # Store the validated JSON, so a reuse never needs repairing again
+        raw = json.dumps(parsed)
+        if settings.STAGE_CACHE_ENABLED:
+            set_stage_output(stage_key, raw)
+        return stage_key, raw, parsed, False
+
+    pending = [section for section in SECTION_ORDER if section in tasks]
+    running = {}
+    timed_out = False
+    pool = ThreadPoolExecutor(max_workers=settings.CREW_STAGE_CONCURRENCY, thread_name_prefix="crew-stage")
+    try:
+        while pending or running:
+            for section in [s for s in pending if all(name in raw_outputs for name in deps[s])]:
+                pending.remove(section)
+                # copy_context so per-request contextvars follow the stage into its thread
+                running[pool.submit(contextvars.copy_context().run, run_stage, section)] = section
+            if not running:
+                raise ValueError(f"Unsatisfiable stage dependencies: {pending}")
+
+            done, _ = wait(running, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                if finish_in_background and deadline < hard_deadline:
+                    print(f"[DEADLINE] Reporting partial strategy, finishing {', '.join(running.values())} in background")
+                    if on_section:
+                        _report_section(on_section, None, fill_provisional(final_strategy, list(tasks), strategy_input),
+                                        kind="partial")
+                    deadline = hard_deadline
+                    continue
+                timed_out = True
+                break
+            for future in done:
+                section = running.pop(future)
+                stage_keys[section], raw_outputs[section], parsed, fallback = future.result()
+                if fallback:
+                    fallback_sections.append(section)
+                elif request_id and section not in checkpoint:
+                    save_checkpoint(request_id, section, {"stage_key": stage_keys[section],
+                                                          "raw": raw_outputs[section], "parsed": parsed})
+                parsed_outputs[section] = parsed
+                final_strategy.update(parsed)
+                if on_section:
+                    _report_section(on_section, section, parsed)
+    finally:
+        # Don't wait for stages still running - the caller falls back right away.
+        # They give up their thread at the next LLM call instead of finishing unobserved.
+        abandoned.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if timed_out:
+        # Finished stages stay checkpointed (and stage-cached) for a rerun
+        final_strategy = fill_provisional(final_strategy, list(tasks), strategy_input)
+        print(f"[DEADLINE] Returning partial strategy, provisional: {', '.join(final_strategy['provisional_sections'])}")
+    elif request_id:
+        clear_checkpoint(request_id)
+    if fallback_sections:
+        final_strategy["fallback_sections"] = fallback_sections
+    return final_strategy
+
+
+# ============================================================================
+# AGENT & TASK DEFINITIONS (built once at import)
+# ============================================================================
+# Agents are described by immutable specs and prompts are precompiled templates;
+# a request only binds its StrategyInput values (bind_prompt) and borrows a set of
+# Agent objects from a pool (acquire_agents) instead of rebuilding all of it.
+
+class AgentSpec(NamedTuple):
+    role: str
+    goal: str
+    backstory: str
+    uses_search: bool = False  # gets the SerpAPI tool when it is configured
+
+
+class TaskSpec(NamedTuple):
+    agent: str              # AGENT_SPECS key
+    prompt: tuple           # compiled description, see compile_prompt
+    expected_output: str
+    response_model: type    # schema of the answer, requested via the provider's JSON mode
+    context: tuple = ()     # upstream sections whose output this task reads
+
+
+def compile_prompt(template: str) -> tuple:
+    """
+    Split a str.format template into (literal, field) pairs once, checking that
+    every field is a StrategyInput attribute. Literal braces are written {{ }}.
+    """
+    parts = tuple((literal, field) for literal, field, _, _ in Formatter().parse(template))
+    unknown = {field for _, field in parts if field} - set(StrategyInput.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown prompt field(s): {', '.join(sorted(unknown))}")
+    return parts
+
+
+def bind_prompt(prompt: tuple, strategy_input: StrategyInput) -> str:
+    return "".join(literal + (str(getattr(strategy_input, field)) if field else "")
+                   for literal, field in prompt)
+
+
+AGENT_SPECS = {
     # AGENT 1: AUDIENCE INTELLIGENCE SURGEON
-    # ============================================================================
-    audience_surgeon = Agent(
+    "audience_surgeon": AgentSpec(
         role="Audience Intelligence Surgeon",
         goal="Build 3x conversion personas from raw business inputs using deep psychological profiling",
         backstory="""You are a master audience psychologist with 15 years studying consumer behavior.
@@ -50,15 +415,9 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         Your personas don't just describe demographics - they expose deep emotional triggers, 
         daily frustrations, and aspirational desires that drive purchasing decisions.
         You can predict objections before they happen and craft messaging that resonates at a primal level.""",
-        verbose=True,
-        allow_delegation=False,
-        llm=llm
-    )
-
-    # ============================================================================
+    ),
     # AGENT 2: CULTURAL TREND SNIPER
-    # ============================================================================
-    trend_sniper = Agent(
+    "trend_sniper": AgentSpec(
         role="Cultural Trend Sniper",
         goal="Predict 90-day viral content gaps before they hit Google Trends",
         backstory="""You spent 5 years on TikTok's trend prediction team and predicted 50+ viral moments.
@@ -66,15 +425,9 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         micro-communities, and emerging behaviors that competitors miss.
         Your superpower is finding content gaps where competitors are completely asleep.
         You've helped creators go from 0 to 100K followers by exploiting these invisible opportunities.""",
-        verbose=True,
-        allow_delegation=False,
-        llm=llm
-    )
-
-    # ============================================================================
+    ),
     # AGENT 3: ORGANIC TRAFFIC ARCHITECT (+ SerpAPI Tool)
-    # ============================================================================
-    traffic_architect = Agent(
+    "traffic_architect": AgentSpec(
         role="Organic Traffic Architect",
         goal="Engineer 30-day keyword ladders with REAL search volume data that actually rank",
         backstory="""You're an SEO strategist who ranked 200+ sites to page 1 using low-competition keywords.
@@ -83,16 +436,10 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         You understand search intent at a molecular level and can predict which keywords will convert.
         Your strategies have generated millions in organic revenue for e-commerce and SaaS brands.
         You use SerpAPI to get REAL keyword search volumes instead of guessing.""",
-        verbose=True,
-        allow_delegation=False,
-        tools=[serper_tool] if SERPAPI_ENABLED else [],  # Real keyword research!
-        llm=llm
-    )
-
-    # ============================================================================
+        uses_search=True,
+    ),
     # AGENT 4: CHIEF STRATEGY SYNTHESIZER
-    # ============================================================================
-    strategy_synthesizer = Agent(
+    "strategy_synthesizer": AgentSpec(
         role="Chief Strategy Synthesizer",
         goal="Output pixel-perfect JSON execution plans with zero parsing errors",
         backstory="""You're a former content director who built systems for $100M+ brands like Red Bull and GoPro.
@@ -100,15 +447,9 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         You create 30-day content calendars so detailed that junior creators can execute flawlessly.
         Every post you plan has a strategic purpose, from hook to CTA.
         You ALWAYS output perfectly structured JSON that passes strict validation.""",
-        verbose=True,
-        allow_delegation=False,
-        llm=llm
-    )
-
-    # ============================================================================
+    ),
     # AGENT 5: ROI PREDICTION ANALYST (NEW)
-    # ============================================================================
-    roi_predictor = Agent(
+    "roi_predictor": AgentSpec(
         role="ROI Prediction Analyst",
         goal="Estimate traffic lift and engagement boost using industry benchmarks",
         backstory="""You're a data-driven marketing analyst who's predicted outcomes for 500+ campaigns.
@@ -118,29 +459,26 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         - Content type performance (Reels vs Posts vs Blogs)
         - Audience size and growth potential
         Your predictions are typically within 15% of actual results after 60 days.""",
-        verbose=True,
-        allow_delegation=False,
-        llm=llm
-    )
+    ),
+}
+
 
-    # ============================================================================
+TASK_SPECS = {
     # TASK 1: BUILD 3 DISTINCT PERSONAS
-    # ============================================================================
-    persona_task = Task(
-        description=f"""
+    "personas": TaskSpec(
+        agent="audience_surgeon",
+        prompt=compile_prompt("""
         Analyze this SPECIFIC business and create THREE ultra-detailed buyer personas covering different segments:
-        - Business Goal: {strategy_input.goal}
-        - Target Audience: {strategy_input.audience}
-        - Industry: {strategy_input.industry}
-        - Platform: {strategy_input.platform}
-        - Content Type: {strategy_input.contentType}
-        - Experience Level: {strategy_input.experience}
+        - Target Audience: {audience}
+        - Industry: {industry}
+        - Platform: {platform}
+        - Content Type: {contentType}
         
         🚨 CRITICAL VALIDATION RULES 🚨
         1. Generate 3 DISTINCT personas - NOT the same persona 3 times
         2. Each persona MUST have DIFFERENT age ranges (e.g., 18-24, 25-34, 35-45)
         3. NO GENERIC "Working Professional" or "25-34" defaults unless highly specific to the industry
-        4. Each persona MUST mention the actual industry ({strategy_input.industry}) in pain_points or desires
+        4. Each persona MUST mention the actual industry ({industry}) in pain_points or desires
         5. If you output generic personas, the task FAILS - regenerate with specific details!
         
         📋 CONCRETE EXAMPLES TO FOLLOW:
@@ -220,59 +558,55 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         }}
         
         🎯 YOUR TASK:
-        Generate 3 personas for: {strategy_input.industry} industry targeting {strategy_input.audience}
+        Generate 3 personas for: {industry} industry targeting {audience}
         
         Output MUST be a JSON object with "personas" array containing exactly 3 persona objects.
         Each persona object MUST include:
         - "name": Industry + audience specific (NOT generic!)
-        - "age_range": Covers different segments of {strategy_input.audience}
+        - "age_range": Covers different segments of {audience}
         - "occupation": Specific to the age/industry context
-        - "pain_points": Array of 5 points specific to {strategy_input.industry}
-        - "desires": Array of 5 desires related to {strategy_input.goal}
-        - "objections": Array of 5 objections specific to buying from {strategy_input.industry}
-        - "daily_habits": Array of 5 habits including {strategy_input.platform} usage
-        - "content_preferences": Array of 5 formats aligned with {strategy_input.contentType}
+        - "pain_points": Array of 5 points specific to {industry}
+        - "desires": Array of 5 desires {industry} can fulfil for them
+        - "objections": Array of 5 objections specific to buying from {industry}
+        - "daily_habits": Array of 5 habits including {platform} usage
+        - "content_preferences": Array of 5 formats aligned with {contentType}
         
         ❌ FAIL CONDITIONS (DON'T DO THIS):
         - Using "Working Professional" without industry context
         - All 3 personas have same age_range
         - Generic pain points like "Limited time" that apply to anyone
-        - No mention of {strategy_input.industry} in pain_points or desires
-        - Content preferences don't match {strategy_input.contentType}
+        - No mention of {industry} in pain_points or desires
+        - Content preferences don't match {contentType}
         
         Make each persona psychologically DEEP, SPECIFIC, and ACTIONABLE for content creation!
-        """,
-        agent=audience_surgeon,
-        expected_output="JSON object with 'personas' array containing 3 highly specific, distinct persona objects"
-    )
-
-    # ============================================================================
+        """),
+        expected_output="JSON object with 'personas' array containing 3 highly specific, distinct persona objects",
+        response_model=PersonasOutput,
+    ),
     # TASK 2: FIND COMPETITOR GAPS
-    # ============================================================================
-    gaps_task = Task(
-        description=f"""
+    "competitor_gaps": TaskSpec(
+        agent="trend_sniper",
+        prompt=compile_prompt("""
         Based on this industry and audience, identify 5 content gaps competitors are missing:
-        - Industry: {strategy_input.industry}
-        - Audience: {strategy_input.audience}
-        - Platform: {strategy_input.platform}
+        - Industry: {industry}
+        - Audience: {audience}
+        - Platform: {platform}
         
-        Output a JSON array of objects, each with:
+        Output a JSON object with a "competitor_gaps" array of 5 objects, each with:
         - "gap": The specific opportunity competitors are missing
         - "impact": Impact level (High/Medium/Low)
         - "implementation": How to exploit this gap
         
         Focus on culturally relevant gaps emerging RIGHT NOW (not obvious evergreen topics).
-        """,
-        agent=trend_sniper,
-        expected_output="JSON array of 5 competitor gaps",
-        context=[persona_task]
-    )
-
-    # ============================================================================
+        """),
+        expected_output="JSON object with 'competitor_gaps' array of 5 competitor gaps",
+        response_model=CompetitorGapsOutput,
+        context=("personas",),
+    ),
     # TASK 3: STRATEGIC GUIDANCE (BULLETPROOF VERSION)
-    # ============================================================================
-    strategy_guidance_task = Task(
-        description=f"""
+    "strategic_guidance": TaskSpec(
+        agent="strategy_synthesizer",
+        prompt=compile_prompt("""
         🎯 CRITICAL: Output EXACTLY this JSON structure. NO extra text. NO markdown.
 
         {{
@@ -290,77 +624,73 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
             "things_to_avoid": ["Mistake 1", "Mistake 2", "Mistake 3", "Mistake 4", "Mistake 5"]
         }}
 
-        Context: {strategy_input.goal} | {strategy_input.audience} | {strategy_input.industry} | {strategy_input.platform}
+        Context: {goal} | {audience} | {industry} | {platform}
 
-        Generate content SPECIFIC to {strategy_input.contentType} format.
-        Tailor complexity to {strategy_input.experience} level.
+        Generate content SPECIFIC to {contentType} format.
+        Tailor complexity to {experience} level.
         Make everything actionable and tactical, not generic advice.
         
         JSON ONLY. No ```json wrappers. No explanations.
-        """,
-        agent=strategy_synthesizer,
+        """),
         expected_output="JSON object with EXACT keys: what_to_do, how_to_do_it, when_to_post, what_to_focus_on, why_it_works, productivity_boosters, things_to_avoid",
-        context=[persona_task, gaps_task]
-    )
-
-    # ============================================================================
+        response_model=StrategicGuidance,
+        context=("personas", "competitor_gaps"),
+    ),
     # TASK 4: BUILD KEYWORD LADDER
-    # ============================================================================
-    keywords_task = Task(
-        description=f"""
+    "keywords": TaskSpec(
+        agent="traffic_architect",
+        prompt=compile_prompt("""
         Create a 10-keyword ladder for organic ranking:
-        - Goal: {strategy_input.goal}
-        - Audience: {strategy_input.audience}
-        - Industry: {strategy_input.industry}
-        - Platform: {strategy_input.platform}
+        - Goal: {goal}
+        - Audience: {audience}
+        - Industry: {industry}
+        - Platform: {platform}
         
-        Output a JSON array of 10 keyword objects, each with:
+        Output a JSON object with a "keywords" array of 10 keyword objects, each with:
         - "term": Keyword phrase
         - "intent": Search intent (Informational/Transactional/Navigational)
         - "difficulty": Keyword difficulty (Easy/Medium/Hard) - prioritize Easy
         - "monthly_searches": Estimated monthly searches (e.g., "1K-10K")
         - "priority": Priority score 1-10 (higher = more important)
-        - "hashtags": Array of 5 relevant hashtags (with # symbol) optimized for {strategy_input.platform}
+        - "hashtags": Array of 5 relevant hashtags (with # symbol) optimized for {platform}
         
         For hashtags: Mix of popular (100K-1M posts), medium (10K-100K), and niche (1K-10K) tags.
         Make them specific to the keyword and industry, not generic like #love or #instagood.
         
         Start with Easy keywords and build toward Medium. Avoid Hard keywords.
         Focus on keywords the target audience ACTUALLY searches for.
-        """,
-        agent=traffic_architect,
-        expected_output="JSON array of 10 keywords with hashtags",
-        context=[persona_task, gaps_task, strategy_guidance_task]
-    )
-
-    # ============================================================================
+        """),
+        expected_output="JSON object with 'keywords' array of 10 keywords with hashtags",
+        response_model=KeywordsOutput,
+        context=("personas", "competitor_gaps", "strategic_guidance"),
+    ),
     # TASK 5: CREATE 30-DAY CALENDAR + SAMPLE POSTS
-    # ============================================================================
-    calendar_task = Task(
-        description=f"""
+    "calendar": TaskSpec(
+        agent="strategy_synthesizer",
+        prompt=compile_prompt("""
         Create a complete execution plan with:
         
         1. A 30-day content calendar (array of 12 items representing key posts across 4 weeks)
         2. Three ready-to-post sample posts with PROFESSIONAL-GRADE image prompts
         
-        ALL CONTENT must be optimized for: {strategy_input.contentType}
+        ALL CONTENT must be optimized for: {contentType}
         
         **CALENDAR (12 items):**
         Each item must have:
         - "week": Week number (1-4)
         - "day": Day number (1-7)
-        - "topic": Specific content topic (aligned with {strategy_input.contentType})
-        - "format": Content format - MUST match {strategy_input.contentType} preference
+        - "topic": Specific content topic (aligned with {contentType})
+        - "format": Content format - MUST match {contentType} preference
         - "caption_hook": Opening hook (first line of caption)
         - "cta": Call-to-action
         
         **SAMPLE POSTS (3 items):**
         Each post must have:
         - "title": Catchy title/hook
-        - "caption": Full caption (100-150 words) optimized for {strategy_input.contentType}
+        - "caption": Full caption (100-150 words) optimized for {contentType}
         - "hashtags": Array of 7-10 relevant hashtags
         - "image_prompt": DETAILED AI image generation prompt (follow the rules below!)
-        - "best_time": Optimal posting time for {strategy_input.contentType}
+        - "best_time": Optimal posting time for {contentType}
         
         **CRITICAL: IMAGE PROMPT ENGINEERING RULES**
         You are a SENIOR PROMPT ENGINEER. Create image prompts that would generate stunning, viral-worthy visuals.
@@ -374,8 +704,8 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         6. **Composition**: Angle and framing (overhead flat lay, close-up, wide shot, rule of thirds)
         7. **Style**: Photography style (commercial, cinematic, minimalist, editorial, lifestyle)
         8. **Technical Details**: Camera details if relevant (shallow depth of field, bokeh, sharp focus)
-        9. **Platform-Specific Elements**: Props or elements that work for {strategy_input.platform}
-        10. **Trending Aesthetics**: Current visual trends in {strategy_input.industry}
+        9. **Platform-Specific Elements**: Props or elements that work for {platform}
+        10. **Trending Aesthetics**: Current visual trends in {industry}
         
         EXAMPLE OF BAD IMAGE PROMPT (too vague):
         "Professional workspace with laptop showing dashboard, vibrant colors"
@@ -387,39 +717,37 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         
         Output a JSON object with:
         {{
-            "calendar": [... 12 calendar items optimized for {strategy_input.contentType} ...],
+            "calendar": [... 12 calendar items optimized for {contentType} ...],
             "sample_posts": [... 3 sample posts with DETAILED image prompts ...]
         }}
         
         Base everything on:
-        - Goal: {strategy_input.goal}
-        - Platform: {strategy_input.platform}
-        - Industry: {strategy_input.industry}
-        - Content Type: {strategy_input.contentType} (CRITICAL!)
+        - Goal: {goal}
+        - Platform: {platform}
+        - Industry: {industry}
+        - Content Type: {contentType} (CRITICAL!)
         - Audience insights from previous agents
         - Competitor gaps from previous agents
         - Strategic guidance from previous agents
         - Keywords from previous agents
         
-        Make every post strategically aligned with the goal, visually stunning, and optimized for {strategy_input.contentType}!
-        """,
-        agent=strategy_synthesizer,
+        Make every post strategically aligned with the goal, visually stunning, and optimized for {contentType}!
+        """),
         expected_output="JSON object with calendar and sample_posts arrays with professional image prompts optimized for content type",
-        context=[persona_task, gaps_task, strategy_guidance_task, keywords_task]
-    )
-
-    # ============================================================================
+        response_model=CalendarOutput,
+        context=("personas", "competitor_gaps", "strategic_guidance", "keywords"),
+    ),
     # TASK 6: ROI PREDICTION (NEW)
-    # ============================================================================
-    roi_task = Task(
-        description=f"""
+    "roi_prediction": TaskSpec(
+        agent="roi_predictor",
+        prompt=compile_prompt("""
         Based on the complete content strategy, predict measurable ROI outcomes:
         
         Context:
-        - Platform: {strategy_input.platform}
-        - Content Type: {strategy_input.contentType}
-        - Industry: {strategy_input.industry}
-        - Audience: {strategy_input.audience}
+        - Platform: {platform}
+        - Content Type: {contentType}
+        - Industry: {industry}
+        - Audience: {audience}
         
         Analyze the persona, keywords, and calendar to estimate:
         
@@ -431,112 +759,115 @@ def create_content_strategy_crew(strategy_input: StrategyInput) -> dict:
         - "time_to_results": Realistic timeline to see results (e.g., "30-45 days", "60-90 days")
         
         Base predictions on:
-        - Industry benchmarks ({strategy_input.industry} typical performance)
-        - Platform algorithms ({strategy_input.platform} engagement rates)
-        - Content type effectiveness ({strategy_input.contentType} performance data)
+        - Industry benchmarks ({industry} typical performance)
+        - Platform algorithms ({platform} engagement rates)
+        - Content type effectiveness ({contentType} performance data)
         - Audience size and growth potential
         - Keyword difficulty and search volume
         
         Be realistic and data-driven. Don't overpromise.
-        """,
-        agent=roi_predictor,
+        """),
         expected_output="JSON object with ROI predictions",
-        context=[persona_task, keywords_task, calendar_task]
-    )
-
-    # ============================================================================
-    # CREATE AND EXECUTE CREW
-    # ============================================================================
-    crew = Crew(
-        agents=[audience_surgeon, trend_sniper, traffic_architect, strategy_synthesizer, roi_predictor],
-        tasks=[persona_task, gaps_task, strategy_guidance_task, keywords_task, calendar_task, roi_task],
-        process=Process.sequential,  # Execute tasks in order
-        verbose=True,
-        max_rpm=10,      # Limit requests to avoid Groq RateLimitError
-        cache=True,      # Enable caching to save tokens/time on retries
-        share_crew=False # Privacy setting
-    )
-
-    # Execute the crew with inputs
-    result = crew.kickoff(inputs=strategy_input.dict())
-
-    # ============================================================================
-    # PARSE AND STRUCTURE OUTPUT
-    # ============================================================================
-    try:
-        # Extract outputs from each task
-        persona_output = persona_task.output.raw if hasattr(persona_task.output, 'raw') else str(persona_task.output)
-        gaps_output = gaps_task.output.raw if hasattr(gaps_task.output, 'raw') else str(gaps_task.output)
-        strategy_guidance_output = strategy_guidance_task.output.raw if hasattr(strategy_guidance_task.output, 'raw') else str(strategy_guidance_task.output)
-        keywords_output = keywords_task.output.raw if hasattr(keywords_task.output, 'raw') else str(keywords_task.output)
-        calendar_output = calendar_task.output.raw if hasattr(calendar_task.output, 'raw') else str(calendar_task.output)
-        roi_output = roi_task.output.raw if hasattr(roi_task.output, 'raw') else str(roi_task.output)
-
-        # Clean and parse JSON from each output
-        persona_data = clean_and_parse_json(persona_output)
-        gaps_data = clean_and_parse_json(gaps_output)
-        strategy_guidance_data = clean_and_parse_json(strategy_guidance_output)
-        keywords_data = clean_and_parse_json(keywords_output)
-        calendar_data = clean_and_parse_json(calendar_output)
-        roi_data = clean_and_parse_json(roi_output)
-
-        # Combine into final strategy
-        final_strategy = {
-            "personas": persona_data.get("personas", [persona_data]) if isinstance(persona_data, dict) else persona_data,
-            "competitor_gaps": gaps_data,
-            "strategic_guidance": strategy_guidance_data,
-            "keywords": keywords_data,
-            "calendar": calendar_data.get("calendar", []),
-            "sample_posts": calendar_data.get("sample_posts", []),
-            "roi_prediction": roi_data
-        }
-
-        return final_strategy
+        response_model=ROIPrediction,
+        context=("personas", "keywords", "calendar"),
+    ),
+}
 
-    except Exception as e:
-        raise ValueError(f"Failed to parse CrewAI output: {str(e)}")
+
+# Idle agent sets, one per concurrent generation at most. Agents keep per-call
+# executor state, so a set is lent to one run at a time and only returned when
+# no stage of that run can still be using it.
+_idle_agents = []
+_idle_agents_lock = threading.Lock()
+
+
+def _build_agents() -> dict:
+    return {
+        name: Agent(
+            role=spec.role,
+            goal=spec.goal,
+            backstory=spec.backstory,
+            verbose=settings.CREW_VERBOSE,
+            allow_delegation=False,
+            max_retry_limit=0,  # run_stages retries transient errors with backoff
+            tools=[serper_tool] if spec.uses_search and SERPAPI_ENABLED else [],  # Real keyword research!
+            llm=llm
+        )
+        for name, spec in AGENT_SPECS.items()
+    }
+
+
+def acquire_agents() -> dict:
+    """An idle set of agents (AGENT_SPECS key -> Agent), built on first use"""
+    with _idle_agents_lock:
+        agents = _idle_agents.pop() if _idle_agents else None
+    if agents is None:
+        agents = _build_agents()
+    # Fresh tool cache per run, as a new Crew(cache=True) used to give; it only
+    # holds tool results, so agents without tools keep the one they were built with
+    cache_handler = None
+    for agent in agents.values():
+        if agent.tools:
+            cache_handler = cache_handler or CacheHandler()
+            agent.set_cache_handler(cache_handler)
+        if agent.tools_results:
+            agent.tools_results = []
+    return agents
+
+
+def release_agents(agents: dict):
+    with _idle_agents_lock:
+        _idle_agents.append(agents)
+
+
+def build_tasks(strategy_input: StrategyInput, agents: dict) -> dict:
+    """Bind one request's inputs into TASK_SPECS: section name -> Task"""
+    tasks = {}
+    for section in SECTION_ORDER:
+        spec = TASK_SPECS[section]
+        tasks[section] = Task(
+            name=section,
+            description=bind_prompt(spec.prompt, strategy_input),
+            agent=agents[spec.agent],
+            expected_output=spec.expected_output,
+            response_model=spec.response_model,
+            context=[tasks[name] for name in spec.context] or None
+        )
+    return tasks
+
+
+def create_content_strategy_crew(strategy_input: StrategyInput,
+                                 on_section: Optional[Callable[[tuple], Any]] = None,
+                                 request_id: Optional[str] = None,
+                                 deadline: Optional[float] = None,
+                                 finish_in_background: bool = False) -> dict:
+    """
+    Creates and executes a 4-agent CrewAI workflow for content strategy generation
+    
+    Args:
+        strategy_input: Validated input containing goal, audience, industry, platform
+        on_section: Optional sink called with ("section", name, fields) as soon as
+            each task finishes (e.g. queue.put for streaming progress)
+        request_id: Checkpoint/resume key for finished tasks (see run_stages)
+        deadline: time.monotonic() when a (partial) result is due (see run_stages)
+        finish_in_background: Report a partial result at the deadline and keep going
+        
+    Returns:
+        dict: Complete content strategy matching ContentStrategy schema
+    """
+    # Groq rate limits are enforced cluster-wide by the LLM gateway (app.services.ratelimit).
+    # Scheduling is done by run_stages (DAG over context=), so no Crew object is needed
+    agents = acquire_agents()
+    tasks = build_tasks(strategy_input, agents)
+    result = run_stages(tasks, strategy_input, on_section, deadline, request_id, finish_in_background)
+    # After a deadline or an error, abandoned stages may still be running on these agents
+    if "provisional_sections" not in result:
+        release_agents(agents)
+    return result
 
 
 def clean_and_parse_json(text: str) -> dict | list:
     """
     Extract and parse JSON from text that might contain markdown code blocks or extra text
     """
-    # Remove markdown code blocks
-    text = text.strip()
-    if text.startswith("```json"):
-        text = text[7:]
-    elif text.startswith("```"):
-        text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    
-    text = text.strip()
-    
-    # Try to find JSON object or array
-    start_obj = text.find("{")
-    start_arr = text.find("[")
-    
-    if start_obj != -1 and (start_arr == -1 or start_obj < start_arr):
-        # Find matching closing brace
-        brace_count = 0
-        for i in range(start_obj, len(text)):
-            if text[i] == "{":
-                brace_count += 1
-            elif text[i] == "}":
-                brace_count -= 1
-                if brace_count == 0:
-                    text = text[start_obj:i+1]
-                    break
-    elif start_arr != -1:
-        # Find matching closing bracket
-        bracket_count = 0
-        for i in range(start_arr, len(text)):
-            if text[i] == "[":
-                bracket_count += 1
-            elif text[i] == "]":
-                bracket_count -= 1
-                if bracket_count == 0:
-                    text = text[start_arr:i+1]
-                    break
-    
-    return json.loads(text)
+    return extract_json(text)
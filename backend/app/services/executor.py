@@ -0,0 +1,170 @@
+"""
+Crew Executor - Runs blocking CrewAI generations off the event loop
+
+crew.kickoff() is fully synchronous and takes ~30s, so calling it directly from
+an `async def` route freezes every other request on the uvicorn worker.
+All crew work is dispatched to one bounded pool (threads or processes) whose
+size is the maximum number of strategies generating in parallel per worker.
+
+Admission to the pool goes through a PriorityGate: when all slots are busy,
+waiting requests are served by tier (settings.TIER_WEIGHTS), then by how many
+generations that user already has running (fair share), then FIFO.
+"""
+
+import asyncio
+import heapq
+import itertools
+import multiprocessing
+import queue
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.services.ratelimit import request_tier
+
+_executor: Optional[Executor] = None
+_gate: Optional["PriorityGate"] = None
+_manager = None
+
+
+class PriorityGate:
+    """Async semaphore whose waiters are ordered by (tier, user in-flight count, arrival)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._per_user = defaultdict(int)
+
+    async def acquire(self, tier: str = "free", user_id: Optional[str] = None):
+        if self.active < self.limit and not self._waiters:
+            self._admit(user_id)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        weight = settings.TIER_WEIGHTS.get(tier, 0)
+        heapq.heappush(self._waiters, (-weight, self._per_user.get(user_id, 0), next(self._seq), fut, user_id, tier))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Admitted just as the client went away - hand the slot on
+                self.release(user_id)
+            raise
+
+    def release(self, user_id: Optional[str] = None):
+        self.active -= 1
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+        self._wake()
+
+    def _admit(self, user_id: Optional[str]):
+        self.active += 1
+        self._per_user[user_id] += 1
+
+    def _wake(self):
+        while self._waiters and self.active < self.limit:
+            *_, fut, user_id, _tier = heapq.heappop(self._waiters)
+            if fut.done():
+                continue  # cancelled while waiting
+            self._admit(user_id)
+            fut.set_result(None)
+
+    def stats(self) -> dict:
+        waiting_by_tier = defaultdict(int)
+        for *_, fut, _user_id, tier in self._waiters:
+            if not fut.done():
+                waiting_by_tier[tier] += 1
+        return {"running": self.active, "waiting": sum(waiting_by_tier.values()),
+                "waiting_by_tier": dict(waiting_by_tier)}
+
+
+def get_crew_executor() -> Executor:
+    """Lazily create the shared crew pool (thread or process, per settings)"""
+    global _executor
+    if _executor is None:
+        workers = max(1, settings.CREW_MAX_CONCURRENCY)
+        if settings.CREW_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crew")
+        print(f"[EXECUTOR] Crew executor ready ({settings.CREW_EXECUTOR} pool, max {workers} concurrent)")
+    return _executor
+
+
+def _get_gate() -> PriorityGate:
+    global _gate
+    if _gate is None:
+        _gate = PriorityGate(max(1, settings.CREW_MAX_CONCURRENCY))
+    return _gate
+
+
+def _run_as_tier(tier: str, fn: Callable, *args):
+    # Pool threads/processes don't inherit the caller's contextvars
+    request_tier.set(tier)
+    return fn(*args)
+
+
+async def run_in_crew_executor(fn: Callable, *args, tier: str = "free", user_id: Optional[str] = None):
+    """
+    Await a blocking crew function on the shared pool, queued by tier priority.
+
+    In process mode `fn` and its arguments must be picklable
+    (module-level functions and Pydantic models are).
+    """
+    gate = _get_gate()
+    await gate.acquire(tier, user_id)
+    loop = asyncio.get_running_loop()
+    try:
+        future = get_crew_executor().submit(partial(_run_as_tier, tier, fn, *args))
+    except BaseException:
+        gate.release(user_id)
+        raise
+
+    def release(_):
+        # Cancelling the awaiting request doesn't stop a crew that already started,
+        # so the slot is only handed on once the pool has finished with it
+        try:
+            loop.call_soon_threadsafe(gate.release, user_id)
+        except RuntimeError:
+            pass  # event loop closed (shutdown)
+
+    future.add_done_callback(release)
+    return await asyncio.wrap_future(future)
+
+
+def make_progress_queue():
+    """
+    Queue that crew code running on the pool can report progress into.
+    Process workers need a Manager-backed queue; threads use a plain one.
+    """
+    global _manager
+    if settings.CREW_EXECUTOR == "process":
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+        return _manager.Queue()
+    return queue.Queue()
+
+
+def get_executor_stats() -> dict:
+    """Snapshot of pool usage for the health endpoint"""
+    return {
+        "mode": settings.CREW_EXECUTOR,
+        "max_concurrency": max(1, settings.CREW_MAX_CONCURRENCY),
+        **_get_gate().stats(),
+    }
+
+
+def shutdown_crew_executor():
+    """Release pool workers on application shutdown"""
+    global _executor, _manager
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
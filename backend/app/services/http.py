@@ -0,0 +1,91 @@
+"""
+LLM HTTP Clients - One pooled, keep-alive connection pool per process
+
+Every ChatGroq instance (one per model/temperature) and the fallback OpenAI
+client used to build its own httpx pool, so connections were spread thin and
+each new one paid DNS + TCP + TLS. They now all share these clients:
+    - sync client: used by crew tasks on the executor threads (CrewAI calls are blocking)
+    - async client: used by ChatGroq's ainvoke/astream
+Pool limits and keep-alive come from LLM_HTTP_*. warm_up_llm_connections()
+opens a few connections at startup so the first request skips the handshake.
+
+Clients are created lazily, so each process of a process pool gets its own.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+GROQ_API_BASE = "https://api.groq.com"
+
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT)
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+    return _http_client
+
+
+def get_http_async_client() -> httpx.AsyncClient:
+    global _http_async_client
+    if _http_async_client is None:
+        with _lock:
+            if _http_async_client is None:
+                _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+    return _http_async_client
+
+
+def warm_up_llm_connections() -> int:
+    """
+    Open LLM_HTTP_WARM_CONNECTIONS keep-alive connections to Groq (concurrently,
+    so they are distinct connections). Returns how many succeeded.
+    """
+    if not settings.GROQ_API_KEY or settings.LLM_HTTP_WARM_CONNECTIONS <= 0:
+        return 0
+    client = get_http_client()
+
+    def touch(_):
+        try:
+            client.get(f"{GROQ_API_BASE}/openai/v1/models",
+                       headers={"Authorization": f"Bearer {settings.GROQ_API_KEY}"})
+            return True
+        except httpx.HTTPError as e:
+            print(f"[WARNING] LLM connection warm-up failed: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=settings.LLM_HTTP_WARM_CONNECTIONS) as pool:
+        warmed = sum(pool.map(touch, range(settings.LLM_HTTP_WARM_CONNECTIONS)))
+    print(f"[HTTP] Warmed {warmed} Groq connection(s)")
+    return warmed
+
+
+async def close_http_clients():
+    global _http_client, _http_async_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+        _http_async_client = None
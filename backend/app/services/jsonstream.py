@@ -0,0 +1,231 @@
+"""
+Streaming JSON - Parse LLM output while it is still arriving
+
+IncrementalJSONParser consumes completion chunks as Groq streams them and
+returns each element of the interesting arrays (the root array, or any array
+directly under a root-object key such as {"personas": [...]}) the moment that
+element closes. It is string-aware - braces inside "..." never count - and
+jumps between structural characters with a regex instead of looping over
+every character, so it also holds up on 10-50 KB outputs.
+
+Payload arrays hold objects (personas, keywords, ...). A root array with plain
+values in it ("see [1, 2] below") is taken for prose: its values are never
+emitted, and a JSON value after it is preferred.
+
+extract_json() is the non-streaming counterpart used on complete text.
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_STRUCTURAL = re.compile(r'[{}\[\]",]')
+_JSON_START = re.compile(r"[{\[]")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_decoder = json.JSONDecoder()
+
+
+def _is_prose_array(value: Any) -> bool:
+    return isinstance(value, list) and any(not isinstance(item, (dict, list)) for item in value)
+
+
+def extract_json(text: str) -> Any:
+    """
+    First JSON object/array in `text`, ignoring markdown fences and prose around it.
+    raw_decode does the bracket matching in C (and respects strings). A candidate
+    that fails right after its opening bracket was prose ("[see below]"), so the
+    next one is tried; one that fails later is broken JSON and raises. An array of
+    plain values is only returned when no other JSON follows it.
+    """
+    prose = None
+    match = _JSON_START.search(text)
+    while match is not None:
+        try:
+            value, end = _decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError as e:
+            if e.pos > match.start() + 1:
+                raise
+            match = _JSON_START.search(text, match.start() + 1)
+            continue
+        if not _is_prose_array(value):
+            return value
+        if prose is None:
+            prose = value
+        match = _JSON_START.search(text, end)
+    if prose is not None:
+        return prose
+    raise json.JSONDecodeError("No JSON object or array found", text, 0)
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "tracked", "separator", "closed", "index", "expect_key", "scalars")
+
+    def __init__(self, kind: str, start: int, key: Optional[str], tracked: bool):
+        self.kind = kind            # "{" or "["
+        self.start = start
+        self.key = key              # root-object key this array belongs to
+        self.tracked = tracked      # emit this array's elements?
+        self.separator = start      # index of the last "[" or ","
+        self.closed = False         # current element already emitted
+        self.index = 0
+        self.expect_key = kind == "{"
+        self.scalars = False        # a plain value sat directly in this array
+
+
+class IncrementalJSONParser:
+    """
+    feed() text chunks, get back (path, index, element) for every array element
+    that completed in them. path is the root-object key, or None for a root array.
+    Only the new chunk is scanned on each feed; the full text is joined lazily.
+    """
+
+    def __init__(self):
+        self.root = -1
+        self.end = -1
+        self._parts: List[str] = []
+        self._size = 0
+        self._text = ""
+        self._stack: List[_Frame] = []
+        self._string_start = -1
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self.end >= 0
+
+    @property
+    def text(self) -> str:
+        if len(self._text) != self._size:
+            self._text = "".join(self._parts)
+            self._parts = [self._text]
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[Optional[str], int, Any]]:
+        events = []
+        while chunk and not self.done:
+            chunk = self._scan(chunk, events)
+        return events
+
+    def _scan(self, chunk: str, events: list) -> str:
+        """Scan one chunk; returns text that has to be scanned again (after a prose bracket), else "" """
+        base = self._size
+        self._parts.append(chunk)
+        self._size += len(chunk)
+        pos, n = 0, len(chunk)
+
+        while pos < n:
+            if self._string_start >= 0:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                    continue
+                self._end_string(self._string_start, base + match.start())
+                self._string_start = -1
+                continue
+
+            match = (_STRUCTURAL if self.root >= 0 else _JSON_START).search(chunk, pos)
+            if match is None:
+                break
+            char, i = match.group(), base + match.start()
+            pos = match.end()
+
+            if char == '"':
+                self._string_start = i
+            elif char in "{[":
+                self._open(char, i)
+            elif char in "}]":
+                frame = self._close(i, events)
+                if not self._stack:
+                    if not frame.scalars and self._root_is_valid(i):
+                        self.end = i + 1
+                        break
+                    # Prose bracket, not the payload - rescan everything after it
+                    text, restart = self.text, self.root + 1
+                    self.root = -1
+                    self._parts, self._size, self._text = [text[:restart]], restart, ""
+                    return text[restart:]
+            else:  # ","
+                frame = self._stack[-1]
+                if frame.tracked:
+                    self._emit_scalar(frame, i, events)
+                if frame.kind == "{":
+                    frame.expect_key = True
+
+        return ""
+
+    def result(self) -> Any:
+        """The complete document (call once the stream has ended)"""
+        if self.done:
+            return json.loads(self.text[self.root:self.end])
+        return extract_json(self.text)
+
+    # ------------------------------------------------------------------
+
+    def _open(self, char: str, i: int):
+        if self.root < 0:
+            self.root = i
+        parent = self._stack[-1] if self._stack else None
+        key = None
+        if char == "[":
+            if parent is None:
+                tracked = True
+            else:
+                tracked = len(self._stack) == 1 and parent.kind == "{"
+                key = parent.key if tracked else None
+        else:
+            tracked = False
+        if parent is not None and parent.kind == "{":
+            parent.expect_key = False
+        self._stack.append(_Frame(char, i, key, tracked))
+
+    def _close(self, i: int, events: list) -> _Frame:
+        frame = self._stack.pop()
+        if frame.tracked:
+            self._emit_scalar(frame, i, events)
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None and parent.tracked:
+            self._emit(parent, self.text[frame.start:i + 1], events)
+            parent.closed = True
+        return frame
+
+    def _end_string(self, start: int, end: int):
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame.kind == "{" and frame.expect_key:
+            frame.expect_key = False
+            if len(self._stack) == 1:
+                try:
+                    frame.key = json.loads(self.text[start:end + 1])
+                except ValueError:
+                    frame.key = None
+
+    def _emit_scalar(self, frame: _Frame, i: int, events: list):
+        """Element ending at a "," or "]" that was not a container (string/number/literal)"""
+        if not frame.closed:
+            candidate = self.text[frame.separator + 1:i].strip()
+            if candidate and frame.key is None and frame.start == self.root:
+                frame.scalars = True  # root array of plain values - prose, see module docstring
+            elif candidate:
+                self._emit(frame, candidate, events)
+        frame.separator = i
+        frame.closed = False
+
+    def _emit(self, frame: _Frame, raw: str, events: list):
+        try:
+            events.append((frame.key, frame.index, json.loads(raw)))
+        except ValueError:
+            return
+        frame.index += 1
+
+    def _root_is_valid(self, i: int) -> bool:
+        try:
+            json.loads(self.text[self.root:i + 1])
+            return True
+        except ValueError:
+            return False
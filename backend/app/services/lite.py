@@ -0,0 +1,146 @@
+"""
+Lite Mode - Whole strategy from a single structured LLM call
+
+The full crew makes six LLM calls per strategy. Lite mode asks for every
+ContentStrategy section in one call against the schema in app.models.schemas,
+trading some depth for a fraction of the latency and tokens (free tier default,
+see settings.LITE_MODE_TIERS). The call goes through a GatewayLLM like the crew,
+so it shares the response cache, the Groq budget and the provider's JSON mode
+(settings.LLM_STRUCTURED_OUTPUT). An answer that does not parse, or has
+sections that fail validation, is evicted from the response cache so the next
+request asks again instead of replaying it.
+"""
+
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Optional
+
+from pydantic import create_model
+
+from app.models.schemas import StrategyInput, ContentStrategy
+from app.services.crew import demo_section, fill_provisional
+from app.services.llm import GatewayLLM, stream_sink, cache_key_log, call_cancelled, evict_cached_responses
+from app.services.repair import SectionError, count_parse, load_json, validate_section
+
+# Sample posts come from the deterministic blueprint (see build_strategy)
+LITE_SECTIONS = ["personas", "competitor_gaps", "strategic_guidance", "keywords", "calendar", "roi_prediction"]
+
+# ContentStrategy without the sections lite mode does not ask for; it is both
+# the schema in the prompt and the response_model for the provider's JSON mode
+LiteStrategy = create_model(
+    "LiteStrategy",
+    **{name: (field.annotation, field) for name, field in ContentStrategy.model_fields.items()
+       if name in LITE_SECTIONS},
+)
+LITE_SCHEMA = json.dumps(LiteStrategy.model_json_schema(), separators=(",", ":"))
+
+# Routed as "lite" in settings.LLM_ROUTES (falls back to the default route)
+lite_llm = GatewayLLM(route="lite")
+
+
+def _call(messages: list, deadline: Optional[float]) -> str:
+    """lite_llm.call, given up on at `deadline` (time.monotonic()) - TimeoutError then"""
+    if deadline is None:
+        return lite_llm.call(messages, response_model=LiteStrategy)
+    abandoned = threading.Event()
+
+    def call() -> str:
+        call_cancelled.set(abandoned)  # no fallback-model retry once we've given up
+        return lite_llm.call(messages, response_model=LiteStrategy)
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lite")
+    try:
+        future = pool.submit(contextvars.copy_context().run, call)
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        abandoned.set()
+        raise TimeoutError("lite generation passed the request deadline") from None
+    finally:
+        pool.shutdown(wait=False)
+
+
+def generate_lite_strategy(strategy_input: StrategyInput,
+                           on_section: Optional[Callable[[tuple], Any]] = None,
+                           deadline: Optional[float] = None) -> dict:
+    """
+    Generate all strategy sections with one LLM call
+
+    Args:
+        deadline: time.monotonic() by which the caller needs a result; past it every
+            section comes from the demo strategy, listed in "provisional_sections"
+
+    Returns:
+        dict: ContentStrategy-shaped sections (without sample_posts)
+    """
+    messages = [
+        {"role": "system", "content": (
+            "You are a senior content strategist. Reply with ONE JSON object that validates "
+            "against this JSON Schema. No markdown, no commentary.\n" + LITE_SCHEMA
+        )},
+        {"role": "user", "content": f"""
+        Business Goal: {strategy_input.goal}
+        Target Audience: {strategy_input.audience}
+        Industry: {strategy_input.industry}
+        Platform: {strategy_input.platform}
+        Content Type: {strategy_input.contentType}
+        Experience Level: {strategy_input.experience}
+
+        Include: 3 distinct personas (different age ranges, specific to {strategy_input.industry}),
+        5 competitor gaps, strategic guidance with 5 items per list, 10 keywords (Easy to Medium)
+        with 5 {strategy_input.platform} hashtags each, 12 calendar items across weeks 1-4
+        matching {strategy_input.contentType}, and a realistic ROI prediction.
+        """},
+    ]
+
+    # Root keys of the lite document are the section names
+    sink_token = stream_sink.set(
+        (lambda path, index, item: on_section(("item", path, {"path": path, "index": index, "item": item})))
+        if on_section else None
+    )
+    cache_keys = []
+    log_token = cache_key_log.set(cache_keys)
+    try:
+        raw = _call(messages, deadline)
+    except TimeoutError:
+        print("[DEADLINE] Lite call still running at the deadline, returning demo sections")
+        return fill_provisional({}, LITE_SECTIONS, strategy_input)
+    finally:
+        cache_key_log.reset(log_token)
+        stream_sink.reset(sink_token)
+    try:
+        data = load_json("lite", raw)
+        if not isinstance(data, dict):
+            raise SectionError("lite", "not a JSON object")
+    except SectionError:
+        count_parse("lite", "rejected")
+        evict_cached_responses(cache_keys)
+        raise
+
+    # Keep every section that validates; fill the rest from the demo strategy
+    strategy, fallback_sections = {}, []
+    for section in LITE_SECTIONS:
+        try:
+            if section not in data:
+                raise SectionError(section, "missing")
+            strategy[section] = validate_section(section, data[section])
+        except SectionError as e:
+            print(f"[REPAIR] lite {e}, using demo data for this section")
+            strategy[section] = demo_section(section, strategy_input)[section]
+            fallback_sections.append(section)
+    if fallback_sections:
+        # Don't let the response cache replay an answer with demo-filled sections
+        evict_cached_responses(cache_keys)
+    if len(fallback_sections) == len(LITE_SECTIONS):
+        count_parse("lite", "rejected")
+        raise ValueError("Lite generation returned no usable sections")
+    count_parse("lite", "parsed")
+
+    if on_section:
+        for section in LITE_SECTIONS:
+            on_section(("section", section, {section: strategy[section]}))
+    if fallback_sections:
+        strategy["fallback_sections"] = fallback_sections
+    return strategy
@@ -0,0 +1,441 @@
+"""
+LLM Gateway - The single path every crew LLM call goes through
+
+CrewAI accepts any BaseLLM subclass, so agents are given a GatewayLLM instead
+of a bare ChatGroq. The gateway uses ChatGroq as its transport and adds:
+    - a persistent response cache shared across crew runs and workers, keyed
+      by model + temperature + a hash of the rendered prompt (Redis or diskcache)
+    - the cluster-wide Groq request/token budget (app.services.ratelimit)
+    - per-task model routing with a fallback model (settings.LLM_ROUTES)
+    - token streaming into an incremental JSON parser when a `stream_sink`
+      is set, so array items reach the client before the completion ends
+    - the provider's JSON / structured-output mode for tasks bound to a schema
+      (Task.response_model, settings.LLM_STRUCTURED_OUTPUT)
+    - a circuit breaker around Groq (app.services.breaker); while it is open,
+      calls fail over to a secondary OpenAI-compatible endpoint
+      (LLM_FALLBACK_BASE_URL) or fail fast
+"""
+
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+from crewai.llms.base_llm import BaseLLM
+from groq import APIStatusError as GroqStatusError
+from langchain_groq import ChatGroq
+from openai import APIStatusError as OpenAIStatusError, OpenAI
+
+from app.core.config import settings
+from app.core.database import redis_client, REDIS_ENABLED
+from app.services.breaker import CircuitOpenError, get_breaker
+from app.services.http import get_http_client, get_http_async_client
+from app.services.jsonstream import IncrementalJSONParser
+from app.services.ratelimit import acquire_llm_budget, settle_llm_budget, estimate_tokens
+from app.services.retry import is_transient
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# Set (per stage / request) to receive (path, index, item) for each JSON array
+# element as the completion streams in. Unset = plain blocking call.
+stream_sink = contextvars.ContextVar("stream_sink", default=None)
+
+# Set to a list to collect the cache keys of every completion made meanwhile,
+# so a caller that rejects the output can evict it (evict_cached_responses)
+cache_key_log = contextvars.ContextVar("cache_key_log", default=None)
+
+# Set to True by a caller that validates, repairs and evicts what it gets back
+# (run_stages): output Groq rejected in JSON mode is then returned for repair
+# instead of raising. It is never cached and never counts as a healthy call.
+accept_failed_generation = contextvars.ContextVar("accept_failed_generation", default=False)
+
+# Set to a threading.Event by a caller that may walk away from the work (run_stages
+# past its deadline). Once the event is set, further calls raise CallCancelled
+# instead of spending Groq budget on an answer nobody will read.
+call_cancelled = contextvars.ContextVar("call_cancelled", default=None)
+
+
+class CallCancelled(RuntimeError):
+    """The caller no longer wants this call's result"""
+
+
+# ============================================================================
+# RESPONSE CACHE
+# ============================================================================
+
+class RedisLLMCache:
+    """Completions in Redis with a TTL - shared by every API node and worker"""
+    prefix = "llmcache:"
+
+    def get(self, key: str) -> Optional[str]:
+        return redis_client.get(f"{self.prefix}{key}")
+
+    def set(self, key: str, value: str):
+        redis_client.setex(f"{self.prefix}{key}", settings.LLM_CACHE_TTL, value)
+
+    def delete(self, key: str):
+        redis_client.delete(f"{self.prefix}{key}")
+
+
+class DiskLLMCache:
+    """Completions on local disk, size-bounded with LRU eviction (single host)"""
+
+    def __init__(self):
+        self._cache = diskcache.Cache(
+            settings.LLM_CACHE_DIR,
+            size_limit=settings.LLM_CACHE_MAX_BYTES,
+            eviction_policy="least-recently-used",
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str):
+        self._cache.set(key, value, expire=settings.LLM_CACHE_TTL)
+
+    def delete(self, key: str):
+        self._cache.delete(key)
+
+
+def _build_response_cache():
+    backend = settings.LLM_CACHE_BACKEND
+    if backend == "off":
+        return None
+    if backend == "redis" or (backend == "auto" and REDIS_ENABLED):
+        if REDIS_ENABLED:
+            return RedisLLMCache()
+        print("⚠️  LLM cache: Redis unavailable, falling back to disk")
+    if diskcache is None:
+        print("⚠️  LLM cache: diskcache not installed. LLM response cache disabled.")
+        return None
+    return DiskLLMCache()
+
+
+response_cache = _build_response_cache()
+
+_cache_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+def _count(outcome: str):
+    with _stats_lock:
+        _cache_stats[outcome] += 1
+
+def get_llm_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 3) if total else None
+    stats["backend"] = type(response_cache).__name__ if response_cache else "off"
+    return stats
+
+
+_token_stats = {}  # task/route -> {"calls", "prompt_tokens", "completion_tokens"}
+
+def _record_tokens(label: str, usage: dict):
+    prompt = usage.get("input_tokens", 0)
+    completion = usage.get("output_tokens", 0)
+    with _stats_lock:
+        stats = _token_stats.setdefault(label, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt
+        stats["completion_tokens"] += completion
+    print(f"[TOKENS] {label}: prompt={prompt} completion={completion}")
+
+def get_token_stats() -> dict:
+    """Groq token usage per task since process start (cache hits excluded)"""
+    with _stats_lock:
+        return {label: dict(stats) for label, stats in _token_stats.items()}
+
+
+def prompt_cache_key(model: str, temperature: Optional[float], messages: list, stop: list,
+                     response_format: Optional[dict] = None) -> str:
+    """Stable key for one completion request"""
+    request = {"messages": messages, "stop": stop}
+    if response_format:
+        request["response_format"] = response_format
+    prompt_hash = hashlib.sha256(
+        json.dumps(request, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{model}|{temperature}|{prompt_hash}"
+
+
+# ============================================================================
+# MODEL ROUTING
+# ============================================================================
+
+class ModelRoute(NamedTuple):
+    model: str
+    temperature: float
+    fallback: Optional[str]
+
+
+def resolve_route(*names: Optional[str]) -> ModelRoute:
+    """First configured route among `names` (task name, agent role, ...) else "default" """
+    routes = settings.LLM_ROUTES
+    for name in names:
+        if name and name in routes:
+            route = {**routes["default"], **routes[name]}
+            break
+    else:
+        route = routes["default"]
+    return ModelRoute(route["model"], float(route.get("temperature", 0.7)), route.get("fallback"))
+
+
+def is_model_error(error: Exception) -> bool:
+    """
+    The provider answered with an error for this model (unknown/decommissioned
+    model, its own rate limit, a 5xx) - worth one try on the route's fallback model.
+    Budget timeouts, an open circuit and connection errors would fail it the same way.
+    """
+    return isinstance(error, (GroqStatusError, OpenAIStatusError))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get_client(model: str, temperature: float) -> ChatGroq:
+    """One ChatGroq per (model, temperature), created lazily and shared by all crews"""
+    key = (model, temperature)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = ChatGroq(
+                    model=model.split("/", 1)[1] if model.startswith("groq/") else model,
+                    temperature=temperature,
+                    groq_api_key=settings.GROQ_API_KEY,
+                    request_timeout=settings.LLM_REQUEST_TIMEOUT,
+                    # One keep-alive pool for every model (app.services.http)
+                    http_client=get_http_client(),
+                    http_async_client=get_http_async_client(),
+                )
+    return client
+
+
+_fallback_client: Optional[OpenAI] = None
+
+def _get_fallback_client() -> Optional[OpenAI]:
+    """Secondary OpenAI-compatible endpoint (vLLM, Ollama, OpenAI...), or None if not configured"""
+    global _fallback_client
+    if _fallback_client is None and settings.LLM_FALLBACK_BASE_URL:
+        with _clients_lock:
+            if _fallback_client is None:
+                _fallback_client = OpenAI(
+                    base_url=settings.LLM_FALLBACK_BASE_URL,
+                    api_key=settings.LLM_FALLBACK_API_KEY or "unused",
+                    timeout=settings.LLM_REQUEST_TIMEOUT,
+                    max_retries=0,
+                    http_client=get_http_client(),
+                )
+    return _fallback_client
+
+
+def _check_cancelled():
+    cancelled = call_cancelled.get()
+    if cancelled is not None and cancelled.is_set():
+        raise CallCancelled("LLM call abandoned by its caller")
+
+
+def _feed(parser: IncrementalJSONParser, sink, text: str):
+    for path, index, item in parser.feed(text):
+        sink(path, index, item)
+
+
+def _failed_generation(error: Exception) -> Optional[str]:
+    """The model's output when Groq rejected it for not being valid JSON (JSON mode), else None"""
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        body = body.get("error", body)
+    if isinstance(body, dict) and body.get("code") == "json_validate_failed":
+        return body.get("failed_generation") or None
+    return None
+
+
+# ============================================================================
+# GATEWAY LLM (CrewAI adapter)
+# ============================================================================
+
+class GatewayLLM(BaseLLM):
+    """
+    CrewAI LLM backed by ChatGroq, with a shared response cache.
+    Each call is routed by task name / agent role (settings.LLM_ROUTES) unless
+    the instance is pinned to a route, and retried once on the route's fallback model.
+    A call with a response_model (CrewAI passes Task.response_model) asks for JSON output.
+    """
+
+    def __init__(self, route: Optional[str] = None, **kwargs: Any):
+        default = resolve_route(route)
+        super().__init__(model=default.model, temperature=default.temperature, provider="groq", **kwargs)
+        self.route = route
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None) -> str:
+        _check_cancelled()
+        messages = self._format_messages(messages)
+        stop = list(self.stop or [])
+        if self.route:
+            label = self.route
+            route = resolve_route(self.route)
+        else:
+            label = getattr(from_task, "name", None) or "default"
+            route = resolve_route(getattr(from_task, "name", None), getattr(from_agent, "role", None))
+        response_format = self._response_format(response_model, from_agent)
+
+        try:
+            return self._complete(route.model, route.temperature, messages, stop, label, response_format)
+        except Exception as e:
+            if not route.fallback or route.fallback == route.model or not is_model_error(e):
+                raise
+            _check_cancelled()
+            print(f"[WARNING] {route.model} failed ({e}), retrying on {route.fallback}")
+            return self._complete(route.fallback, route.temperature, messages, stop, label, response_format)
+
+    def _response_format(self, response_model, from_agent) -> Optional[dict]:
+        """Provider output mode for a call bound to a schema (settings.LLM_STRUCTURED_OUTPUT)"""
+        mode = settings.LLM_STRUCTURED_OUTPUT
+        if response_model is None or mode not in ("json_object", "json_schema"):
+            return None
+        # An agent with tools must still be able to answer "Action: ..." in ReAct text
+        if getattr(from_agent, "tools", None):
+            return None
+        if mode == "json_schema":
+            return {"type": "json_schema", "json_schema": {
+                "name": response_model.__name__, "schema": response_model.model_json_schema()}}
+        return {"type": "json_object"}
+
+    def _complete(self, model: str, temperature: float, messages: list, stop: list,
+                  label: str = "default", response_format: Optional[dict] = None) -> str:
+        key = prompt_cache_key(model, temperature, messages, stop, response_format)
+        key_log = cache_key_log.get()
+        if key_log is not None:
+            key_log.append(key)
+        if response_cache is not None:
+            try:
+                cached = response_cache.get(key)
+            except Exception:
+                cached = None
+            if cached:
+                _count("hits")
+                return cached
+            _count("misses")
+
+        groq = get_breaker("groq")
+        failed_over = not groq.allow()
+        rejected = False
+        if not failed_over:
+            text, usage, rejected = self._complete_groq(groq, model, temperature, messages, stop, response_format)
+        elif _get_fallback_client() is not None:
+            print(f"[BREAKER] Groq circuit open, {label} served by {settings.LLM_FALLBACK_MODEL}")
+            text, usage = self._invoke_fallback(temperature, messages, stop, response_format)
+        else:
+            raise CircuitOpenError("Groq circuit open and no LLM_FALLBACK_BASE_URL configured")
+        if usage:
+            self._track_token_usage_internal(usage)
+            _record_tokens(label, usage)
+
+        # Fallback answers are not cached under the Groq model's key, output Groq rejected not at all
+        if response_cache is not None and text.strip() and not failed_over and not rejected:
+            try:
+                response_cache.set(key, text)
+            except Exception as e:
+                print(f"[WARNING] LLM cache write failed: {e}")
+        return text
+
+    def _complete_groq(self, breaker, model: str, temperature: float, messages: list, stop: list,
+                       response_format: Optional[dict] = None) -> tuple[str, dict, bool]:
+        """(text, usage, rejected) - rejected: Groq's JSON validation failed, text is the raw output"""
+        estimated = estimate_tokens(messages)
+        try:
+            acquire_llm_budget(estimated, model)
+        except Exception:
+            breaker.cancel()  # a budget timeout says nothing about Groq's health
+            raise
+        started = time.monotonic()
+        try:
+            text, usage = self._invoke(_get_client(model, temperature), messages, stop, response_format)
+        except Exception as e:
+            text = _failed_generation(e) if accept_failed_generation.get() else None
+            if text is None:
+                settle_llm_budget(estimated, 0, model)
+                breaker.record(not is_transient(e), time.monotonic() - started)
+                raise
+            # JSON mode rejected the output; the caller's section repair may still salvage it.
+            # Says nothing either way about Groq's health, so only free a half-open probe
+            breaker.cancel()
+            print(f"[REPAIR] {model} output failed Groq's JSON validation, passing it on for repair")
+            return text, {}, True
+        breaker.record(True, time.monotonic() - started)
+        settle_llm_budget(estimated, usage.get("total_tokens", estimated), model)
+        return text, usage, False
+
+    def _invoke(self, client: ChatGroq, messages: list, stop: list,
+                response_format: Optional[dict] = None) -> tuple[str, dict]:
+        sink = stream_sink.get()
+        if response_format:
+            # Structured responses aren't streamed; their items reach the sink once complete
+            response = client.invoke(messages, stop=stop or None, response_format=response_format)
+            if sink is not None and isinstance(response.content, str):
+                _feed(IncrementalJSONParser(), sink, response.content)
+        elif sink is None:
+            response = client.invoke(messages, stop=stop or None)
+        else:
+            parser = IncrementalJSONParser()
+            response = None
+            for chunk in client.stream(messages, stop=stop or None):
+                response = chunk if response is None else response + chunk
+                if isinstance(chunk.content, str):
+                    _feed(parser, sink, chunk.content)
+            if response is None:
+                raise ValueError("Empty streamed completion")
+        text = response.content if isinstance(response.content, str) else str(response.content)
+        return text, dict(response.usage_metadata or {})
+
+    def _invoke_fallback(self, temperature: float, messages: list, stop: list,
+                         response_format: Optional[dict] = None) -> tuple[str, dict]:
+        request = dict(model=settings.LLM_FALLBACK_MODEL, messages=messages,
+                       temperature=temperature, stop=stop or None)
+        if response_format:
+            request["response_format"] = response_format
+        sink = stream_sink.get()
+        if sink is None:
+            response = _get_fallback_client().chat.completions.create(**request)
+            text, usage = response.choices[0].message.content or "", response.usage
+        else:
+            parser = IncrementalJSONParser()
+            parts, usage = [], None
+            for chunk in _get_fallback_client().chat.completions.create(
+                    **request, stream=True, stream_options={"include_usage": True}):
+                usage = chunk.usage or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    _feed(parser, sink, delta)
+            text = "".join(parts)
+        if usage is None:
+            return text, {}
+        return text, {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens,
+                      "total_tokens": usage.total_tokens}
+
+    def supports_function_calling(self) -> bool:
+        # Tools go through CrewAI's ReAct prompting
+        return False
+
+    def get_context_window_size(self) -> int:
+        return settings.LLM_CONTEXT_WINDOW
+
+
+def evict_cached_responses(keys: list):
+    """Forget cached completions (e.g. ones whose output failed validation)"""
+    if response_cache is None:
+        return
+    for key in keys:
+        try:
+            response_cache.delete(key)
+        except Exception:
+            pass
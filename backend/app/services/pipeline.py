@@ -0,0 +1,206 @@
+"""
+Strategy Pipeline - The end-to-end generation flow shared by the API and the worker
+
+build_strategy() is blocking (it runs the crew) and must be called from the
+crew executor or a worker process, never directly on the event loop.
+"""
+
+import time
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.database import strategies_collection, redis_client, REDIS_ENABLED
+from app.models.schemas import StrategyInput
+from app.services.crew import create_content_strategy_crew, fill_provisional, SECTION_ORDER
+from app.services.lite import generate_lite_strategy
+from app.services.logic import generate_experience_based_strategy, generate_demo_strategy
+
+
+STRATEGY_MODES = ("full", "lite")
+
+
+def resolve_mode(requested: Optional[str], tier: str) -> str:
+    """Explicit ?mode= wins; otherwise tiers in LITE_MODE_TIERS default to lite"""
+    if requested in STRATEGY_MODES:
+        return requested
+    return "lite" if tier in settings.LITE_MODE_TIERS else "full"
+
+
+def _blueprint(strategy_input: StrategyInput) -> tuple[str, list]:
+    blueprint_input = strategy_input.dict()
+    blueprint_input["topic"] = strategy_input.goal[:50]
+    return generate_experience_based_strategy(blueprint_input)
+
+
+def build_draft(strategy_input: StrategyInput) -> dict:
+    """
+    Instant deterministic strategy (demo sections + blueprint, no LLM) served
+    while the crew runs; every section is listed as provisional
+    """
+    blueprint_html, sample_posts = _blueprint(strategy_input)
+    draft = fill_provisional({}, SECTION_ORDER, strategy_input)
+    draft["tactical_blueprint"] = blueprint_html
+    draft["sample_posts"] = sample_posts
+    return draft
+
+
+def build_strategy(strategy_input: StrategyInput,
+                   on_section: Optional[Callable[[tuple], Any]] = None,
+                   mode: str = "full",
+                   request_id: Optional[str] = None,
+                   deadline_at: Optional[float] = None,
+                   finish_in_background: bool = False) -> tuple[dict, str]:
+    """
+    Generate a complete strategy: deterministic blueprint + CrewAI output
+    (or demo fallback). mode="lite" replaces the crew with a single LLM call.
+
+    `on_section` receives each crew section as soon as its task finishes
+    (see create_content_strategy_crew). With a `request_id` (the job id) finished
+    crew tasks are checkpointed, so a redelivered job resumes instead of restarting.
+
+    `deadline_at` (epoch seconds) bounds the crew: unfinished sections are then
+    filled from the demo strategy and listed in "provisional_sections". With
+    `finish_in_background` the crew keeps going and that partial result is sent
+    to `on_section` as ("partial", None, {"strategy", "message"}) instead.
+
+    Returns:
+        tuple: (strategy_dict, status_message)
+    """
+    start_time = time.time()
+    # Epoch -> monotonic here, so time spent queueing for the executor counts
+    deadline = time.monotonic() + max(0.0, deadline_at - time.time()) if deadline_at else None
+
+    # 1. Blueprint Logic
+    blueprint_html, sample_posts = _blueprint(strategy_input)
+
+    def finalize(strategy_dict: dict, message: str) -> tuple[dict, str]:
+        # Sections filled from the demo strategy (failed validation / missed the
+        # deadline) get a "using demo" message so the strategy is not cached
+        if strategy_dict.get("fallback_sections"):
+            message = f"⚠️ Section error, using demo for: {', '.join(strategy_dict['fallback_sections'])}"
+        if strategy_dict.get("provisional_sections"):
+            message = f"⏱️ Deadline reached, using demo for: {', '.join(strategy_dict['provisional_sections'])}"
+
+        # 3. Merge - KEEP ALL CrewAI data!
+        strategy_dict["tactical_blueprint"] = blueprint_html
+        strategy_dict["sample_posts"] = sample_posts
+        return strategy_dict, message
+
+    report = on_section
+    if on_section and finish_in_background:
+        def report_finalized(event: tuple):
+            kind, section, fields = event
+            if kind == "partial":
+                partial, message = finalize(fields, "")
+                fields = {"strategy": partial, "message": message}
+            on_section((kind, section, fields))
+        report = report_finalized
+
+    # 2. AI Logic
+    if settings.GROQ_API_KEY and mode == "lite":
+        try:
+            print(f"⚡ [LITE] Single-call generation for: {strategy_input.goal}")
+            strategy_dict = generate_lite_strategy(strategy_input, on_section, deadline)
+            message = "Strategy generated successfully (lite mode)"
+            print(f"✅ [LITE] Generation Complete! (Time: {time.time() - start_time:.2f}s)")
+        except Exception as e:
+            print(f"❌ [LITE] Error: {str(e)}")
+            print("⚠️ [FALLBACK] Switching to Demo Mode...")
+            strategy_dict = generate_demo_strategy(strategy_input)
+            message = f"⚠️ Lite generation error, using demo: {str(e)}"
+    elif settings.GROQ_API_KEY:
+        try:
+            print(f"🤖 [CREWAI] Starting Strategy Generation for: {strategy_input.goal}")
+            print(f"via Agent Crew (Model: Llama-3.3-70B)")
+            strategy_dict = create_content_strategy_crew(strategy_input, report, request_id,
+                                                         deadline, finish_in_background)
+            message = "Strategy generated successfully"
+            print(f"✅ [CREWAI] Generation Complete! (Time: {time.time() - start_time:.2f}s)")
+        except Exception as e:
+            print(f"❌ [CREWAI] Error: {str(e)}")
+            print("⚠️ [FALLBACK] Switching to Demo Mode...")
+            strategy_dict = generate_demo_strategy(strategy_input)
+            message = f"⚠️ CrewAI error, using demo: {str(e)}"
+    else:
+        print("⚠️ [DEMO MODE] No Groq API Key found. Using demo strategy.")
+        strategy_dict = generate_demo_strategy(strategy_input)
+        message = "⚠️ DEMO MODE: No Groq API Key found"
+
+    return finalize(strategy_dict, message)
+
+
+def is_cacheable(message: str) -> bool:
+    """Demo fallbacks (crew/LLM errors, missed deadlines) must not poison the cache"""
+    return "using demo" not in message
+
+
+def save_strategy(user_id: str, strategy_input: StrategyInput, strategy_dict: dict,
+                  cache_key: str, generation_time: float, **extra) -> str:
+    """Persist a generated strategy to MongoDB and bump the monthly usage counter"""
+    strategy_doc = {
+        "user_id": user_id,
+        "goal": strategy_input.goal,
+        "audience": strategy_input.audience,
+        "industry": strategy_input.industry,
+        "platform": strategy_input.platform,
+        "output_data": strategy_dict.copy(),
+        "cache_key": cache_key,
+        "generation_time": int(generation_time),
+        "created_at": datetime.now(timezone.utc),
+        **extra
+    }
+    result = strategies_collection.insert_one(strategy_doc)
+
+    # Increment Redis Usage
+    if REDIS_ENABLED:
+        try:
+            current_month = datetime.now().strftime("%Y-%m")
+            count_key = f"strategy_count:{user_id}:{current_month}"
+            current_val = redis_client.get(count_key)
+            new_count = int(current_val) + 1 if current_val else 1
+            redis_client.setex(count_key, 86400, new_count)
+        except Exception as e:
+            print(f"[WARNING] Failed to increment usage: {e}")
+
+    return str(result.inserted_id)
+
+
+def update_strategy(strategy_id: str, strategy_dict: dict, generation_time: float, **extra):
+    """Replace a saved strategy's output in place (e.g. provisional -> final); no usage bump"""
+    strategies_collection.update_one(
+        {"_id": ObjectId(strategy_id)},
+        {"$set": {"output_data": strategy_dict.copy(), "generation_time": int(generation_time), **extra}}
+    )
+
+
+def mark_strategy_failed(strategy_id: str, error: str):
+    """The background crew run for a draft failed; the draft stays as the result"""
+    strategies_collection.update_one({"_id": ObjectId(strategy_id)}, {"$set": {"status": "failed", "error": error}})
+
+
+def get_strategy_status(strategy_id: str, user_id: str, include_strategy: bool = True) -> Optional[dict]:
+    """Generation status of a saved strategy (documents without one are complete)"""
+    projection = {"status": 1, "message": 1, "provisional_sections": 1, "error": 1, "generation_time": 1}
+    if include_strategy:
+        projection["output_data"] = 1
+    try:
+        doc = strategies_collection.find_one({"_id": ObjectId(strategy_id), "user_id": user_id}, projection)
+    except Exception:
+        return None
+    if doc is None:
+        return None
+    status = doc.get("status", "complete")
+    result = {
+        "strategy_id": strategy_id,
+        "status": status,
+        "message": doc.get("message"),
+        "provisional_sections": doc.get("provisional_sections", []),
+        "generation_time": doc.get("generation_time"),
+    }
+    if status == "failed":
+        result["error"] = doc.get("error")
+    if include_strategy:
+        result["strategy"] = doc.get("output_data")
+    return result
@@ -0,0 +1,251 @@
+"""
+Strategy Job Queue - Durable Redis-backed queue for strategy generation
+
+API nodes only enqueue and serve status; `python -m app.worker` processes
+consume jobs and run the crew, so crew capacity scales separately from HTTP.
+
+Scheduling is tier-aware and fair:
+    - every tier has its own lane; workers pick lanes by weighted draw
+      (settings.TIER_WEIGHTS), so pro/expert jobs skip ahead of free backlog
+    - a lane holds user ids, not jobs, and rotates round-robin, so one
+      account with 200 queued jobs gets one turn per rotation like everyone else
+
+Redis layout:
+    jobs:lane:{tier}      LIST   user ids with pending jobs (round-robin ring)
+    jobs:user:{user_id}   LIST   that user's pending job ids (FIFO)
+    jobs:processing       ZSET   job id -> lease expiry (ms); expired leases are redelivered
+    job:{job_id}          HASH   status, user_id, tier, input, attempts, result, ...
+"""
+
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import redis_client, REDIS_ENABLED
+from app.models.schemas import StrategyInput
+
+LANE_PREFIX = "jobs:lane:"
+USER_QUEUE_PREFIX = "jobs:user:"
+PROCESSING_KEY = "jobs:processing"
+JOB_PREFIX = "job:"
+
+# Shared Lua helper: put a job back at the front of its user's queue and make
+# sure the user is (back) in their tier lane. Invariant: a user id is in a lane
+# iff their user queue is non-empty.
+_REQUEUE_FN = """
+local function requeue(job_id, job_prefix, lane_prefix, user_prefix)
+    local jkey = job_prefix .. job_id
+    local user_id = redis.call('HGET', jkey, 'user_id')
+    if not user_id then return end
+    local tier = redis.call('HGET', jkey, 'tier') or 'free'
+    local ukey = user_prefix .. user_id
+    redis.call('HSET', jkey, 'status', 'queued')
+    if redis.call('LPUSH', ukey, job_id) == 1 then
+        redis.call('LPUSH', lane_prefix .. tier, user_id)
+    end
+end
+"""
+
+_ENQUEUE_LUA = """
+-- KEYS[1]=user queue, KEYS[2]=lane ; ARGV[1]=job_id, ARGV[2]=user_id
+if redis.call('RPUSH', KEYS[1], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+# Walk lanes in the given order; take the next user in the lane's rotation,
+# pop their oldest job, and rotate them to the back if they have more.
+_CLAIM_LUA = """
+-- KEYS[1]=processing ; ARGV: lease, worker, now, job_prefix, user_prefix, lane keys...
+for i = 6, #ARGV do
+    local lane = ARGV[i]
+    local user_id = redis.call('LPOP', lane)
+    while user_id do
+        local ukey = ARGV[5] .. user_id
+        local job_id = redis.call('LPOP', ukey)
+        if job_id then
+            if redis.call('LLEN', ukey) > 0 then
+                redis.call('RPUSH', lane, user_id)
+            end
+            redis.call('ZADD', KEYS[1], ARGV[1], job_id)
+            local jkey = ARGV[4] .. job_id
+            redis.call('HSET', jkey, 'status', 'processing', 'worker', ARGV[2], 'started_at', ARGV[3])
+            redis.call('HINCRBY', jkey, 'attempts', 1)
+            return job_id
+        end
+        user_id = redis.call('LPOP', lane)
+    end
+end
+return nil
+"""
+
+# Redeliver jobs whose lease expired (worker died or hung)
+_REAP_LUA = _REQUEUE_FN + """
+-- KEYS[1]=processing ; ARGV: now, max_attempts, job_prefix, lane_prefix, user_prefix
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], job_id)
+    local jkey = ARGV[3] .. job_id
+    local attempts = tonumber(redis.call('HGET', jkey, 'attempts') or '0')
+    if attempts >= tonumber(ARGV[2]) then
+        redis.call('HSET', jkey, 'status', 'failed', 'error', 'Worker lease expired too many times')
+    else
+        requeue(job_id, ARGV[3], ARGV[4], ARGV[5])
+    end
+end
+return #expired
+"""
+
+_RETRY_LUA = _REQUEUE_FN + """
+-- KEYS[1]=processing ; ARGV: job_id, error, job_prefix, lane_prefix, user_prefix
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', ARGV[3] .. ARGV[1], 'error', ARGV[2])
+requeue(ARGV[1], ARGV[3], ARGV[4], ARGV[5])
+return 1
+"""
+
+if REDIS_ENABLED:
+    _enqueue_script = redis_client.register_script(_ENQUEUE_LUA)
+    _claim_script = redis_client.register_script(_CLAIM_LUA)
+    _reap_script = redis_client.register_script(_REAP_LUA)
+    _retry_script = redis_client.register_script(_RETRY_LUA)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _lease_expiry_ms() -> int:
+    return int((time.time() + settings.JOB_VISIBILITY_TIMEOUT) * 1000)
+
+def _lane_key(tier: str) -> str:
+    return f"{LANE_PREFIX}{tier if tier in settings.TIER_WEIGHTS else 'free'}"
+
+def _lane_order() -> list:
+    """
+    Weighted random lane order (Efraimidis-Spirakis): a lane with weight 6 is
+    tried first ~6x as often as a lane with weight 1. Zero-weight lanes always
+    come last, i.e. they are served only when every other lane is empty.
+    """
+    def draw(weight: float) -> float:
+        return random.random() ** (1.0 / weight) if weight > 0 else -1.0
+    tiers = sorted(settings.TIER_WEIGHTS, key=lambda t: draw(settings.TIER_WEIGHTS[t]), reverse=True)
+    return [_lane_key(t) for t in tiers]
+
+
+# ============================================================================
+# PRODUCER SIDE (API)
+# ============================================================================
+
+def enqueue_job(user_id: str, strategy_input: StrategyInput, tier: str = "free") -> str:
+    """Create a job record and add it to the user's queue in their tier lane"""
+    job_id = str(uuid.uuid4())
+    job_key = f"{JOB_PREFIX}{job_id}"
+
+    pipe = redis_client.pipeline()
+    pipe.hset(job_key, mapping={
+        "job_id": job_id,
+        "status": "queued",
+        "user_id": user_id,
+        "tier": tier if tier in settings.TIER_WEIGHTS else "free",
+        "input": strategy_input.json(),
+        "attempts": 0,
+        "created_at": _now_iso(),
+    })
+    pipe.expire(job_key, settings.JOB_TTL_SECONDS)
+    pipe.execute()
+    _enqueue_script(keys=[f"{USER_QUEUE_PREFIX}{user_id}", _lane_key(tier)], args=[job_id, user_id])
+
+    print(f"📥 [QUEUE] Job {job_id} queued for user {user_id} ({tier})")
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Return the public view of a job, or None if unknown/expired"""
+    if not REDIS_ENABLED:
+        return None
+    job = redis_client.hgetall(f"{JOB_PREFIX}{job_id}")
+    if not job:
+        return None
+
+    job.pop("worker", None)
+    job["input"] = json.loads(job["input"]) if job.get("input") else None
+    job["attempts"] = int(job.get("attempts", 0))
+    if "result" in job:
+        job["strategy"] = json.loads(job.pop("result"))
+    if "generation_time" in job:
+        job["generation_time"] = float(job["generation_time"])
+    return job
+
+
+def get_queue_depth() -> dict:
+    """Number of users waiting in each tier lane"""
+    if not REDIS_ENABLED:
+        return {}
+    try:
+        return {tier: redis_client.llen(_lane_key(tier)) for tier in settings.TIER_WEIGHTS}
+    except Exception:
+        return {}
+
+
+# ============================================================================
+# CONSUMER SIDE (worker)
+# ============================================================================
+
+def claim_job(worker_id: str) -> Optional[dict]:
+    """Lease the next job (by tier priority, then per-user round-robin). Returns the job record or None."""
+    job_id = _claim_script(
+        keys=[PROCESSING_KEY],
+        args=[_lease_expiry_ms(), worker_id, _now_iso(), JOB_PREFIX, USER_QUEUE_PREFIX, *_lane_order()]
+    )
+    if not job_id:
+        return None
+    job = redis_client.hgetall(f"{JOB_PREFIX}{job_id}")
+    if not job.get("input"):
+        # Record expired while queued - drop the orphaned id
+        redis_client.zrem(PROCESSING_KEY, job_id)
+        redis_client.delete(f"{JOB_PREFIX}{job_id}")
+        return None
+    return job
+
+
+def extend_lease(job_id: str):
+    """Heartbeat: push the visibility deadline out while the crew is still running"""
+    redis_client.zadd(PROCESSING_KEY, {job_id: _lease_expiry_ms()}, xx=True)
+
+
+def ack_job(job_id: str, **fields):
+    """Mark a job complete and release its lease"""
+    job_key = f"{JOB_PREFIX}{job_id}"
+    pipe = redis_client.pipeline()
+    pipe.zrem(PROCESSING_KEY, job_id)
+    pipe.hset(job_key, mapping={"status": "complete", "finished_at": _now_iso(), **fields})
+    pipe.expire(job_key, settings.JOB_TTL_SECONDS)
+    pipe.execute()
+
+
+def fail_job(job_id: str, error: str):
+    """Release a failed job: redeliver it until JOB_MAX_ATTEMPTS, then mark failed"""
+    job_key = f"{JOB_PREFIX}{job_id}"
+    attempts = int(redis_client.hget(job_key, "attempts") or 0)
+
+    if attempts >= settings.JOB_MAX_ATTEMPTS:
+        pipe = redis_client.pipeline()
+        pipe.zrem(PROCESSING_KEY, job_id)
+        pipe.hset(job_key, mapping={"status": "failed", "error": error, "finished_at": _now_iso()})
+        pipe.execute()
+    else:
+        _retry_script(keys=[PROCESSING_KEY],
+                      args=[job_id, error, JOB_PREFIX, LANE_PREFIX, USER_QUEUE_PREFIX])
+
+
+def requeue_expired_jobs() -> int:
+    """Return jobs with expired leases to the queue. Safe to call from every worker."""
+    return _reap_script(
+        keys=[PROCESSING_KEY],
+        args=[int(time.time() * 1000), settings.JOB_MAX_ATTEMPTS, JOB_PREFIX, LANE_PREFIX, USER_QUEUE_PREFIX]
+    )
@@ -0,0 +1,229 @@
+"""
+LLM Budget - Cluster-wide Groq request/token limiter
+
+Crew(max_rpm=...) only limits one crew instance, so N concurrent generations
+on M workers multiply past the Groq account limit. Instead every GatewayLLM
+call draws from two token buckets shared by all API nodes and workers:
+    - requests per minute (GROQ_RPM_LIMIT)
+    - tokens per minute   (GROQ_TPM_LIMIT)
+A call takes one request plus its estimated tokens up front and settles the
+difference once the real usage is known. Without Redis a process-local
+bucket stands in.
+
+When the budget is exhausted callers wait instead of failing. Each model has
+its own waiter queue, served by tier (settings.TIER_WEIGHTS), then FIFO; the
+tier comes from the `request_tier` contextvar set by whoever started the
+generation.
+"""
+
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from app.core.config import settings
+from app.core.database import redis_client, REDIS_ENABLED
+
+BUCKET_PREFIX = "llm:budget:"  # one pair of buckets per model (Groq limits are per model)
+
+request_tier = contextvars.ContextVar("request_tier", default="free")
+
+# Refill both buckets, then take 1 request + ARGV[3] tokens if both have enough.
+# Returns 0 on success, otherwise the ms until the scarcer bucket will have refilled.
+_TAKE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rpm, tpm = tonumber(ARGV[1]), tonumber(ARGV[2])
+local need = math.min(tonumber(ARGV[3]), tpm)
+local state = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts')
+local req = tonumber(state[1]) or rpm
+local tok = tonumber(state[2]) or tpm
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+req = math.min(rpm, req + elapsed * rpm / 60000)
+tok = math.min(tpm, tok + elapsed * tpm / 60000)
+local wait = 0
+if req < 1 then wait = math.max(wait, (1 - req) * 60000 / rpm) end
+if tok < need then wait = math.max(wait, (need - tok) * 60000 / tpm) end
+if wait == 0 then
+    req = req - 1
+    tok = tok - need
+end
+redis.call('HSET', KEYS[1], 'req', tostring(req), 'tok', tostring(tok), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return math.ceil(wait)
+"""
+
+if REDIS_ENABLED:
+    _take_script = redis_client.register_script(_TAKE_LUA)
+
+
+# ============================================================================
+# BUCKETS
+# ============================================================================
+
+class LocalTokenBucket:
+    """Same algorithm as _TAKE_LUA, for a single process without Redis"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_ms = (now - self.updated) * 1000
+        self.updated = now
+        self.requests = min(self.rpm, self.requests + elapsed_ms * self.rpm / 60000)
+        self.tokens = min(self.tpm, self.tokens + elapsed_ms * self.tpm / 60000)
+
+    def take(self, tokens: int) -> int:
+        with self._lock:
+            self._refill()
+            need = min(tokens, self.tpm)
+            wait = 0.0
+            if self.requests < 1:
+                wait = max(wait, (1 - self.requests) * 60000 / self.rpm)
+            if self.tokens < need:
+                wait = max(wait, (need - self.tokens) * 60000 / self.tpm)
+            if wait == 0:
+                self.requests -= 1
+                self.tokens -= need
+            return math.ceil(wait)
+
+    def settle(self, delta: int):
+        with self._lock:
+            self.tokens -= delta
+
+
+_local_buckets = {}
+_local_buckets_lock = threading.Lock()
+
+def _local_bucket(model: str) -> LocalTokenBucket:
+    with _local_buckets_lock:
+        if model not in _local_buckets:
+            _local_buckets[model] = LocalTokenBucket(settings.GROQ_RPM_LIMIT, settings.GROQ_TPM_LIMIT)
+        return _local_buckets[model]
+
+
+def _take(tokens: int, model: str) -> int:
+    if REDIS_ENABLED:
+        try:
+            return int(_take_script(keys=[f"{BUCKET_PREFIX}{model}"],
+                                    args=[settings.GROQ_RPM_LIMIT, settings.GROQ_TPM_LIMIT, tokens]))
+        except Exception as e:
+            print(f"[WARNING] LLM budget unavailable in Redis, using local bucket: {e}")
+    return _local_bucket(model).take(tokens)
+
+
+# ============================================================================
+# PRIORITY WAITING
+# ============================================================================
+
+class _WaitQueue:
+    """Callers waiting for one model's buckets: heap of (-tier weight, arrival seq)"""
+
+    def __init__(self):
+        self.heap = []
+        self.cond = threading.Condition()
+
+
+_wait_queues = {}
+_wait_queues_lock = threading.Lock()
+_seq = itertools.count()
+_stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "timeouts": 0}
+_stats_lock = threading.Lock()
+
+def _wait_queue(model: str) -> _WaitQueue:
+    with _wait_queues_lock:
+        if model not in _wait_queues:
+            _wait_queues[model] = _WaitQueue()
+        return _wait_queues[model]
+
+
+def acquire_llm_budget(tokens: int, model: str = "default"):
+    """
+    Block until one request + `tokens` tokens are available for `model`. Only the
+    highest-priority waiter for that model polls the bucket; the rest queue behind
+    it. Each model has its own queue, so an exhausted model never holds up another.
+    Raises TimeoutError after LLM_BUDGET_MAX_WAIT seconds.
+    """
+    tier = request_tier.get()
+    entry = (-settings.TIER_WEIGHTS.get(tier, 0), next(_seq))
+    queue = _wait_queue(model)
+    started = time.monotonic()
+    deadline = started + settings.LLM_BUDGET_MAX_WAIT
+    with queue.cond:
+        heapq.heappush(queue.heap, entry)
+    try:
+        while True:
+            with queue.cond:
+                while queue.heap[0] != entry:
+                    if not queue.cond.wait(timeout=max(0.0, deadline - time.monotonic())):
+                        break
+                at_head = queue.heap[0] == entry
+            if time.monotonic() >= deadline:
+                with _stats_lock:
+                    _stats["timeouts"] += 1
+                raise TimeoutError(f"Groq budget not available within {settings.LLM_BUDGET_MAX_WAIT}s")
+            if not at_head:
+                continue
+
+            wait_ms = _take(tokens, model)
+            if wait_ms == 0:
+                waited = time.monotonic() - started
+                with _stats_lock:
+                    _stats["acquired"] += 1
+                    if waited > 0.05:
+                        _stats["waited"] += 1
+                        _stats["wait_seconds"] += waited
+                if waited > 0.05:
+                    print(f"[BUDGET] {tier} call waited {waited:.1f}s for Groq budget ({model})")
+                return
+            # Re-check the head periodically so a higher tier arriving meanwhile goes first
+            time.sleep(min(wait_ms / 1000, 1.0, max(0.0, deadline - time.monotonic())))
+    finally:
+        with queue.cond:
+            queue.heap.remove(entry)
+            heapq.heapify(queue.heap)
+            queue.cond.notify_all()
+
+
+def settle_llm_budget(estimated: int, actual: int, model: str = "default"):
+    """Correct the token bucket once a call's real usage is known"""
+    delta = actual - estimated
+    if not delta:
+        return
+    if REDIS_ENABLED:
+        try:
+            redis_client.hincrbyfloat(f"{BUCKET_PREFIX}{model}", "tok", -delta)
+            return
+        except Exception:
+            pass
+    _local_bucket(model).settle(delta)
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough prompt size (~4 chars/token) plus the expected completion"""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + settings.LLM_COMPLETION_TOKEN_ESTIMATE
+
+
+def get_budget_stats() -> dict:
+    with _wait_queues_lock:
+        queues = dict(_wait_queues)
+    waiting = {}
+    for model, queue in queues.items():
+        with queue.cond:
+            if queue.heap:
+                waiting[model] = len(queue.heap)
+    with _stats_lock:
+        stats = dict(_stats)
+    return {"rpm_limit": settings.GROQ_RPM_LIMIT, "tpm_limit": settings.GROQ_TPM_LIMIT,
+            "backend": "redis" if REDIS_ENABLED else "local",
+            "waiting": sum(waiting.values()), "waiting_by_model": waiting,
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in stats.items()}}
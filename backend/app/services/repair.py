@@ -0,0 +1,132 @@
+"""
+Section Repair - Validate each crew section against its schema and fix what can be fixed
+
+A task's output is loaded with extract_json, or with json_repair when it is
+broken (trailing commas, single quotes, a truncated array...), then checked
+against its model in app.models.schemas. List items that don't validate are
+dropped as long as most of the list survives. A section that is still unusable
+raises SectionError, and the crew re-asks the LLM for that section only
+(see run_stages) instead of discarding the whole strategy.
+
+Every checked output is counted per section (get_parse_stats), so regenerations
+caused by unparseable answers show up in GET /api/health.
+"""
+
+import threading
+from typing import Any
+
+from json_repair import repair_json
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.models.schemas import (
+    PersonaModel, CompetitorGap, StrategicGuidance, KeywordModel,
+    CalendarItem, SamplePost, ROIPrediction,
+)
+from app.services.jsonstream import extract_json
+
+SECTION_MODELS = {
+    "personas": PersonaModel,
+    "competitor_gaps": CompetitorGap,
+    "strategic_guidance": StrategicGuidance,
+    "keywords": KeywordModel,
+    "calendar": CalendarItem,
+    "sample_posts": SamplePost,
+    "roi_prediction": ROIPrediction,
+}
+LIST_SECTIONS = {"personas", "competitor_gaps", "keywords", "calendar", "sample_posts"}
+# Replaced by the deterministic blueprint in build_strategy, so never worth a re-ask
+OPTIONAL_SECTIONS = {"sample_posts"}
+# A list keeps its valid items if at least this share of them validated
+MIN_VALID_FRACTION = 0.5
+
+# section -> {"parsed", "repaired", "rejected", "fallbacks"}
+_parse_stats = {}
+_stats_lock = threading.Lock()
+
+
+class SectionError(ValueError):
+    """A section that neither parses nor validates, even after repair"""
+
+    def __init__(self, section: str, reason: str):
+        super().__init__(f"{section}: {reason}")
+        self.section = section
+        self.reason = reason
+
+
+def load_json(section: str, raw: str) -> Any:
+    """Parse a task's output, falling back to json_repair for malformed JSON"""
+    try:
+        return extract_json(raw)
+    except ValueError as e:
+        repaired = repair_json(raw, return_objects=True)
+        if not isinstance(repaired, (dict, list)) or not repaired:
+            raise SectionError(section, f"invalid JSON ({e})")
+        print(f"[REPAIR] {section}: fixed malformed JSON ({e})")
+        count_parse(section, "repaired")
+        return repaired
+
+
+def _describe(error: ValidationError) -> str:
+    problems = [f"{'.'.join(str(p) for p in err['loc']) or 'value'}: {err['msg']}" for err in error.errors()[:3]]
+    return "; ".join(problems)
+
+
+def _validate_item(model, item: Any) -> dict:
+    # Keep any extra keys the frontend may use; take coerced values ("8" -> 8) from the model
+    return {**item, **model.model_validate(item).model_dump()} if isinstance(item, dict) \
+        else model.model_validate(item).model_dump()
+
+
+def validate_section(section: str, value: Any) -> Any:
+    """
+    Validated value of one ContentStrategy field.
+    Raises SectionError when it can't be salvaged (optional sections fall back to []).
+    """
+    model = SECTION_MODELS[section]
+    # The LLM sometimes wraps the payload in its own section name
+    if isinstance(value, dict) and isinstance(value.get(section), (dict, list)):
+        value = value[section]
+
+    if section not in LIST_SECTIONS:
+        try:
+            return _validate_item(model, value)
+        except ValidationError as e:
+            raise SectionError(section, _describe(e))
+
+    items = value if isinstance(value, list) else [value] if isinstance(value, dict) else []
+    valid, last_error = [], None
+    for item in items:
+        try:
+            valid.append(_validate_item(model, item))
+        except ValidationError as e:
+            last_error = e
+    if valid and len(valid) >= len(items) * MIN_VALID_FRACTION:
+        if len(valid) < len(items):
+            print(f"[REPAIR] {section}: dropped {len(items) - len(valid)} invalid item(s) ({_describe(last_error)})")
+        return valid
+    if section in OPTIONAL_SECTIONS:
+        return []
+    reason = _describe(last_error) if last_error else "no items"
+    raise SectionError(section, f"{len(valid)}/{len(items)} items valid ({reason})")
+
+
+def count_parse(section: str, outcome: str):
+    """
+    Record what became of one LLM output for `section`: "parsed" (usable, possibly
+    after repair), "repaired" (needed json_repair), "rejected" (thrown away and
+    re-asked) or "fallbacks" (section filled from demo data)
+    """
+    with _stats_lock:
+        stats = _parse_stats.setdefault(section, {"parsed": 0, "repaired": 0, "rejected": 0, "fallbacks": 0})
+        stats[outcome] += 1
+
+
+def get_parse_stats() -> dict:
+    """Per-section parse outcomes since process start, with the share of outputs that were usable"""
+    with _stats_lock:
+        stats = {section: dict(counts) for section, counts in _parse_stats.items()}
+    for counts in stats.values():
+        outputs = counts["parsed"] + counts["rejected"]
+        counts["parse_success_rate"] = round(counts["parsed"] / outputs, 3) if outputs else None
+    return {"mode": settings.LLM_STRUCTURED_OUTPUT, "sections": stats}
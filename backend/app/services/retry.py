@@ -0,0 +1,88 @@
+"""
+Task Retries - Retry one crew task on transient Groq errors
+
+A 429, timeout or 5xx in one task used to abort the whole crew run. run_stages
+wraps each task in retry_transient() instead: exponential backoff with full
+jitter (honouring Retry-After), a fixed number of attempts, and never sleeping
+past the request's deadline. Anything that isn't transient raises right away.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+import groq
+import httpx
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+TRANSIENT_ERRORS = (
+    groq.APIConnectionError,   # includes APITimeoutError
+    groq.RateLimitError,
+    groq.InternalServerError,
+    httpx.TransportError,
+    ConnectionError,
+)
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_stats = {"retries": 0, "recovered": 0, "exhausted": 0}
+_stats_lock = threading.Lock()
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return getattr(error, "status_code", None) in TRANSIENT_STATUS
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """Full-jitter exponential backoff, but never shorter than the server's Retry-After"""
+    ceiling = min(settings.CREW_RETRY_MAX_DELAY, settings.CREW_RETRY_BASE_DELAY * 2 ** attempt)
+    return max(random.uniform(0, ceiling), _retry_after(error) if error else 0.0)
+
+
+def _count(outcome: str):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def retry_transient(fn: Callable[[], T], label: str, deadline: float) -> T:
+    """
+    Call fn(), retrying transient errors up to CREW_TASK_RETRIES times.
+    `deadline` is a time.monotonic() timestamp; a retry that could not start
+    before it is not attempted.
+    """
+    attempt = 0
+    while True:
+        try:
+            result = fn()
+            if attempt:
+                _count("recovered")
+            return result
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            if attempt >= settings.CREW_TASK_RETRIES or time.monotonic() + delay >= deadline:
+                _count("exhausted")
+                raise
+            attempt += 1
+            _count("retries")
+            print(f"[RETRY] {label}: {type(e).__name__}, attempt {attempt}/{settings.CREW_TASK_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def get_retry_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
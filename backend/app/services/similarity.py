@@ -0,0 +1,91 @@
+"""
+Brief Similarity - Canonicalisation and MinHash/LSH signatures for strategy inputs
+
+Exact cache keys only fold case and whitespace (normalize_text), since
+punctuation can carry meaning ("C++" vs "C#", "$5k"). For near-duplicate
+lookup, "Sell coffee subscriptions on Instagram" and "sell coffee subscription
+on instagram!" are canonicalised further (punctuation, simple plurals); the
+free-text goal+audience is then MinHashed over character shingles so
+near-identical briefs can be found through locality-sensitive hashing bands.
+"""
+
+import re
+import unicodedata
+
+import mmh3
+
+from app.core.config import settings
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+SHINGLE_SIZE = 4
+
+
+def _stem(token: str) -> str:
+    """Very light plural folding - good enough for short marketing briefs"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace folding only - safe for exact cache keys"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return " ".join(token for token in _SPACES.split(text) if token)
+
+
+def canonicalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _NON_WORD.sub(" ", text)
+    return " ".join(_stem(token) for token in _SPACES.split(text) if token)
+
+
+FIELDS = ("goal", "audience", "industry", "platform", "contentType", "experience")
+
+
+def exact_fields(strategy_input) -> dict:
+    """Normalised form of every field that affects the generated strategy (exact cache keys)"""
+    return {name: normalize_text(getattr(strategy_input, name)) for name in FIELDS}
+
+
+def canonical_fields(strategy_input) -> dict:
+    """Canonical form of every field that affects the generated strategy (similarity only)"""
+    return {name: canonicalize_text(getattr(strategy_input, name)) for name in FIELDS}
+
+
+def similarity_scope(fields: dict) -> str:
+    """Fields that must match exactly for a near-duplicate hit"""
+    return f"{fields['industry']}|{fields['platform']}|{fields['contentType']}|{fields['experience']}"
+
+
+def shingles(text: str) -> set:
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(fields: dict) -> list:
+    """MinHash of the goal + audience text (one 32-bit min per permutation seed)"""
+    grams = shingles(f"{fields['goal']} | {fields['audience']}")
+    return [
+        min(mmh3.hash(gram, seed, signed=False) for gram in grams)
+        for seed in range(settings.MINHASH_PERMUTATIONS)
+    ]
+
+
+def lsh_bands(signature: list) -> list:
+    """Hash each band of rows into one bucket id; similar signatures share at least one bucket"""
+    rows = max(1, len(signature) // settings.LSH_BANDS)
+    return [
+        f"{band}:{mmh3.hash(','.join(map(str, signature[band * rows:(band + 1) * rows])), signed=False):x}"
+        for band in range(settings.LSH_BANDS)
+    ]
+
+
+def estimate_similarity(sig_a: list, sig_b: list) -> float:
+    """Estimated Jaccard similarity = fraction of matching MinHash slots"""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
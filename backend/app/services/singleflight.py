@@ -0,0 +1,197 @@
+"""
+Single-Flight - Coalesce concurrent generations of the same strategy
+
+When a popular brief is submitted by several users at once, only one crew run
+happens per cache key:
+    - in-process: later callers await the leader's task
+    - across nodes/workers: a Redis lock elects one leader; followers wait for
+      the leader's result to land in the strategy cache
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.database import redis_client, REDIS_ENABLED
+
+LOCK_PREFIX = "inflight:strategy:"
+
+# Release/extend only if we still own the lock
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+_EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('EXPIRE', KEYS[1], ARGV[2]) end
+return 0
+"""
+
+if REDIS_ENABLED:
+    _release_script = redis_client.register_script(_RELEASE_LUA)
+    _extend_script = redis_client.register_script(_EXTEND_LUA)
+
+_inflight: dict = {}
+
+
+# ============================================================================
+# CROSS-NODE LOCK (Redis)
+# ============================================================================
+
+def _try_lock(key: str) -> Optional[str]:
+    """Returns an ownership token, "" when Redis is unavailable (run locally), or None if held elsewhere"""
+    if not REDIS_ENABLED:
+        return ""
+    token = uuid.uuid4().hex
+    try:
+        if redis_client.set(f"{LOCK_PREFIX}{key}", token, nx=True, ex=settings.SINGLEFLIGHT_LOCK_TTL):
+            return token
+        return None
+    except Exception:
+        return ""
+
+def _lock_held(key: str) -> bool:
+    try:
+        return bool(redis_client.exists(f"{LOCK_PREFIX}{key}"))
+    except Exception:
+        return False
+
+def _release(key: str, token: str):
+    if token:
+        try:
+            _release_script(keys=[f"{LOCK_PREFIX}{key}"], args=[token])
+        except Exception:
+            pass
+
+def _extend(key: str, token: str):
+    if token:
+        try:
+            _extend_script(keys=[f"{LOCK_PREFIX}{key}"], args=[token, settings.SINGLEFLIGHT_LOCK_TTL])
+        except Exception:
+            pass
+
+
+# ============================================================================
+# ASYNC (API)
+# ============================================================================
+
+async def run_once(key: str,
+                   produce: Callable[[], Awaitable[Any]],
+                   load_shared: Callable[[], Optional[Any]]) -> tuple[Any, bool]:
+    """
+    Run `produce` at most once per key across all concurrent callers.
+
+    The work runs as its own task that every caller, leader included, awaits
+    through asyncio.shield: a cancelled or disconnected caller never stops the
+    shared run. Only if that task itself ends cancelled does a waiting follower
+    take over as the new leader.
+
+    Args:
+        key: Strategy cache key
+        produce: Coroutine factory that generates AND caches the result
+        load_shared: Reads the result another node produced (e.g. from cache)
+
+    Returns:
+        tuple: (result, coalesced) - coalesced is True if another caller did the work
+    """
+    while True:
+        existing = _inflight.get(key)
+        if existing is None:
+            break
+        try:
+            result, _ = await asyncio.shield(existing)
+            return result, True
+        except asyncio.CancelledError:
+            if existing.cancelled() and not asyncio.current_task().cancelling():
+                continue  # the producer is gone, not us - take over
+            raise
+
+    task = asyncio.ensure_future(_run_with_lock(key, produce, load_shared))
+    _inflight[key] = task
+
+    def finished(done: asyncio.Task):
+        if _inflight.get(key) is done:
+            del _inflight[key]
+        if not done.cancelled():
+            done.exception()  # mark retrieved when nobody was waiting any more
+
+    task.add_done_callback(finished)
+    return await asyncio.shield(task)
+
+
+async def _run_with_lock(key, produce, load_shared) -> tuple[Any, bool]:
+    deadline = time.time() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+    while True:
+        token = _try_lock(key)
+        if token is not None:
+            break
+
+        # Another node is generating - wait for its result
+        while _lock_held(key) and time.time() < deadline:
+            await asyncio.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+            shared = load_shared()
+            if shared is not None:
+                return shared, True
+        shared = load_shared()
+        if shared is not None:
+            return shared, True
+        if time.time() >= deadline:
+            # Leader is taking too long; stop waiting and generate ourselves
+            token = ""
+            break
+        # Leader gave up without a cacheable result - try to take over
+
+    async def keep_alive():
+        while True:
+            await asyncio.sleep(max(1, settings.SINGLEFLIGHT_LOCK_TTL // 3))
+            _extend(key, token)
+
+    renewer = asyncio.create_task(keep_alive()) if token else None
+    try:
+        return await produce(), False
+    finally:
+        if renewer:
+            renewer.cancel()
+        _release(key, token)
+
+
+# ============================================================================
+# BLOCKING (worker)
+# ============================================================================
+
+def run_once_blocking(key: str,
+                      produce: Callable[[], Any],
+                      load_shared: Callable[[], Optional[Any]]) -> tuple[Any, bool]:
+    """Thread-friendly variant of run_once for the queue worker (cross-node lock only)"""
+    deadline = time.time() + settings.SINGLEFLIGHT_WAIT_TIMEOUT
+    while True:
+        token = _try_lock(key)
+        if token is not None:
+            break
+        while _lock_held(key) and time.time() < deadline:
+            time.sleep(settings.SINGLEFLIGHT_POLL_INTERVAL)
+            shared = load_shared()
+            if shared is not None:
+                return shared, True
+        shared = load_shared()
+        if shared is not None:
+            return shared, True
+        if time.time() >= deadline:
+            token = ""
+            break
+
+    done = threading.Event()
+
+    def keep_alive():
+        while not done.wait(max(1, settings.SINGLEFLIGHT_LOCK_TTL // 3)):
+            _extend(key, token)
+
+    if token:
+        threading.Thread(target=keep_alive, daemon=True).start()
+    try:
+        return produce(), False
+    finally:
+        done.set()
+        _release(key, token)
@@ -0,0 +1,140 @@
+"""
+Strategy Worker - Consumes queued generation jobs and runs the crew
+
+Usage:
+    python -m app.worker
+
+Run as many worker processes (on as many nodes) as Groq capacity allows;
+each one processes up to WORKER_CONCURRENCY jobs at a time.
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+import json
+
+from app.core.config import settings
+from app.core.database import REDIS_ENABLED
+from app.models.schemas import StrategyInput
+from app.services.cache import (
+    generate_cache_key, get_cached_strategy, set_cached_strategy, start_cache_invalidation_listener
+)
+from app.services.http import warm_up_llm_connections
+from app.services.pipeline import build_strategy, is_cacheable, save_strategy
+from app.services.ratelimit import request_tier
+from app.services.queue import (
+    claim_job, extend_lease, ack_job, fail_job, requeue_expired_jobs
+)
+from app.services.singleflight import run_once_blocking
+
+stop_event = threading.Event()
+
+
+def _heartbeat(job_id: str, done: threading.Event):
+    """Keep the job's lease alive while the crew runs"""
+    interval = max(1, settings.JOB_VISIBILITY_TIMEOUT // 3)
+    while not done.wait(interval):
+        try:
+            extend_lease(job_id)
+        except Exception as e:
+            print(f"[WARNING] Lease heartbeat failed for {job_id}: {e}")
+
+
+def process_job(job: dict):
+    job_id = job["job_id"]
+    user_id = job["user_id"]
+    strategy_input = StrategyInput(**json.loads(job["input"]))
+    request_tier.set(job.get("tier", "free"))  # Groq budget priority
+    print(f"🛠️ [WORKER] Processing job {job_id} (attempt {job.get('attempts')})")
+
+    done = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, done), daemon=True).start()
+    try:
+        cache_key = generate_cache_key(strategy_input)
+
+        def produce():
+            start_time = time.time()
+            # A redelivered job resumes from the tasks its previous attempt finished
+            strategy_dict, message = build_strategy(strategy_input, request_id=job_id)
+            if is_cacheable(message):
+                set_cached_strategy(cache_key, strategy_dict, strategy_input=strategy_input)
+            return strategy_dict, message, time.time() - start_time
+
+        def load_shared():
+            shared = get_cached_strategy(cache_key)
+            return (shared, "Strategy retrieved from cache", 0.0) if shared is not None else None
+
+        # Another job (or API node) may already have produced this brief
+        shared = load_shared()
+        if shared is not None:
+            strategy_dict, message, generation_time = shared
+        else:
+            (strategy_dict, message, generation_time), _ = run_once_blocking(cache_key, produce, load_shared)
+
+        strategy_id = save_strategy(user_id, strategy_input, strategy_dict, cache_key,
+                                    generation_time, job_id=job_id)
+
+        ack_job(job_id,
+                result=json.dumps(strategy_dict),
+                strategy_id=strategy_id,
+                message=message,
+                generation_time=f"{generation_time:.2f}")
+        print(f"✅ [WORKER] Job {job_id} complete ({generation_time:.2f}s)")
+    except Exception as e:
+        print(f"❌ [WORKER] Job {job_id} failed: {e}")
+        fail_job(job_id, str(e))
+    finally:
+        done.set()
+
+
+def worker_loop(worker_id: str):
+    while not stop_event.is_set():
+        try:
+            requeue_expired_jobs()
+            job = claim_job(worker_id)
+        except Exception as e:
+            print(f"[WARNING] Queue unavailable: {e}")
+            stop_event.wait(settings.JOB_POLL_INTERVAL * 5)
+            continue
+
+        if job is None:
+            stop_event.wait(settings.JOB_POLL_INTERVAL)
+            continue
+        try:
+            process_job(job)
+        except Exception as e:
+            # Keep this slot alive; the lease expires and requeue_expired_jobs redelivers the job
+            print(f"❌ [WORKER] Job {job.get('job_id')} crashed the worker loop: {e}")
+
+
+def main():
+    if not REDIS_ENABLED:
+        raise SystemExit("❌ [WORKER] Redis is required for the job queue (check REDIS_URL)")
+
+    def _shutdown(signum, frame):
+        print("🛑 [WORKER] Shutdown requested - finishing in-flight jobs...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+    start_cache_invalidation_listener()
+    warm_up_llm_connections()
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"🚀 [WORKER] {base_id} started with {settings.WORKER_CONCURRENCY} slot(s)")
+
+    threads = [
+        threading.Thread(target=worker_loop, args=(f"{base_id}:{i}",), name=f"worker-{i}")
+        for i in range(max(1, settings.WORKER_CONCURRENCY))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print("👋 [WORKER] Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: per-request crew setup cost (no LLM calls)
+
+Compares the original setup - create_content_strategy_crew as of the baseline
+commit (BASELINE_REF), which built five Agents, six Tasks with f-string prompts
+and a Crew for every request - with the prebuilt specs + pooled agents used
+now. The baseline code is read from git and run up to crew.kickoff(), so what
+is measured is exactly what every request used to do. Reports time and
+allocations per request.
+
+Usage: python bench_crew_setup.py [requests]
+Run inside the git checkout. The baseline hands CrewAI a bare ChatGroq, which
+current CrewAI only accepts with litellm installed.
+"""
+
+import ast
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from crewai import Agent, Crew, Process, Task
+from langchain_groq import ChatGroq
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import crew as crew_module
+from app.services.crew import SERPAPI_ENABLED, acquire_agents, release_agents, build_tasks
+
+BASELINE_REF = "ed929c4"  # last commit with the per-request crew construction
+BASELINE_PATH = "backend/app/services/crew.py"
+
+INPUTS = [
+    StrategyInput(goal="Sell coffee subscriptions on Instagram", audience="college students aged 18-24",
+                  industry="F&B", platform="Instagram", contentType="Reels/Short Videos"),
+    StrategyInput(goal="Grow B2B leads for a CRM", audience="sales managers at startups",
+                  industry="SaaS", platform="LinkedIn", contentType="Posts"),
+]
+
+
+def _load_baseline():
+    """
+    The baseline create_content_strategy_crew, cut off right before crew.kickoff()
+    so it only builds the agents, tasks and crew
+    """
+    source = subprocess.run(["git", "show", f"{BASELINE_REF}:{BASELINE_PATH}"],
+                            capture_output=True, text=True, check=True).stdout
+    func = next(node for node in ast.parse(source).body
+                if isinstance(node, ast.FunctionDef) and node.name == "create_content_strategy_crew")
+    kickoff = next(i for i, stmt in enumerate(func.body) if "kickoff" in ast.unparse(stmt))
+    func.body = func.body[:kickoff]
+    namespace = {
+        "Agent": Agent, "Task": Task, "Crew": Crew, "Process": Process, "StrategyInput": StrategyInput,
+        # Module-level in the baseline: one ChatGroq shared by every request
+        "llm": ChatGroq(model="groq/llama-3.3-70b-versatile", temperature=0.7,
+                        groq_api_key=settings.GROQ_API_KEY or "unused"),
+        "SERPAPI_ENABLED": SERPAPI_ENABLED, "serper_tool": getattr(crew_module, "serper_tool", None),
+    }
+    exec(compile(ast.Module(body=[func], type_ignores=[]), f"{BASELINE_REF}:{BASELINE_PATH}", "exec"), namespace)
+    return namespace["create_content_strategy_crew"]
+
+
+before = _load_baseline()
+before.__doc__ = "What every request used to do (baseline create_content_strategy_crew up to kickoff)"
+
+
+def after(strategy_input: StrategyInput):
+    verbose = settings.CREW_VERBOSE
+    settings.CREW_VERBOSE = False
+    try:
+        agents = acquire_agents()
+        build_tasks(strategy_input, agents)
+        release_agents(agents)
+    finally:
+        settings.CREW_VERBOSE = verbose
+
+
+def measure(setup, requests: int) -> tuple:
+    setup(INPUTS[0])  # warm-up (imports, first agent set for the pool)
+    tracemalloc.start()
+    for i in range(requests):
+        setup(INPUTS[i % len(INPUTS)])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for i in range(requests):
+        setup(INPUTS[i % len(INPUTS)])
+    elapsed = time.perf_counter() - start
+    return elapsed / requests * 1000, peak / 1024
+
+
+def count_allocations(setup) -> int:
+    """Memory blocks one setup leaves allocated (new objects minus freed ones)"""
+    allocations = 0
+    tracemalloc.start()
+    before_snapshot = tracemalloc.take_snapshot()
+    setup(INPUTS[1])
+    after_snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    for stat in after_snapshot.compare_to(before_snapshot, "lineno"):
+        allocations += max(stat.count_diff, 0)
+    return allocations
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"Crew setup, {requests} requests each (no LLM calls)")
+    print("=" * 60)
+    results = {}
+    for name, setup in (("before (rebuild per request)", before), ("after (specs + agent pool)", after)):
+        ms, peak_kb = measure(setup, requests)
+        blocks = count_allocations(setup)
+        results[name] = ms
+        print(f"{name:30s} {ms:8.2f} ms/request  {blocks:7d} new blocks/request  peak {peak_kb:8.0f} KiB")
+    old, new = results.values()
+    print("=" * 60)
+    print(f"Setup is {old / new:.1f}x faster per request" if new else "Setup time too small to measure")
+    print(f"Idle agent sets pooled: {len(crew_module._idle_agents)}")
@@ -0,0 +1,90 @@
+"""
+Benchmark: parsing 10-50 KB LLM outputs (no LLM calls)
+
+Compares the original clean_and_parse_json - read from the baseline commit
+(BASELINE_REF), it walks the text character by character counting braces once
+the completion is complete - with extract_json on the same complete text and
+with IncrementalJSONParser fed the text in small stream-sized chunks. For the
+streaming parser both the total CPU time and the part left once the last chunk
+has arrived are reported: the rest overlaps with waiting for Groq's tokens.
+
+Usage: python bench_jsonstream.py [repeats]   (run inside the git checkout)
+"""
+
+import ast
+import json
+import subprocess
+import sys
+import time
+
+from app.services.jsonstream import IncrementalJSONParser, extract_json
+
+BASELINE_REF = "ed929c4"  # last commit with clean_and_parse_json
+BASELINE_PATH = "backend/app/services/crew.py"
+CHUNK = 16  # characters per streamed chunk, a few tokens
+
+
+def _load_baseline():
+    source = subprocess.run(["git", "show", f"{BASELINE_REF}:{BASELINE_PATH}"],
+                            capture_output=True, text=True, check=True).stdout
+    func = next(node for node in ast.parse(source).body
+                if isinstance(node, ast.FunctionDef) and node.name == "clean_and_parse_json")
+    namespace = {"json": json}
+    exec(compile(ast.Module(body=[func], type_ignores=[]), f"{BASELINE_REF}:{BASELINE_PATH}", "exec"), namespace)
+    return namespace["clean_and_parse_json"]
+
+
+def _output(items: int) -> str:
+    """A calendar-style answer as the model writes it: prose, a fence, then the JSON"""
+    calendar = [{
+        "week": i % 4 + 1, "day": i % 7 + 1, "topic": f"Behind the scenes of batch #{i} - why students love it",
+        "format": "Reel", "caption_hook": "You won't believe what 3 AM study sessions taste like...",
+        "cta": "Tap the link in bio for 20% off your first box", "hashtags": ["#coffee", "#studygram", "#finals"],
+    } for i in range(items)]
+    return "Here is the content calendar you asked for:\n```json\n" + json.dumps({"calendar": calendar}, indent=2) + "\n```"
+
+
+def _streamed(text: str):
+    parser = IncrementalJSONParser()
+    for start in range(0, len(text), CHUNK):
+        parser.feed(text[start:start + CHUNK])
+    return parser.result()
+
+
+def _after_last_chunk(text: str) -> float:
+    """ms spent once the final chunk arrives (its feed + result())"""
+    parser = IncrementalJSONParser()
+    cut = (len(text) - 1) // CHUNK * CHUNK
+    for start in range(0, cut, CHUNK):
+        parser.feed(text[start:start + CHUNK])
+    start = time.perf_counter()
+    parser.feed(text[cut:])
+    parser.result()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(parse, text: str, repeats: int) -> float:
+    parse(text)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        parse(text)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    baseline = _load_baseline()
+    print(f"JSON extraction, {repeats} runs each (no LLM calls)")
+    print("=" * 60)
+    for items in (28, 140):
+        text = _output(items)
+        assert baseline(text) == extract_json(text) == _streamed(text)
+        old = measure(baseline, text, repeats)
+        new = measure(extract_json, text, repeats)
+        streamed = measure(_streamed, text, repeats)
+        tail = min(_after_last_chunk(text) for _ in range(repeats))
+        print(f"{len(text) / 1024:5.1f} KB")
+        print(f"  clean_and_parse_json (baseline)  {old:8.3f} ms")
+        print(f"  extract_json                     {new:8.3f} ms  ({old / new:.1f}x faster)")
+        print(f"  streamed, {CHUNK}-char chunks       {streamed:8.3f} ms total, "
+              f"{tail:.3f} ms after the last chunk ({old / tail:.0f}x less than the baseline)")
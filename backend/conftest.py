@@ -0,0 +1,18 @@
+"""
+Pytest setup for the backend unit tests (test_jsonstream.py, test_repair.py, ...)
+
+app.core.database connects to MongoDB and Redis at import. Without a local
+server the tests must not wait out the default 30s server selection.
+"""
+
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017/?serverSelectionTimeoutMS=200")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6399")
+
+# Ad-hoc scripts that call a running server on import
+collect_ignore = [
+    "run_tests.py", "test_app.py", "test_crew_activation.py", "test_crew_fix.py",
+    "test_delete_strategy.py", "test_endpoints.py", "test_groq_key.py",
+    "test_history_fix.py", "test_history_structure.py", "test_minimal.py",
+]
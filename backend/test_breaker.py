@@ -0,0 +1,215 @@
+"""
+Circuit breaker tests - state transitions on an injected clock, failing fast, and rejected JSON-mode output
+Run: pytest test_breaker.py
+"""
+
+import groq
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import llm
+from app.services.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.llm import GatewayLLM, accept_failed_generation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(settings, "BREAKER_WINDOW", 4)
+    monkeypatch.setattr(settings, "BREAKER_MIN_CALLS", 4)
+    monkeypatch.setattr(settings, "BREAKER_ERROR_RATE", 0.5)
+    monkeypatch.setattr(settings, "BREAKER_SLOW_CALL_SECONDS", 10)
+    monkeypatch.setattr(settings, "BREAKER_OPEN_SECONDS", 30)
+    return FakeClock()
+
+
+def _opened(clock: FakeClock) -> CircuitBreaker:
+    breaker = CircuitBreaker("groq", clock=clock)
+    for ok in (True, True, False, False):
+        assert breaker.allow()
+        breaker.record(ok, 1.0)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_closed_open_half_open_closed(clock):
+    breaker = CircuitBreaker("groq", clock=clock)
+    for ok in (True, False, True):
+        breaker.record(ok, 1.0)
+    assert breaker.state == CLOSED  # below BREAKER_MIN_CALLS
+    breaker.record(False, 1.0)
+    assert breaker.state == OPEN
+
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()                  # the single probe
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()              # everyone else still waits
+    breaker.record(True, 1.0)
+
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.stats()["opened"] == 1 and breaker.stats()["rejected"] == 2
+
+
+def test_failed_probe_reopens_for_another_period(clock):
+    breaker = _opened(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False, 1.0)
+
+    assert breaker.state == OPEN and breaker.opened_at == clock.now
+    clock.now += 29
+    assert not breaker.allow()
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("groq", clock=clock)
+    for latency in (1.0, 1.0, 11.0, 12.0):
+        breaker.record(True, latency)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow"] == 2 and breaker.stats()["failures"] == 0
+
+
+def test_slow_probe_reopens(clock):
+    breaker = _opened(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True, 11.0)
+    assert breaker.state == OPEN
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = CircuitBreaker("groq", clock=clock)
+    for ok in (False, True, True, True, True, False):
+        breaker.record(ok, 1.0)
+    assert breaker.state == CLOSED  # 1 of the last 4 was bad
+
+
+def test_cancel_frees_the_probe_slot(clock):
+    breaker = _opened(clock)
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.cancel()  # e.g. the budget wait timed out before the call was made
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_cancel_does_nothing_while_closed(clock):
+    breaker = CircuitBreaker("groq", clock=clock)
+    breaker.cancel()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+# ============================================================================
+# GatewayLLM._complete with the circuit open
+# ============================================================================
+
+@pytest.fixture
+def open_circuit(clock, monkeypatch):
+    breaker = _opened(clock)
+    monkeypatch.setattr(llm, "get_breaker", lambda name: breaker)
+    monkeypatch.setattr(llm, "response_cache", None)
+    monkeypatch.setattr(GatewayLLM, "_complete_groq", lambda *args, **kwargs: pytest.fail("Groq was called"))
+    return breaker
+
+
+def test_complete_fails_fast_without_fallback(open_circuit, monkeypatch):
+    monkeypatch.setattr(llm, "_get_fallback_client", lambda: None)
+
+    with pytest.raises(CircuitOpenError):
+        GatewayLLM()._complete("llama-3.3-70b-versatile", 0.7, [{"role": "user", "content": "hi"}], [])
+
+
+def test_complete_fails_over_when_configured(open_circuit, monkeypatch):
+    monkeypatch.setattr(llm, "_get_fallback_client", lambda: object())
+    monkeypatch.setattr(GatewayLLM, "_invoke_fallback", lambda self, *args: ("from fallback", {}))
+
+    text = GatewayLLM()._complete("llama-3.3-70b-versatile", 0.7, [{"role": "user", "content": "hi"}], [])
+
+    assert text == "from fallback"
+
+
+# ============================================================================
+# JSON-mode output that Groq rejected (json_validate_failed)
+# ============================================================================
+
+class RecordingCache:
+    def __init__(self):
+        self.writes = {}
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        self.writes[key] = value
+
+
+@pytest.fixture
+def rejected_json(clock, monkeypatch):
+    breaker = CircuitBreaker("groq", clock=clock)
+    response_cache = RecordingCache()
+    error = groq.BadRequestError(
+        "json_validate_failed", response=httpx.Response(400, request=httpx.Request("POST", "https://groq.test")),
+        body={"error": {"code": "json_validate_failed", "failed_generation": '{"personas": [}'}})
+
+    def invoke(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(llm, "get_breaker", lambda name: breaker)
+    monkeypatch.setattr(llm, "response_cache", response_cache)
+    monkeypatch.setattr(llm, "_get_client", lambda model, temperature: None)
+    monkeypatch.setattr(llm, "acquire_llm_budget", lambda tokens, model: None)
+    monkeypatch.setattr(llm, "settle_llm_budget", lambda estimated, actual, model: None)
+    monkeypatch.setattr(GatewayLLM, "_invoke", invoke)
+    return breaker, response_cache
+
+
+def _complete_json() -> str:
+    return GatewayLLM()._complete("llama-3.3-70b-versatile", 0.7, [{"role": "user", "content": "hi"}], [],
+                                  "personas", {"type": "json_object"})
+
+
+def test_rejected_output_goes_to_callers_that_repair_it_but_is_never_cached(rejected_json):
+    breaker, response_cache = rejected_json
+    token = accept_failed_generation.set(True)
+    try:
+        assert _complete_json() == '{"personas": [}'
+    finally:
+        accept_failed_generation.reset(token)
+
+    assert response_cache.writes == {}
+    assert breaker.stats()["calls"] == 0  # not recorded as a healthy call
+
+
+def test_rejected_output_raises_for_callers_without_repair(rejected_json):
+    _, response_cache = rejected_json
+    with pytest.raises(groq.BadRequestError):
+        _complete_json()
+    assert response_cache.writes == {}
+
+
+def test_rejected_probe_frees_the_half_open_slot(rejected_json, clock):
+    breaker, _ = rejected_json
+    for _ in range(4):
+        breaker.record(False, 1.0)
+    clock.now += 30
+    token = accept_failed_generation.set(True)
+    try:
+        _complete_json()
+    finally:
+        accept_failed_generation.reset(token)
+
+    assert breaker.state == HALF_OPEN and breaker.allow()
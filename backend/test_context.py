@@ -0,0 +1,101 @@
+"""
+Context compaction tests - compact_context digests of upstream sections and their use in run_stages
+Run: pytest test_context.py
+"""
+
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.models.schemas import ContentStrategy, StrategyInput
+from app.services import crew
+from app.services.crew import CONTEXT_FIELDS, CONTEXT_LIST_LIMIT, compact_context, run_stages
+from app.services.logic import generate_demo_strategy
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+DEMO = generate_demo_strategy(BRIEF)
+
+
+def _digest(section: str, *upstream: str) -> dict:
+    """compact_context output parsed back: upstream name -> data"""
+    text = compact_context(section, {name: {name: DEMO[name]} for name in upstream})
+    parts = {}
+    for part in text.split("\n\n"):
+        label, data = part.split(" (from previous agent): ")
+        parts[label.lower()] = json.loads(data)
+    return parts
+
+
+def test_digest_keeps_only_the_fields_a_stage_reads():
+    digest = _digest("competitor_gaps", "personas")
+
+    assert len(digest["personas"]) == min(3, len(DEMO["personas"]))
+    for item in digest["personas"]:
+        assert set(item) <= {"name", "age_range", "pain_points", "content_preferences"}
+        assert len(item["pain_points"]) <= CONTEXT_LIST_LIMIT
+
+
+def test_item_counts_are_capped_per_upstream_section():
+    digest = _digest("roi_prediction", "keywords", "calendar")
+
+    assert len(digest["keywords"]) <= 10 and len(digest["calendar"]) <= 12
+    assert all(set(item) == {"week", "format"} for item in digest["calendar"])
+
+
+def test_object_sections_are_projected_too():
+    digest = _digest("keywords", "strategic_guidance")
+
+    assert set(digest["strategic_guidance"]) == {"what_to_do", "what_to_focus_on"}
+
+
+def test_digest_is_much_smaller_than_the_raw_output():
+    upstream = ("personas", "competitor_gaps", "strategic_guidance", "keywords")
+    raw = "".join(json.dumps({name: DEMO[name]}) for name in upstream)
+
+    assert len(compact_context("calendar", {name: {name: DEMO[name]} for name in upstream})) < len(raw) / 2
+
+
+def test_section_without_a_spec_is_passed_whole():
+    assert _digest("personas", "competitor_gaps")["competitor_gaps"] == DEMO["competitor_gaps"]
+
+
+@pytest.mark.parametrize("section, upstream", [
+    (section, name) for section, specs in CONTEXT_FIELDS.items() for name in specs
+])
+def test_every_projected_field_exists_in_the_schema(section, upstream):
+    """A renamed schema field would silently drop out of every digest"""
+    annotation = ContentStrategy.model_fields[upstream].annotation
+    item_model = getattr(annotation, "__args__", (annotation,))[0]
+    keep, _ = CONTEXT_FIELDS[section][upstream]
+    assert set(keep) <= set(item_model.model_fields)
+
+
+class FakeTask:
+    def __init__(self, section: str, *upstream: "FakeTask"):
+        self.section = section
+        self.agent = object()
+        self.context = list(upstream)
+        self.contexts = []
+
+    def execute_sync(self, agent=None, context=None):
+        self.contexts.append(context)
+        return json.dumps({self.section: DEMO[self.section]})
+
+
+@pytest.mark.parametrize("compaction", [True, False])
+def test_run_stages_hands_over_the_digest_or_the_raw_output(monkeypatch, compaction):
+    monkeypatch.setattr(settings, "STAGE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "CREW_CONTEXT_COMPACTION", compaction)
+    monkeypatch.setattr(crew, "parse_section", lambda section, raw: json.loads(raw))
+    personas = FakeTask("personas")
+    gaps = FakeTask("competitor_gaps", personas)
+
+    run_stages({"personas": personas, "competitor_gaps": gaps}, BRIEF)
+
+    context = gaps.contexts[0]
+    if compaction:
+        assert context == compact_context("competitor_gaps", {"personas": {"personas": DEMO["personas"]}})
+    else:
+        assert json.loads(context) == {"personas": DEMO["personas"]}
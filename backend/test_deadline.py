@@ -0,0 +1,33 @@
+"""
+Request deadline tests - X-Request-Deadline > TIER_DEADLINES > REQUEST_DEADLINE_DEFAULT
+Run: pytest test_deadline.py
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.routers.strategy import resolve_deadline
+
+
+@pytest.fixture(autouse=True)
+def deadlines(monkeypatch):
+    monkeypatch.setattr(settings, "TIER_DEADLINES", {"free": 30, "expert": 0})
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_DEFAULT", None)
+
+
+@pytest.mark.parametrize("header, tier, expected", [
+    (None, "pro", None),      # nothing configured: wait for the crew
+    (None, "free", 30),       # tier entry
+    (None, "expert", None),   # tier entry of 0 is unbounded, not "use the default"
+    (10, "free", 10),         # header beats the tier
+    (0, "free", None),        # explicit 0 header is unbounded
+])
+def test_first_setting_that_is_set_wins(header, tier, expected):
+    assert resolve_deadline(header, tier) == expected
+
+
+def test_default_applies_only_without_header_or_tier_entry(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_DEFAULT", 55)
+    assert resolve_deadline(None, "pro") == 55
+    assert resolve_deadline(None, "expert") is None
+    assert resolve_deadline(0, "pro") is None
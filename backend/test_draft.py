@@ -0,0 +1,122 @@
+"""
+Speculative draft tests - instant draft on a miss, its background replacement, and cache hits skipping it
+Run: pytest test_draft.py   (needs fakeredis)
+"""
+
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.routers import strategy
+from app.services import cache, singleflight
+from app.services.cache import LocalLRUCache, generate_cache_key, get_cached_strategy
+from app.services.crew import SECTION_ORDER
+from app.services.pipeline import build_draft
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+USER = {"id": "u1", "tier": "free"}
+FINAL = {"personas": ["from the crew"], "provisional_sections": []}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Fake Mongo and crew: saved drafts, their updates and failures, and the crew runs"""
+    state = {"saved": {}, "updated": {}, "failed": {}, "runs": 0, "error": None, "release": None}
+
+    def save(user_id, strategy_input, strategy_dict, cache_key, generation_time, **extra):
+        strategy_id = f"s{len(state['saved']) + 1}"
+        state["saved"][strategy_id] = (strategy_dict, extra)
+        return strategy_id
+
+    async def executor(fn, strategy_input, *args, **kwargs):
+        state["runs"] += 1
+        await state["release"].wait()
+        if state["error"]:
+            raise state["error"]
+        return FINAL, "Strategy generated successfully"
+
+    monkeypatch.setattr(cache, "redis_client", fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(cache, "REDIS_ENABLED", True)
+    monkeypatch.setattr(cache, "local_cache", LocalLRUCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL))
+    monkeypatch.setattr(singleflight, "REDIS_ENABLED", False)
+    monkeypatch.setattr(singleflight, "_inflight", {})
+    monkeypatch.setattr(strategy, "check_rate_limit", lambda user_id, tier: {"exceeded": False})
+    monkeypatch.setattr(strategy, "run_in_crew_executor", executor)
+    monkeypatch.setattr(strategy, "save_strategy", save)
+    monkeypatch.setattr(strategy, "update_strategy", lambda strategy_id, strategy_dict, generation_time, **extra:
+                        state["updated"].__setitem__(strategy_id, (strategy_dict, extra)))
+    monkeypatch.setattr(strategy, "mark_strategy_failed", lambda strategy_id, error:
+                        state["failed"].__setitem__(strategy_id, error))
+    return state
+
+
+def _request():
+    return strategy.generate_strategy(BRIEF, mode="full", background=False, speculative=True,
+                                      x_request_deadline=None, current_user=USER)
+
+
+def _run(store, *requests_before_the_crew_finishes):
+    """Send the requests, then let the crew finish and the drafts be replaced"""
+    async def scenario():
+        store["release"] = asyncio.Event()
+        responses = [await request() for request in requests_before_the_crew_finishes]
+        store["release"].set()
+        await asyncio.gather(*list(strategy._background_tasks))
+        return responses
+    return asyncio.run(scenario())
+
+
+def test_draft_is_deterministic_and_fully_provisional():
+    draft = build_draft(BRIEF)
+
+    assert draft == build_draft(BRIEF)
+    assert draft["provisional_sections"] == SECTION_ORDER
+    assert set(SECTION_ORDER) <= set(draft)
+    assert draft["tactical_blueprint"] and draft["sample_posts"]
+
+
+def test_miss_returns_the_draft_and_the_crew_replaces_it(store):
+    (response,) = _run(store, _request)
+
+    assert response["draft"] and response["finishing_in_background"]
+    assert response["strategy"] == build_draft(BRIEF)
+    assert response["status_url"] == f"/api/strategy/{response['strategy_id']}/status"
+    assert store["saved"][response["strategy_id"]][1]["status"] == "draft"
+
+    final, extra = store["updated"][response["strategy_id"]]
+    assert (final, extra["status"], extra["provisional_sections"]) == (FINAL, "complete", [])
+    assert get_cached_strategy(generate_cache_key(BRIEF, "full")) == FINAL
+
+
+def test_cached_strategy_is_served_instead_of_a_draft(store):
+    _run(store, _request)
+
+    (response,) = _run(store, _request)
+
+    assert response["cached"] and "draft" not in response
+    assert response["strategy"] == FINAL
+    assert store["runs"] == 1 and len(store["saved"]) == 1
+
+
+def test_concurrent_drafts_share_one_crew_run(store):
+    first, second = _run(store, _request, _request)
+
+    assert store["runs"] == 1
+    assert first["strategy_id"] != second["strategy_id"]
+    assert {strategy_id: update[0] for strategy_id, update in store["updated"].items()} == {
+        first["strategy_id"]: FINAL, second["strategy_id"]: FINAL}
+
+
+def test_failed_generation_marks_the_draft_failed(store):
+    store["error"] = RuntimeError("groq down")
+
+    (response,) = _run(store, _request)
+
+    assert store["failed"] == {response["strategy_id"]: "groq down"}
+    assert store["updated"] == {}
+    assert get_cached_strategy(generate_cache_key(BRIEF, "full")) is None
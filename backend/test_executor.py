@@ -0,0 +1,122 @@
+"""
+Crew executor tests - PriorityGate admission order and slot release
+Run: pytest test_executor.py
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import executor
+from app.services.executor import PriorityGate, run_in_crew_executor
+
+
+def _admission_order(gate: PriorityGate, requests: list) -> list:
+    """Queue `requests` ((name, tier, user), ...) behind a gate held by "holder", then free it"""
+    async def scenario():
+        order = []
+
+        async def waiter(name, tier, user):
+            await gate.acquire(tier, user)
+            order.append(name)
+            gate.release(user)  # hands the slot to the next waiter
+
+        tasks = []
+        for name, tier, user in requests:
+            tasks.append(asyncio.create_task(waiter(name, tier, user)))
+            await asyncio.sleep(0)  # enqueue in this order
+        gate.release("holder")
+        await asyncio.gather(*tasks)
+        return order
+
+    return asyncio.run(scenario())
+
+
+def test_gate_admits_immediately_below_limit():
+    async def scenario():
+        gate = PriorityGate(2)
+        await gate.acquire("free", "a")
+        await gate.acquire("free", "b")
+        return gate.stats()
+
+    assert asyncio.run(scenario()) == {"running": 2, "waiting": 0, "waiting_by_tier": {}}
+
+
+def test_gate_orders_by_tier_then_fifo():
+    gate = PriorityGate(1)
+    gate._admit("holder")
+    order = _admission_order(gate, [
+        ("free-1", "free", "u1"),
+        ("pro-1", "pro", "u2"),
+        ("expert-1", "expert", "u3"),
+        ("free-2", "free", "u4"),
+        ("pro-2", "pro", "u5"),
+    ])
+    assert order == ["expert-1", "pro-1", "pro-2", "free-1", "free-2"]
+
+
+def test_gate_prefers_users_with_fewer_running():
+    gate = PriorityGate(1)
+    gate._admit("holder")
+    gate._per_user["busy"] = 2  # already has two generations running
+    order = _admission_order(gate, [
+        ("busy-user", "pro", "busy"),
+        ("idle-user", "pro", "idle"),
+    ])
+    assert order == ["idle-user", "busy-user"]
+
+
+def test_gate_skips_cancelled_waiters():
+    async def scenario():
+        gate = PriorityGate(1)
+        await gate.acquire("free", "a")
+        gone = asyncio.create_task(gate.acquire("expert", "b"))
+        stays = asyncio.create_task(gate.acquire("free", "c"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.sleep(0)
+        gate.release("a")
+        await stays
+        return gate.stats(), dict(gate._per_user)
+
+    stats, per_user = asyncio.run(scenario())
+    assert stats["running"] == 1 and stats["waiting"] == 0
+    assert per_user == {"c": 1}
+
+
+def test_cancelled_request_keeps_slot_until_crew_finishes():
+    first_running, first_release = threading.Event(), threading.Event()
+    second_started = threading.Event()
+
+    def first_crew():
+        first_running.set()
+        first_release.wait(5)
+        return "first"
+
+    def second_crew():
+        second_started.set()
+        return "second"
+
+    async def scenario():
+        executor._gate = PriorityGate(1)
+        executor._executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            first = asyncio.create_task(run_in_crew_executor(first_crew, user_id="a"))
+            while not first_running.is_set():
+                await asyncio.sleep(0.01)
+            first.cancel()  # client went away; the crew thread keeps running
+            second = asyncio.create_task(run_in_crew_executor(second_crew, user_id="b"))
+            await asyncio.sleep(0.1)
+            assert not second_started.is_set(), "second crew admitted while the first still runs"
+            assert executor._gate.active == 1
+
+            first_release.set()
+            assert await asyncio.wait_for(second, 5) == "second"
+            await asyncio.sleep(0.05)
+            assert executor._gate.active == 0
+        finally:
+            first_release.set()
+            executor._executor.shutdown(wait=True)
+            executor._executor = executor._gate = None
+
+    asyncio.run(scenario())
@@ -0,0 +1,139 @@
+"""
+LLM transport tests - the shared keep-alive pool, connection warm-up and token streaming into the sink
+Run: pytest test_http.py
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.core.config import settings
+from app.services import http, llm
+from app.services.http import close_http_clients, get_http_async_client, get_http_client, warm_up_llm_connections
+from app.services.llm import GatewayLLM, stream_sink
+
+ANSWER = json.dumps({"personas": [{"name": "Night owl"}, {"name": "Commuter"}]})
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Fresh module-level clients for the test, closed afterwards"""
+    monkeypatch.setattr(http, "_http_client", None)
+    monkeypatch.setattr(http, "_http_async_client", None)
+    monkeypatch.setattr(llm, "_clients", {})
+    monkeypatch.setattr(llm, "_fallback_client", None)
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "gsk_test")
+    yield
+    if http._http_client is not None:
+        http._http_client.close()
+
+
+def test_every_llm_client_shares_one_pool(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_FALLBACK_BASE_URL", "http://localhost:8000/v1")
+
+    smart = llm._get_client("groq/llama-3.3-70b-versatile", 0.7)
+    fast = llm._get_client("groq/llama-3.1-8b-instant", 0.3)
+
+    assert smart is llm._get_client("groq/llama-3.3-70b-versatile", 0.7)
+    assert smart.http_client is fast.http_client is get_http_client()
+    assert smart.http_async_client is fast.http_async_client is get_http_async_client()
+    assert llm._get_fallback_client()._client is get_http_client()
+
+
+def test_pool_uses_the_configured_limits(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HTTP_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(settings, "LLM_HTTP_MAX_KEEPALIVE", 5)
+
+    pooled = get_http_client()._transport._pool
+
+    assert (pooled._max_connections, pooled._max_keepalive_connections) == (7, 5)
+    assert get_http_client() is get_http_client()
+
+
+def test_close_releases_the_clients(pool):
+    client = get_http_client()
+    asyncio.run(close_http_clients())
+
+    assert client.is_closed
+    assert get_http_client() is not client
+
+
+def test_warm_up_opens_the_configured_number_of_connections(pool, monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if len(seen) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"data": []})
+
+    monkeypatch.setattr(settings, "LLM_HTTP_WARM_CONNECTIONS", 3)
+    monkeypatch.setattr(http, "_http_client", httpx.Client(transport=httpx.MockTransport(handler)))
+
+    assert warm_up_llm_connections() == 2
+    assert len(seen) == 3
+    assert all(request.headers["Authorization"] == "Bearer gsk_test" for request in seen)
+
+
+def test_warm_up_is_skipped_without_a_key(pool, monkeypatch):
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "")
+    assert warm_up_llm_connections() == 0
+    assert http._http_client is None
+
+
+class FakeGroq:
+    """ChatGroq stand-in: streams ANSWER in chunks, noting what the sink had seen before each one"""
+
+    def __init__(self, sink_events: list, size: int = 9):
+        self.sink_events = sink_events
+        self.size = size
+        self.seen_before_chunk = []
+        self.invoked = []
+
+    def stream(self, messages, stop=None):
+        for start in range(0, len(ANSWER), self.size):
+            self.seen_before_chunk.append(len(self.sink_events))
+            chunk = AIMessageChunk(content=ANSWER[start:start + self.size])
+            if start + self.size >= len(ANSWER):
+                chunk.usage_metadata = {"input_tokens": 12, "output_tokens": 20, "total_tokens": 32}
+            yield chunk
+
+    def invoke(self, messages, stop=None, **kwargs):
+        self.invoked.append(kwargs)
+        return AIMessage(content=ANSWER, usage_metadata={"input_tokens": 12, "output_tokens": 20, "total_tokens": 32})
+
+
+def _invoke(client, response_format=None, sink=None) -> tuple[str, dict]:
+    token = stream_sink.set(sink)
+    try:
+        return GatewayLLM()._invoke(client, [{"role": "user", "content": "personas"}], [], response_format)
+    finally:
+        stream_sink.reset(token)
+
+
+def test_streamed_items_reach_the_sink_before_the_completion_ends():
+    events = []
+    client = FakeGroq(events)
+
+    text, usage = _invoke(client, sink=lambda path, index, item: events.append((path, index, item)))
+
+    assert text == ANSWER
+    assert usage["total_tokens"] == 32
+    assert events == [("personas", 0, {"name": "Night owl"}), ("personas", 1, {"name": "Commuter"})]
+    assert client.seen_before_chunk[-1] >= 1  # the first persona arrived mid-stream
+    assert client.invoked == []
+
+
+def test_structured_and_unsinked_calls_are_not_streamed():
+    events = []
+    client = FakeGroq(events)
+
+    assert _invoke(client)[0] == ANSWER
+    _invoke(client, {"type": "json_object"}, sink=lambda path, index, item: events.append(index))
+
+    assert client.seen_before_chunk == []
+    assert client.invoked == [{}, {"response_format": {"type": "json_object"}}]
+    assert events == [0, 1]  # fed once the structured response is complete
@@ -0,0 +1,130 @@
+"""
+Streaming JSON tests - IncrementalJSONParser element events and extract_json
+Run: pytest test_jsonstream.py
+"""
+
+import json
+
+import pytest
+
+from app.services.jsonstream import IncrementalJSONParser, extract_json
+
+PAYLOAD = {
+    "personas": [
+        {"name": "Night \"owl\" student", "pain_points": ["rent", "exams"], "tags": [["a", "b"], []]},
+        {"name": "Back\\slash {not a brace}", "pain_points": []},
+    ],
+    "what_to_do": ["Reels", "Carousels, with commas"],
+    "roi": {"traffic": "23%"},
+}
+
+
+def _stream(text: str, size: int) -> tuple:
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+def _expected() -> list:
+    return [("personas", i, p) for i, p in enumerate(PAYLOAD["personas"])] + \
+           [("what_to_do", i, v) for i, v in enumerate(PAYLOAD["what_to_do"])]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_elements_are_the_same_for_any_chunking(size):
+    text = json.dumps(PAYLOAD)
+    parser, events = _stream(text, size)
+
+    assert events == _expected()
+    assert parser.done and parser.result() == PAYLOAD
+
+
+def test_escape_split_across_chunks():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"personas": [{"name": "say \\')
+    events += parser.feed('"hi\\')
+    events += parser.feed('\\"}, {"name": "b]"}]}')
+
+    assert events == [("personas", 0, {"name": 'say "hi\\'}), ("personas", 1, {"name": "b]"})]
+    assert parser.done
+
+
+def test_nested_arrays_are_emitted_whole_with_their_item():
+    parser, events = _stream('[{"tags": [[1, 2], [3]]}, [4, [5]], {"x": []}]', 4)
+
+    assert events == [(None, 0, {"tags": [[1, 2], [3]]}), (None, 1, [4, [5]]), (None, 2, {"x": []})]
+    assert parser.result() == [{"tags": [[1, 2], [3]]}, [4, [5]], {"x": []}]
+
+
+def test_arrays_below_the_first_level_of_the_root_object_are_not_tracked():
+    parser, events = _stream('{"roi": {"weeks": [1, 2]}, "keywords": [{"term": "coffee"}]}', 5)
+
+    assert events == [("keywords", 0, {"term": "coffee"})]
+
+
+def test_leading_prose_and_fences_are_skipped():
+    text = 'Thought: I now know [see below] {the answer}.\nFinal Answer: ```json\n' + json.dumps(PAYLOAD) + "\n```"
+    parser, events = _stream(text, 9)
+
+    assert events == _expected()
+    assert parser.result() == PAYLOAD
+
+
+def test_prose_array_of_plain_values_is_not_emitted():
+    text = 'Cite sources [1, 2] and ["a"] here.\n{"keywords": [{"term": "coffee"}]}'
+    parser, events = _stream(text, 6)
+
+    assert events == [("keywords", 0, {"term": "coffee"})]
+    assert parser.result() == {"keywords": [{"term": "coffee"}]}
+
+
+def test_many_prose_brackets_in_one_chunk_do_not_recurse():
+    text = "see [1] " * 5000 + '{"keywords": [{"term": "coffee"}]}'
+    parser = IncrementalJSONParser()
+
+    assert parser.feed(text) == [("keywords", 0, {"term": "coffee"})]
+    assert parser.done
+
+
+def test_truncated_stream_keeps_the_elements_that_completed():
+    text = json.dumps(PAYLOAD)
+    cut = text.index('"Back')
+    parser, events = _stream(text[:cut + 10], 8)
+
+    assert events == [("personas", 0, PAYLOAD["personas"][0])]
+    assert not parser.done
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+
+
+def test_feed_after_done_is_ignored():
+    parser = IncrementalJSONParser()
+    parser.feed('[{"a": 1}] trailing [{"b": 2}]')
+
+    assert parser.done and parser.feed('[{"c": 3}]') == []
+    assert parser.result() == [{"a": 1}]
+
+
+# ============================================================================
+# extract_json
+# ============================================================================
+
+def test_extract_json_from_fenced_answer_with_prose():
+    assert extract_json('Here you go:\n```json\n{"a": [1, "]"]}\n```\nThanks!') == {"a": [1, "]"]}
+
+
+def test_extract_json_skips_prose_brackets():
+    assert extract_json("Notes [see below] and [1, 2]:\n[{\"a\": 1}]") == [{"a": 1}]
+
+
+def test_extract_json_returns_a_plain_array_when_nothing_else_follows():
+    assert extract_json("Answer: [1, 2, 3]") == [1, 2, 3]
+
+
+def test_extract_json_raises_on_broken_payload():
+    with pytest.raises(json.JSONDecodeError):
+        extract_json('{"personas": [{"name": "a"},')
+    with pytest.raises(json.JSONDecodeError):
+        extract_json("no json here")
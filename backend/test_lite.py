@@ -0,0 +1,93 @@
+"""
+Lite mode tests - the single call's JSON mode, section validation and the request deadline
+Run: pytest test_lite.py
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import lite
+from app.services.lite import LITE_SECTIONS, LiteStrategy, generate_lite_strategy
+from app.services.llm import CallCancelled, GatewayLLM, call_cancelled
+from app.services.logic import generate_demo_strategy
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+DEMO = generate_demo_strategy(BRIEF)
+
+
+@pytest.fixture
+def answer(monkeypatch):
+    """Scripted lite_llm.call: `answer["raw"]` is returned, `answer["calls"]` records the kwargs"""
+    script = {"raw": json.dumps({section: DEMO[section] for section in LITE_SECTIONS}), "calls": [], "delay": 0}
+
+    def call(messages, **kwargs):
+        script["calls"].append(kwargs)
+        time.sleep(script["delay"])
+        return script["raw"]
+
+    monkeypatch.setattr(lite.lite_llm, "call", call)
+    monkeypatch.setattr(lite, "evict_cached_responses", lambda keys: script.setdefault("evicted", []).append(keys))
+    return script
+
+
+def test_lite_call_asks_for_json_mode(answer, monkeypatch):
+    strategy = generate_lite_strategy(BRIEF)
+
+    assert set(strategy) == set(LITE_SECTIONS)
+    assert answer["calls"] == [{"response_model": LiteStrategy}]
+    monkeypatch.setattr(settings, "LLM_STRUCTURED_OUTPUT", "json_object")
+    assert GatewayLLM()._response_format(LiteStrategy, None) == {"type": "json_object"}
+    monkeypatch.setattr(settings, "LLM_STRUCTURED_OUTPUT", "json_schema")
+    schema = GatewayLLM()._response_format(LiteStrategy, None)["json_schema"]["schema"]
+    assert set(schema["properties"]) == set(LITE_SECTIONS)
+
+
+def test_invalid_section_is_filled_from_demo_and_evicted(answer):
+    answer["raw"] = json.dumps({**{section: DEMO[section] for section in LITE_SECTIONS}, "roi_prediction": {}})
+
+    strategy = generate_lite_strategy(BRIEF)
+
+    assert strategy["fallback_sections"] == ["roi_prediction"]
+    assert len(answer["evicted"]) == 1
+
+
+def test_call_past_the_deadline_returns_provisional_demo(answer):
+    answer["delay"] = 1.0
+    started = time.monotonic()
+
+    strategy = generate_lite_strategy(BRIEF, deadline=time.monotonic() + 0.2)
+
+    assert time.monotonic() - started < 0.9
+    assert strategy["provisional_sections"] == LITE_SECTIONS
+    assert strategy["personas"] == DEMO["personas"]
+
+
+def test_abandoned_call_makes_no_further_llm_calls(monkeypatch):
+    outcome, released = [], threading.Event()
+
+    def call(messages, **kwargs):
+        released.wait(5)
+        try:
+            # e.g. the route's fallback model, tried after the first model failed
+            GatewayLLM.call(lite.lite_llm, messages)
+        except CallCancelled:
+            outcome.append(call_cancelled.get().is_set())
+        return "{}"
+
+    monkeypatch.setattr(lite.lite_llm, "call", call)
+    monkeypatch.setattr(GatewayLLM, "_complete", lambda *args, **kwargs: pytest.fail("LLM called after the deadline"))
+
+    generate_lite_strategy(BRIEF, deadline=time.monotonic() + 0.1)
+    released.set()
+    for _ in range(100):
+        if outcome:
+            break
+        time.sleep(0.02)
+
+    assert outcome == [True]
@@ -0,0 +1,106 @@
+"""
+LLM response cache tests - GatewayLLM._complete hits, misses and eviction against fakeredis and diskcache
+Run: pytest test_llm_cache.py   (needs fakeredis)
+"""
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.services import llm
+from app.services.breaker import CircuitBreaker
+from app.services.llm import (
+    DiskLLMCache, GatewayLLM, RedisLLMCache, cache_key_log, evict_cached_responses, get_llm_cache_stats,
+    prompt_cache_key,
+)
+
+MODEL = "groq/llama-3.3-70b-versatile"
+MESSAGES = [{"role": "user", "content": "Three personas for a campus coffee brand"}]
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    """Completions made against Groq (cache misses), as ((model, temperature), response_format)"""
+    made = []
+
+    def invoke(self, client, messages, stop, response_format=None):
+        made.append((client, response_format))
+        return f"answer {len(made)}", {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+    monkeypatch.setattr(llm, "get_breaker", lambda name: CircuitBreaker(name))
+    monkeypatch.setattr(llm, "_get_client", lambda model, temperature: (model, temperature))
+    monkeypatch.setattr(llm, "acquire_llm_budget", lambda tokens, model: None)
+    monkeypatch.setattr(llm, "settle_llm_budget", lambda estimated, actual, model: None)
+    monkeypatch.setattr(GatewayLLM, "_invoke", invoke)
+    return made
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(llm, "redis_client", client)
+    monkeypatch.setattr(llm, "response_cache", RedisLLMCache())
+    return client
+
+
+def _complete(model=MODEL, temperature=0.7, messages=MESSAGES, response_format=None) -> str:
+    return GatewayLLM()._complete(model, temperature, messages, [], "personas", response_format)
+
+
+def test_repeated_prompt_is_served_from_the_cache(groq, redis):
+    before = get_llm_cache_stats()
+
+    assert _complete() == "answer 1"
+    assert _complete() == "answer 1"
+
+    stats = get_llm_cache_stats()
+    assert len(groq) == 1
+    assert (stats["misses"] - before["misses"], stats["hits"] - before["hits"]) == (1, 1)
+    assert stats["backend"] == "RedisLLMCache"
+    key = prompt_cache_key(MODEL, 0.7, MESSAGES, [], None)
+    assert 0 < redis.ttl(f"llmcache:{key}") <= settings.LLM_CACHE_TTL
+
+
+@pytest.mark.parametrize("change", [
+    {"model": "groq/llama-3.1-8b-instant"},
+    {"temperature": 0.3},
+    {"messages": [{"role": "user", "content": "Three personas for a campus tea brand"}]},
+    {"response_format": {"type": "json_object"}},
+])
+def test_anything_that_changes_the_answer_misses(groq, redis, change):
+    _complete()
+    _complete(**change)
+    assert len(groq) == 2
+
+
+def test_evicted_completion_is_asked_again(groq, redis):
+    keys = []
+    token = cache_key_log.set(keys)
+    try:
+        _complete()
+    finally:
+        cache_key_log.reset(token)
+
+    evict_cached_responses(keys)
+
+    assert _complete() == "answer 2"
+    assert len(groq) == 2
+
+
+def test_blank_completion_is_not_cached(groq, redis, monkeypatch):
+    monkeypatch.setattr(GatewayLLM, "_invoke", lambda self, *args, **kwargs: (groq.append(1) or "  ", {}))
+    _complete()
+    _complete()
+    assert len(groq) == 2
+
+
+def test_disk_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_DIR", str(tmp_path))
+    cache = DiskLLMCache()
+
+    assert cache.get("k") is None
+    cache.set("k", "answer")
+    assert cache.get("k") == "answer"
+    cache.delete("k")
+    assert cache.get("k") is None
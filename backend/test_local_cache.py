@@ -0,0 +1,141 @@
+"""
+Local cache tier tests - LocalLRUCache byte budget/LRU/TTL and pub/sub invalidation against fakeredis
+Run: pytest test_local_cache.py   (needs fakeredis)
+"""
+
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.services import cache
+from app.services.cache import (
+    INVALIDATION_CHANNEL, LocalLRUCache, get_cache_entry, invalidate_strategy, set_cached_strategy,
+)
+
+
+def test_least_recently_used_entry_is_evicted_past_the_byte_budget():
+    lru = LocalLRUCache(max_bytes=100, ttl=60)
+    lru.put("a", "A", 40)
+    lru.put("b", "B", 40)
+    lru.get("a")  # "b" is now the least recently used
+
+    lru.put("c", "C", 40)
+
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == ("A", None, "C")
+    assert lru.stats() == {"entries": 2, "bytes": 80, "max_bytes": 100}
+
+
+def test_replacing_and_deleting_keep_the_byte_count():
+    lru = LocalLRUCache(max_bytes=100, ttl=60)
+    lru.put("a", "A", 40)
+    lru.put("a", "A2", 70)
+    assert lru.stats()["bytes"] == 70
+
+    lru.delete("a")
+    lru.delete("missing")
+    assert lru.stats()["bytes"] == 0
+
+
+def test_payload_larger_than_the_budget_is_not_kept():
+    lru = LocalLRUCache(max_bytes=100, ttl=60)
+    lru.put("a", "A", 40)
+    lru.put("huge", "H", 101)
+    assert (lru.get("a"), lru.get("huge")) == ("A", None)
+
+
+def test_entries_expire_and_ttl_is_capped_by_the_tier_ttl():
+    lru = LocalLRUCache(max_bytes=100, ttl=0.2)
+    lru.put("short", "S", 10, ttl=0.05)
+    lru.put("long", "L", 10, ttl=3600)  # e.g. the Redis entry's remaining hard TTL
+
+    time.sleep(0.1)
+    assert (lru.get("short"), lru.get("long")) == (None, "L")
+    time.sleep(0.15)
+    assert lru.get("long") is None
+    assert lru.stats()["bytes"] == 0
+
+
+class StopListening(BaseException):
+    """Not an Exception, so the listener's reconnect loop lets it through"""
+
+
+@pytest.fixture
+def node(monkeypatch):
+    """This process's caches against fakeredis, with the invalidation listener running"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "REDIS_ENABLED", True)
+    monkeypatch.setattr(cache, "local_cache", LocalLRUCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL))
+
+    stopped = threading.Event()
+    subscribe = client.pubsub
+
+    def pubsub(**kwargs):
+        subscription = subscribe(**kwargs)
+        get_message = subscription.get_message
+
+        def poll(timeout=None):
+            if stopped.is_set():
+                raise StopListening
+            return get_message(timeout=0.05)
+
+        subscription.get_message = poll
+        return subscription
+
+    def listen():
+        try:
+            cache._listen_for_invalidations()
+        except StopListening:
+            pass
+
+    monkeypatch.setattr(client, "pubsub", pubsub)
+    listener = threading.Thread(target=listen, daemon=True)
+    listener.start()
+    _wait_for(lambda: client.pubsub_numsub(INVALIDATION_CHANNEL)[0][1] == 1)
+    yield client
+    stopped.set()
+    listener.join(1)
+
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    until = time.monotonic() + timeout
+    while time.monotonic() < until:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_write_on_another_node_drops_the_local_copy(node):
+    set_cached_strategy("k", {"personas": ["old"]})
+    set_cached_strategy("k2", {"personas": ["old"]})
+
+    node.publish(INVALIDATION_CHANNEL, "other-host:1|k")  # another node regenerated "k"
+
+    assert _wait_for(lambda: cache.local_cache.get("k") is None)
+    assert cache.local_cache.get("k2") is not None
+
+
+def test_own_writes_keep_the_local_copy(node):
+    set_cached_strategy("k", {"personas": ["new"]})  # published with this NODE_ID
+    cache.local_cache.put("marker", {}, 2)
+    node.publish(INVALIDATION_CHANNEL, "other-host:1|marker")
+
+    assert _wait_for(lambda: cache.local_cache.get("marker") is None)  # everything before it was handled
+    assert cache.local_cache.get("k")["strategy"] == {"personas": ["new"]}
+
+
+def test_invalidate_strategy_clears_every_tier_and_tells_the_other_nodes(node):
+    set_cached_strategy("k", {"personas": ["old"]})
+    peer = node.pubsub(ignore_subscribe_messages=True)
+    peer.subscribe(INVALIDATION_CHANNEL)
+
+    invalidate_strategy("k")
+
+    assert get_cache_entry("k") is None
+    assert node.get("strategy:k") is None
+    assert _wait_for(lambda: (peer.get_message() or {}).get("data") == f"{cache.NODE_ID}|k")
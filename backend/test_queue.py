@@ -0,0 +1,188 @@
+"""
+Job queue tests - Lua enqueue/claim/reap/retry scripts against fakeredis
+Run: pytest test_queue.py   (needs fakeredis[lua])
+"""
+
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import queue
+from app.services.queue import (
+    enqueue_job, claim_job, extend_lease, ack_job, fail_job, requeue_expired_jobs, get_job,
+    PROCESSING_KEY,
+)
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(queue, "redis_client", client)
+    monkeypatch.setattr(queue, "REDIS_ENABLED", True)
+    for name, lua in (("_enqueue_script", queue._ENQUEUE_LUA), ("_claim_script", queue._CLAIM_LUA),
+                      ("_reap_script", queue._REAP_LUA), ("_retry_script", queue._RETRY_LUA)):
+        monkeypatch.setattr(queue, name, client.register_script(lua), raising=False)
+    monkeypatch.setattr(settings, "TIER_WEIGHTS", {"expert": 6, "pro": 3, "free": 1})
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", 120)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    return client
+
+
+def _claim_all(worker="w1") -> list:
+    claimed = []
+    while (job := claim_job(worker)) is not None:
+        claimed.append(job["job_id"])
+    return claimed
+
+
+def test_claim_is_fifo_per_user_and_round_robin_across_users(redis):
+    a1, a2, a3 = (enqueue_job("alice", BRIEF) for _ in range(3))
+    b1 = enqueue_job("bob", BRIEF)
+    c1, c2 = (enqueue_job("carol", BRIEF) for _ in range(2))
+
+    assert _claim_all() == [a1, b1, c1, a2, c2, a3]
+    # Everything leased, nothing left queued
+    assert redis.zcard(PROCESSING_KEY) == 6
+    assert redis.llen("jobs:lane:free") == 0
+
+
+def test_higher_tier_lane_is_claimed_first(redis, monkeypatch):
+    # A zero-weight lane is only served once every weighted lane is empty
+    monkeypatch.setattr(settings, "TIER_WEIGHTS", {"pro": 1, "free": 0})
+    free_job = enqueue_job("alice", BRIEF, tier="free")
+    pro_job = enqueue_job("bob", BRIEF, tier="pro")
+    unknown_tier_job = enqueue_job("carol", BRIEF, tier="platinum")  # falls back to free
+
+    assert _claim_all() == [pro_job, free_job, unknown_tier_job]
+
+
+def test_claim_leases_and_marks_processing(redis):
+    job_id = enqueue_job("alice", BRIEF)
+    job = claim_job("w1")
+
+    assert job["job_id"] == job_id and job["status"] == "processing" and job["worker"] == "w1"
+    assert int(job["attempts"]) == 1
+    lease = redis.zscore(PROCESSING_KEY, job_id)
+    assert lease == pytest.approx((time.time() + settings.JOB_VISIBILITY_TIMEOUT) * 1000, abs=5000)
+    assert get_job(job_id)["input"]["goal"] == BRIEF.goal
+
+
+def test_expired_lease_is_redelivered_ahead_of_the_users_other_jobs(redis, monkeypatch):
+    first = enqueue_job("alice", BRIEF)
+    second = enqueue_job("alice", BRIEF)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", -1)  # lease expires immediately
+    assert claim_job("w1")["job_id"] == first
+
+    assert requeue_expired_jobs() == 1
+    assert redis.zcard(PROCESSING_KEY) == 0
+    assert redis.hget(f"job:{first}", "status") == "queued"
+    assert redis.lrange("jobs:user:alice", 0, -1) == [first, second]
+    assert redis.lrange("jobs:lane:free", 0, -1) == ["alice"]
+
+    redelivered = claim_job("w2")
+    assert redelivered["job_id"] == first and int(redelivered["attempts"]) == 2
+
+
+def test_lease_expiring_too_often_fails_the_job(redis, monkeypatch):
+    job_id = enqueue_job("alice", BRIEF)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", -1)
+    for _ in range(settings.JOB_MAX_ATTEMPTS):
+        assert claim_job("w1")["job_id"] == job_id
+        requeue_expired_jobs()
+
+    assert redis.hget(f"job:{job_id}", "status") == "failed"
+    assert claim_job("w1") is None
+
+
+def test_heartbeat_keeps_lease_alive(redis, monkeypatch):
+    job_id = enqueue_job("alice", BRIEF)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", -1)
+    claim_job("w1")
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", 120)
+    extend_lease(job_id)
+
+    assert requeue_expired_jobs() == 0
+    assert redis.hget(f"job:{job_id}", "status") == "processing"
+
+
+def test_ack_releases_lease_and_late_heartbeat_does_not_revive_it(redis):
+    job_id = enqueue_job("alice", BRIEF)
+    claim_job("w1")
+    ack_job(job_id, result="{}", message="ok")
+    extend_lease(job_id)  # heartbeat racing the ack
+
+    assert redis.zscore(PROCESSING_KEY, job_id) is None
+    assert requeue_expired_jobs() == 0
+    assert get_job(job_id)["status"] == "complete"
+
+
+def test_failed_job_retries_first_then_fails_after_max_attempts(redis):
+    job_id = enqueue_job("alice", BRIEF)
+    other = enqueue_job("alice", BRIEF)
+    assert claim_job("w1")["job_id"] == job_id
+    fail_job(job_id, "boom")
+    assert redis.lrange("jobs:user:alice", 0, -1) == [job_id, other]
+    assert redis.hget(f"job:{job_id}", "error") == "boom"
+
+    for _ in range(settings.JOB_MAX_ATTEMPTS - 1):
+        assert claim_job("w1")["job_id"] == job_id
+        fail_job(job_id, "boom")
+    assert redis.hget(f"job:{job_id}", "status") == "failed"
+    assert redis.zscore(PROCESSING_KEY, job_id) is None
+    assert _claim_all() == [other]
+
+
+def test_worker_heartbeat_extends_lease_until_done(redis, monkeypatch):
+    worker = pytest.importorskip("app.worker")
+    job_id = enqueue_job("alice", BRIEF)
+    monkeypatch.setattr(settings, "JOB_VISIBILITY_TIMEOUT", 3)  # heartbeat every second
+    claim_job("w1")
+    leased = redis.zscore(PROCESSING_KEY, job_id)
+
+    done = threading.Event()
+    beat = threading.Thread(target=worker._heartbeat, args=(job_id, done))
+    beat.start()
+    time.sleep(1.5)
+    extended = redis.zscore(PROCESSING_KEY, job_id)
+    done.set()
+    beat.join(2)
+
+    assert extended > leased
+    assert not beat.is_alive()
+
+
+def test_worker_loop_survives_a_crashing_job(redis, monkeypatch):
+    worker = pytest.importorskip("app.worker")
+    bad = enqueue_job("alice", BRIEF)
+    good = enqueue_job("bob", BRIEF)
+    redis.hset(f"job:{bad}", "input", "not json")  # fails before process_job's own try
+    processed = []
+    real_process_job = worker.process_job
+
+    def process_job(job):
+        if job["job_id"] == good:
+            processed.append(good)
+            worker.stop_event.set()
+            return
+        real_process_job(job)
+
+    monkeypatch.setattr(worker, "process_job", process_job)
+    monkeypatch.setattr(worker, "stop_event", threading.Event())
+    monkeypatch.setattr(worker, "claim_job", queue.claim_job)
+    monkeypatch.setattr(worker, "requeue_expired_jobs", queue.requeue_expired_jobs)
+
+    loop = threading.Thread(target=worker.worker_loop, args=("w1",), daemon=True)
+    loop.start()
+    loop.join(5)
+
+    assert not loop.is_alive() and processed == [good]
+    # The crashed job is still leased, so the reaper redelivers it once the lease expires
+    assert redis.zscore(PROCESSING_KEY, bad) is not None
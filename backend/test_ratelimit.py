@@ -0,0 +1,91 @@
+"""
+LLM budget tests - per-model waiter queues, tier priority and stats
+Run: pytest test_ratelimit.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import ratelimit
+from app.services.ratelimit import acquire_llm_budget, get_budget_stats, request_tier
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Buckets are scripted per model: budget["model"] = ms to wait (0 = available)"""
+    waits = {}
+    monkeypatch.setattr(ratelimit, "_take", lambda tokens, model: waits.get(model, 0))
+    monkeypatch.setattr(ratelimit, "_wait_queues", {})
+    monkeypatch.setattr(ratelimit, "_stats", dict.fromkeys(ratelimit._stats, 0))
+    monkeypatch.setattr(settings, "LLM_BUDGET_MAX_WAIT", 5)
+    monkeypatch.setattr(settings, "TIER_WEIGHTS", {"expert": 6, "pro": 3, "free": 1})
+    return waits
+
+
+def _acquire_in_thread(model: str, tier: str = "free", done: list = None) -> threading.Thread:
+    def run():
+        request_tier.set(tier)
+        try:
+            acquire_llm_budget(100, model)
+            if done is not None:
+                done.append(tier)
+        except TimeoutError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for_waiters(model: str, count: int):
+    for _ in range(200):
+        if get_budget_stats()["waiting_by_model"].get(model, 0) == count:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{count} waiters never queued for {model}")
+
+
+def test_exhausted_model_does_not_block_another_model(budget):
+    budget["llama-70b"] = 1000
+    blocked = _acquire_in_thread("llama-70b")
+    _wait_for_waiters("llama-70b", 1)
+
+    started = time.monotonic()
+    acquire_llm_budget(100, "llama-8b")
+
+    assert time.monotonic() - started < 0.5
+    assert blocked.is_alive()
+    budget["llama-70b"] = 0
+    blocked.join(3)
+    assert not blocked.is_alive()
+
+
+def test_higher_tier_is_served_first_within_a_model(budget):
+    budget["m"] = 50
+    done = []
+    threads = [_acquire_in_thread("m", "free", done)]
+    _wait_for_waiters("m", 1)
+    threads.append(_acquire_in_thread("m", "pro", done))
+    threads.append(_acquire_in_thread("m", "expert", done))
+    _wait_for_waiters("m", 3)
+
+    budget["m"] = 0
+    for thread in threads:
+        thread.join(3)
+    # free was polling first, but higher tiers arriving meanwhile take over the head
+    assert done == ["expert", "pro", "free"]
+
+
+def test_timeout_and_stats(budget, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BUDGET_MAX_WAIT", 0.2)
+    budget["m"] = 1000
+    with pytest.raises(TimeoutError):
+        acquire_llm_budget(100, "m")
+    acquire_llm_budget(100, "other")
+
+    stats = get_budget_stats()
+    assert stats["timeouts"] == 1 and stats["acquired"] == 1
+    assert stats["waiting"] == 0 and stats["waiting_by_model"] == {}
@@ -0,0 +1,154 @@
+"""
+Section repair tests - load_json/validate_section on malformed output and the run_stages re-ask loop
+Run: pytest test_repair.py
+"""
+
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import crew
+from app.services.crew import parse_section, run_stages
+from app.services.llm import cache_key_log
+from app.services.repair import (
+    MIN_VALID_FRACTION, SectionError, get_parse_stats, load_json, validate_section,
+)
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+
+ROI = {"traffic_lift_percentage": "23%", "engagement_boost_percentage": "41%",
+       "estimated_monthly_reach": "5K-10K", "conversion_rate_estimate": "2-3%", "time_to_results": "30-60 days"}
+GAP = {"gap": "No student discounts", "impact": "High", "implementation": "Campus codes"}
+POST = {"title": "Finals fuel", "caption": "Stay awake", "hashtags": ["#coffee"],
+        "image_prompt": "cup on books", "best_time": "8pm"}
+
+
+def _keyword(term: str, **extra) -> dict:
+    return {"term": term, "intent": "Transactional", "difficulty": "Easy",
+            "monthly_searches": "1K", "priority": 5, **extra}
+
+
+# ============================================================================
+# load_json / validate_section
+# ============================================================================
+
+@pytest.mark.parametrize("raw, expected", [
+    ('```json\n{"gap": "a", "impact": "High",}\n```', {"gap": "a", "impact": "High"}),   # trailing comma
+    ("{'gap': 'a', 'impact': 'High'}", {"gap": "a", "impact": "High"}),                  # single quotes
+    ('Final Answer: [{"gap": "a"}, {"gap": "b"', [{"gap": "a"}, {"gap": "b"}]),          # truncated
+])
+def test_load_json_repairs_malformed_output(raw, expected):
+    assert load_json("competitor_gaps", raw) == expected
+
+
+def test_load_json_rejects_output_without_json():
+    with pytest.raises(SectionError) as error:
+        load_json("roi_prediction", "I'm sorry, I can't help with that.")
+    assert error.value.section == "roi_prediction" and "invalid JSON" in error.value.reason
+
+
+def test_validate_section_unwraps_and_coerces():
+    keywords = validate_section("keywords", {"keywords": [_keyword("cold brew", priority="8", extra="kept")]})
+
+    assert keywords[0]["priority"] == 8
+    assert keywords[0]["extra"] == "kept"
+    assert keywords[0]["hashtags"] == []
+
+
+def test_list_keeps_valid_items_while_most_survive():
+    items = [GAP, GAP, {"gap": "missing impact"}]
+    assert len(validate_section("competitor_gaps", items)) == 2
+
+    too_few = [GAP] + [{"gap": "broken"}] * 3
+    assert 1 / len(too_few) < MIN_VALID_FRACTION
+    with pytest.raises(SectionError, match="1/4 items valid"):
+        validate_section("competitor_gaps", too_few)
+
+
+def test_single_object_counts_as_a_one_item_list():
+    assert validate_section("competitor_gaps", GAP) == [GAP]
+    with pytest.raises(SectionError, match="no items"):
+        validate_section("competitor_gaps", "not a list")
+
+
+def test_optional_section_falls_back_to_empty():
+    assert validate_section("sample_posts", [{"title": "only a title"}]) == []
+    assert validate_section("sample_posts", [POST]) == [POST]
+    with pytest.raises(SectionError):
+        validate_section("calendar", [{"week": 9}])
+
+
+def test_object_section_must_validate():
+    assert validate_section("roi_prediction", ROI) == ROI
+    with pytest.raises(SectionError, match="time_to_results"):
+        validate_section("roi_prediction", {k: v for k, v in ROI.items() if k != "time_to_results"})
+
+
+def test_calendar_section_splits_calendar_and_sample_posts():
+    with pytest.raises(SectionError, match="expected an object"):
+        parse_section("calendar", "[]")
+    item = {"week": 1, "day": 2, "topic": "t", "format": "Reel", "caption_hook": "h", "cta": "c"}
+    parsed = parse_section("calendar", json.dumps({"calendar": [item], "sample_posts": [{"broken": True}]}))
+    assert parsed == {"calendar": [item], "sample_posts": []}
+
+
+# ============================================================================
+# run_stages re-ask loop
+# ============================================================================
+
+class FakeTask:
+    """Answers with the next scripted output and logs a fake response-cache key per call"""
+
+    def __init__(self, *answers: str):
+        self.answers = list(answers)
+        self.agent = object()
+        self.context = []
+        self.calls = []
+
+    def execute_sync(self, agent=None, context=None):
+        self.calls.append(context)
+        cache_key_log.get().append(f"call-{len(self.calls)}")
+        return self.answers.pop(0)
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    monkeypatch.setattr(settings, "STAGE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "SECTION_REPAIR_ATTEMPTS", 1)
+    evicted = []
+    monkeypatch.setattr(crew, "evict_cached_responses", lambda keys: evicted.extend(keys))
+    return evicted
+
+
+def test_rejected_answer_is_evicted_and_reasked(stages):
+    task = FakeTask("Sorry, no JSON today", json.dumps(ROI))
+    before = get_parse_stats()["sections"].get("roi_prediction", {}).get("rejected", 0)
+
+    result = run_stages({"roi_prediction": task}, BRIEF)
+
+    assert result == {"roi_prediction": ROI}
+    assert stages == ["call-1"]
+    assert task.calls[0] is None and "was rejected" in task.calls[1]
+    assert get_parse_stats()["sections"]["roi_prediction"]["rejected"] == before + 1
+
+
+def test_repairable_answer_is_not_reasked(stages):
+    task = FakeTask(json.dumps({"competitor_gaps": [GAP, GAP]})[:-2] + ",]")
+
+    result = run_stages({"competitor_gaps": task}, BRIEF)
+
+    assert result == {"competitor_gaps": [GAP, GAP]}
+    assert len(task.calls) == 1 and stages == []
+
+
+def test_section_gives_up_to_demo_data(stages):
+    task = FakeTask('{"keywords": [{"term": "x"}]}', "still not json")
+
+    result = run_stages({"keywords": task}, BRIEF)
+
+    assert result["fallback_sections"] == ["keywords"]
+    assert result["keywords"] == crew.demo_section("keywords", BRIEF)["keywords"]
+    assert stages == ["call-1", "call-2"]
@@ -0,0 +1,90 @@
+"""
+Model routing tests - per-task routes from LLM_ROUTES and when GatewayLLM falls back
+Run: pytest test_routing.py
+"""
+
+import groq
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.breaker import CircuitOpenError
+from app.services.llm import GatewayLLM, resolve_route
+
+ROUTES = {
+    "default": {"model": "groq/big", "temperature": 0.7, "fallback": "groq/small"},
+    "roi_prediction": {"model": "groq/small", "temperature": 0.3, "fallback": "groq/big"},
+    "Audience Intelligence Surgeon": {"temperature": 0.9},
+    "keywords": {"model": "groq/big", "fallback": None},
+}
+REQUEST = httpx.Request("POST", "https://groq.test")
+
+
+@pytest.fixture(autouse=True)
+def routes(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTES", ROUTES)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Models GatewayLLM._complete was called with; `failures` maps a model to the error it raises"""
+    made, failures = [], {}
+
+    def complete(self, model, temperature, messages, stop, label="default", response_format=None):
+        made.append((model, temperature, label))
+        if model in failures:
+            raise failures[model]
+        return f"answer from {model}"
+
+    monkeypatch.setattr(GatewayLLM, "_complete", complete)
+    return made, failures
+
+
+def _call(route: str) -> str:
+    return GatewayLLM(route=route).call([{"role": "user", "content": "hi"}])
+
+
+def test_routes_merge_over_the_default():
+    assert resolve_route("roi_prediction", "ROI Oracle") == ("groq/small", 0.3, "groq/big")
+    # The first configured name wins; an agent role can be routed too
+    assert resolve_route("unrouted task", "Audience Intelligence Surgeon") == ("groq/big", 0.9, "groq/small")
+    assert resolve_route(None, "unknown role") == ("groq/big", 0.7, "groq/small")
+
+
+def test_call_uses_the_routed_model(calls):
+    made, _ = calls
+    assert _call("roi_prediction") == "answer from groq/small"
+    assert made == [("groq/small", 0.3, "roi_prediction")]
+
+
+def test_model_error_falls_back_once(calls):
+    made, failures = calls
+    failures["groq/small"] = groq.NotFoundError(
+        "model_decommissioned", response=httpx.Response(404, request=REQUEST), body=None)
+
+    assert _call("roi_prediction") == "answer from groq/big"
+    assert [model for model, _, _ in made] == ["groq/small", "groq/big"]
+
+
+@pytest.mark.parametrize("error", [
+    TimeoutError("Groq budget wait exceeded 30s"),
+    CircuitOpenError("Groq circuit open and no LLM_FALLBACK_BASE_URL configured"),
+    groq.APIConnectionError(request=REQUEST),
+])
+def test_budget_circuit_and_connection_errors_do_not_fall_back(calls, error):
+    made, failures = calls
+    failures["groq/small"] = error
+
+    with pytest.raises(type(error)):
+        _call("roi_prediction")
+    assert [model for model, _, _ in made] == ["groq/small"]
+
+
+def test_route_without_fallback_raises(calls):
+    made, failures = calls
+    failures["groq/big"] = groq.InternalServerError(
+        "overloaded", response=httpx.Response(503, request=REQUEST), body=None)
+
+    with pytest.raises(groq.InternalServerError):
+        _call("keywords")
+    assert len(made) == 1
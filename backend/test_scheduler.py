@@ -0,0 +1,210 @@
+"""
+Stage scheduler tests - stage_dependencies and run_stages ordering, parallelism, checkpoint resume and deadlines
+Run: pytest test_scheduler.py
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import crew
+from app.services.crew import run_stages, stage_dependencies
+from app.services.llm import CallCancelled, GatewayLLM
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+
+
+class FakeTask:
+    """Answers {"<section>": "<section> answer"}, optionally waiting on `gate` first"""
+
+    def __init__(self, section: str, *upstream: "FakeTask", gate=None):
+        self.section = section
+        self.agent = object()
+        self.context = list(upstream)
+        self.gate = gate
+        self.contexts = []
+
+    def execute_sync(self, agent=None, context=None):
+        self.contexts.append(context)
+        if self.gate:
+            self.gate()
+        return json.dumps(f"{self.section} answer")
+
+
+def _chain(**gates) -> dict:
+    """The real crew's context graph, built from fake tasks"""
+    personas = FakeTask("personas", gate=gates.get("personas"))
+    gaps = FakeTask("competitor_gaps", personas, gate=gates.get("competitor_gaps"))
+    guidance = FakeTask("strategic_guidance", personas, gaps, gate=gates.get("strategic_guidance"))
+    keywords = FakeTask("keywords", personas, gaps, guidance, gate=gates.get("keywords"))
+    calendar = FakeTask("calendar", guidance, keywords, gate=gates.get("calendar"))
+    roi = FakeTask("roi_prediction", calendar, gate=gates.get("roi_prediction"))
+    return {task.section: task for task in (personas, gaps, guidance, keywords, calendar, roi)}
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "STAGE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "CREW_CONTEXT_COMPACTION", False)  # upstream raw output as context
+    monkeypatch.setattr(settings, "CREW_RELAX_OPTIONAL_EDGES", False)
+    monkeypatch.setattr(settings, "CREW_STAGE_CONCURRENCY", 3)
+    monkeypatch.setattr(crew, "parse_section", lambda section, raw: {section: json.loads(raw)})
+    saved = {}
+    monkeypatch.setattr(crew, "load_checkpoint", lambda request_id: {})
+    monkeypatch.setattr(crew, "save_checkpoint", lambda request_id, section, entry: saved.setdefault(section, entry))
+    monkeypatch.setattr(crew, "clear_checkpoint", lambda request_id: saved.clear())
+    return saved
+
+
+def test_dependencies_follow_task_context():
+    tasks = _chain()
+
+    assert stage_dependencies(tasks) == {
+        "personas": [],
+        "competitor_gaps": ["personas"],
+        "strategic_guidance": ["personas", "competitor_gaps"],
+        "keywords": ["personas", "competitor_gaps", "strategic_guidance"],
+        "calendar": ["strategic_guidance", "keywords"],
+        "roi_prediction": ["calendar"],
+    }
+    relaxed = stage_dependencies(tasks, relax_optional=True)
+    assert relaxed["keywords"] == ["personas"] and relaxed["roi_prediction"] == []
+
+
+def test_stages_run_after_their_upstream_with_its_output_as_context():
+    order = []
+    tasks = _chain(**{section: (lambda section=section: order.append(section)) for section in crew.SECTION_ORDER})
+
+    result = run_stages(tasks, BRIEF)
+
+    assert order == crew.SECTION_ORDER
+    assert result == {section: f"{section} answer" for section in crew.SECTION_ORDER}
+    assert tasks["personas"].contexts == [None]
+    assert '"personas answer"' in tasks["competitor_gaps"].contexts[0]
+    assert '"keywords answer"' in tasks["calendar"].contexts[0]
+
+
+def test_independent_stages_run_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "CREW_RELAX_OPTIONAL_EDGES", True)
+    # gaps and keywords only need personas once the optional edges are dropped;
+    # the barrier only opens if both are running at the same time
+    both_running = threading.Barrier(2, timeout=5)
+    tasks = _chain(competitor_gaps=both_running.wait, keywords=both_running.wait)
+
+    result = run_stages(tasks, BRIEF)
+
+    assert set(result) == set(crew.SECTION_ORDER)
+    assert not both_running.broken
+
+
+def test_concurrency_one_runs_stages_one_at_a_time(monkeypatch):
+    monkeypatch.setattr(settings, "CREW_RELAX_OPTIONAL_EDGES", True)
+    monkeypatch.setattr(settings, "CREW_STAGE_CONCURRENCY", 1)
+    active, peak = [], []
+
+    def gate():
+        active.append(1)
+        peak.append(len(active))
+        time.sleep(0.02)
+        active.pop()
+
+    run_stages(_chain(**dict.fromkeys(crew.SECTION_ORDER, gate)), BRIEF)
+
+    assert max(peak) == 1
+
+
+def test_checkpointed_stages_are_not_rerun(scheduler, monkeypatch):
+    checkpoint = {"personas": {"stage_key": "k-personas", "raw": json.dumps({"personas": "from checkpoint"}),
+                               "parsed": {"personas": "from checkpoint"}}}
+    monkeypatch.setattr(crew, "load_checkpoint", lambda request_id: checkpoint if request_id == "job-1" else {})
+    saved_during_run = []
+    monkeypatch.setattr(crew, "save_checkpoint", lambda request_id, section, entry: saved_during_run.append(section))
+    tasks = _chain()
+
+    result = run_stages(tasks, BRIEF, request_id="job-1")
+
+    assert tasks["personas"].contexts == []
+    assert result["personas"] == "from checkpoint"
+    assert "from checkpoint" in tasks["competitor_gaps"].contexts[0]
+    assert saved_during_run == crew.SECTION_ORDER[1:]
+
+
+def test_finished_stages_are_checkpointed_and_cleared_on_success(scheduler):
+    stuck = threading.Event()
+    tasks = _chain(calendar=lambda: stuck.wait(5))
+    try:
+        result = run_stages(tasks, BRIEF, deadline=time.monotonic() + 0.3, request_id="job-2")
+    finally:
+        stuck.set()
+
+    # Timed out: what finished stays checkpointed for the rerun
+    assert set(scheduler) == {"personas", "competitor_gaps", "strategic_guidance", "keywords"}
+    assert result["provisional_sections"] == ["calendar", "roi_prediction"]
+
+    run_stages(_chain(), BRIEF, request_id="job-2")
+    assert scheduler == {}
+
+
+def test_deadline_returns_finished_sections_and_demo_for_the_rest():
+    stuck = threading.Event()
+    tasks = _chain(keywords=lambda: stuck.wait(5))
+    try:
+        result = run_stages(tasks, BRIEF, deadline=time.monotonic() + 0.3)
+    finally:
+        stuck.set()
+
+    assert result["personas"] == "personas answer"
+    assert result["strategic_guidance"] == "strategic_guidance answer"
+    assert result["provisional_sections"] == ["keywords", "calendar", "roi_prediction"]
+    demo = crew.fill_provisional({}, ["keywords"], BRIEF)
+    assert result["keywords"] == demo["keywords"]
+    assert tasks["calendar"].contexts == []
+
+
+def test_stages_left_running_past_the_deadline_stop_calling_the_llm(monkeypatch):
+    completed, outcome = [], []
+    monkeypatch.setattr(GatewayLLM, "_complete", lambda self, model, *args, **kwargs: completed.append(model) or "{}")
+    returned = threading.Event()
+
+    def late_llm_call():
+        returned.wait(5)
+        try:
+            GatewayLLM(route="keywords").call([{"role": "user", "content": "hi"}])
+        except CallCancelled:
+            outcome.append("cancelled")
+
+    result = run_stages(_chain(keywords=late_llm_call), BRIEF, deadline=time.monotonic() + 0.3)
+    returned.set()
+    for _ in range(100):
+        if outcome:
+            break
+        time.sleep(0.02)
+
+    assert result["provisional_sections"] == ["keywords", "calendar", "roi_prediction"]
+    assert outcome == ["cancelled"] and completed == []
+
+
+def test_deadline_with_finish_in_background_reports_a_partial_and_completes():
+    slow = threading.Event()
+    tasks = _chain(roi_prediction=lambda: slow.wait(5))
+    events = []
+
+    def on_section(event):
+        events.append(event)
+        if event[0] == "partial":
+            slow.set()
+
+    result = run_stages(tasks, BRIEF, on_section=on_section, deadline=time.monotonic() + 0.3,
+                        finish_in_background=True)
+
+    partials = [fields for kind, _, fields in events if kind == "partial"]
+    assert len(partials) == 1
+    assert partials[0]["provisional_sections"] == ["roi_prediction"]
+    assert partials[0]["calendar"] == "calendar answer"
+    assert result["roi_prediction"] == "roi_prediction answer"
+    assert "provisional_sections" not in result
@@ -0,0 +1,123 @@
+"""
+Near-duplicate brief tests - canonicalisation, MinHash/LSH and find_near_duplicate against fakeredis
+Run: pytest test_similarity.py   (needs fakeredis)
+"""
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import cache
+from app.services.cache import LocalLRUCache, find_near_duplicate, generate_cache_key, set_cached_strategy
+from app.services.similarity import (
+    canonical_fields, canonicalize_text, estimate_similarity, lsh_bands, minhash_signature, normalize_text,
+)
+
+
+def _brief(goal="Sell coffee subscriptions on Instagram", audience="college students aged 18-24", **fields):
+    return StrategyInput(goal=goal, audience=audience, **{
+        "industry": "F&B", "platform": "Instagram", "contentType": "Reels", **fields})
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "REDIS_ENABLED", True)
+    # Every lookup must go through Redis, not this process's copy
+    monkeypatch.setattr(cache, "local_cache", LocalLRUCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL))
+    monkeypatch.setattr(settings, "NEAR_DUP_ENABLED", True)
+    monkeypatch.setattr(settings, "NEAR_DUP_THRESHOLD", 0.85)
+    return client
+
+
+def _store(brief: StrategyInput, mode: str = "full") -> str:
+    key = generate_cache_key(brief, mode)
+    set_cached_strategy(key, {"goal": brief.goal}, strategy_input=brief, mode=mode)
+    cache.local_cache.delete(key)
+    return key
+
+
+def test_canonicalisation_folds_case_punctuation_and_plurals():
+    assert canonicalize_text("  Sell COFFEE subscriptions,  on Instagram!! ") == "sell coffee subscription on instagram"
+    assert canonicalize_text("Stories for companies") == "story for company"
+    assert canonicalize_text("business class") == "business class"  # "ss" is not a plural
+
+
+def test_exact_key_only_folds_case_and_whitespace():
+    assert normalize_text("  Sell COFFEE\tsubscriptions,  on Instagram!! ") == "sell coffee subscriptions, on instagram!!"
+    assert generate_cache_key(_brief()) == generate_cache_key(_brief(goal="  sell coffee SUBSCRIPTIONS on instagram"))
+    # Punctuation and plurals can change the meaning, so they get their own entry
+    assert generate_cache_key(_brief()) != generate_cache_key(_brief(goal="sell coffee subscription on instagram!"))
+    assert generate_cache_key(_brief(goal="Hire C++ developers")) != generate_cache_key(_brief(goal="Hire C# developers"))
+    assert generate_cache_key(_brief(goal="Grow to $5k MRR")) != generate_cache_key(_brief(goal="Grow to 5k MRR"))
+
+
+def test_signature_similarity_tracks_the_text():
+    base = minhash_signature(canonical_fields(_brief()))
+    near = minhash_signature(canonical_fields(_brief(audience="college students aged 18-25")))
+    other = minhash_signature(canonical_fields(_brief(goal="Hire nurses for a rural hospital",
+                                                      audience="registered nurses")))
+
+    assert len(base) == settings.MINHASH_PERMUTATIONS
+    assert estimate_similarity(base, near) >= settings.NEAR_DUP_THRESHOLD
+    assert estimate_similarity(base, other) < 0.3
+    assert set(lsh_bands(base)) & set(lsh_bands(near))
+    assert estimate_similarity(base, []) == 0.0
+
+
+def test_near_identical_brief_is_found(redis):
+    key = _store(_brief())
+
+    entry = find_near_duplicate(_brief(audience="college students aged 18-25"))
+
+    assert entry["cache_key"] == key
+    assert entry["strategy"] == {"goal": _brief().goal}
+    assert entry["similarity"] >= settings.NEAR_DUP_THRESHOLD
+
+
+def test_punctuation_variant_is_served_as_a_near_duplicate(redis):
+    key = _store(_brief())
+
+    entry = find_near_duplicate(_brief(goal="sell coffee subscription on instagram!"))
+
+    assert entry["cache_key"] == key and entry["similarity"] == 1.0
+
+
+def test_best_match_wins(redis):
+    _store(_brief(audience="college students aged 18-24 who love lattes"))
+    exact = _store(_brief())
+
+    assert find_near_duplicate(_brief(goal="Sell coffee subscriptions on Instagram.."))["cache_key"] == exact
+
+
+def test_different_brief_or_scope_is_not_matched(redis):
+    _store(_brief())
+
+    assert find_near_duplicate(_brief(goal="Hire nurses for a rural hospital", audience="registered nurses")) is None
+    # Same text, but industry/platform/contentType/experience and mode must match exactly
+    assert find_near_duplicate(_brief(platform="LinkedIn")) is None
+    assert find_near_duplicate(_brief(experience="expert")) is None
+    assert find_near_duplicate(_brief(), mode="lite") is None
+
+
+def test_stale_or_expired_entries_are_skipped(redis, monkeypatch):
+    key = _store(_brief())
+    monkeypatch.setattr(settings, "STRATEGY_CACHE_SOFT_TTL", -1)
+    assert find_near_duplicate(_brief()) is None
+
+    monkeypatch.setattr(settings, "STRATEGY_CACHE_SOFT_TTL", 3600)
+    redis.delete(f"strategy:{key}")
+    cache.local_cache.delete(key)  # warmed by the lookup above
+    assert find_near_duplicate(_brief()) is None
+
+
+def test_disabled_or_without_redis_returns_none(redis, monkeypatch):
+    _store(_brief())
+    monkeypatch.setattr(settings, "NEAR_DUP_ENABLED", False)
+    assert find_near_duplicate(_brief()) is None
+    monkeypatch.setattr(settings, "NEAR_DUP_ENABLED", True)
+    monkeypatch.setattr(cache, "REDIS_ENABLED", False)
+    assert find_near_duplicate(_brief()) is None
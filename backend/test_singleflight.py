@@ -0,0 +1,154 @@
+"""
+Single-flight tests - coalescing, leader failure/cancellation and followers of a deadline partial
+Run: pytest test_singleflight.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.models.schemas import StrategyInput
+from app.routers import strategy
+from app.services import singleflight
+from app.services.singleflight import run_once
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    monkeypatch.setattr(singleflight, "REDIS_ENABLED", False)
+    monkeypatch.setattr(singleflight, "_inflight", {})
+
+
+class Producer:
+    """produce() for run_once: counts runs and finishes when released"""
+
+    def __init__(self, result="strategy", error: Exception = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def _never_shared():
+    return None
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        produce = Producer()
+        callers = [asyncio.create_task(run_once("k", produce, _never_shared)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        produce.release.set()
+        return produce.runs, await asyncio.gather(*callers)
+
+    runs, results = asyncio.run(scenario())
+    assert runs == 1
+    assert results == [("strategy", False), ("strategy", True), ("strategy", True)]
+    assert singleflight._inflight == {}
+
+
+def test_leader_failure_reaches_followers_and_the_next_call_runs_again():
+    async def scenario():
+        failing = Producer(error=ValueError("groq down"))
+        callers = [asyncio.create_task(run_once("k", failing, _never_shared)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        failing.release.set()
+        outcomes = await asyncio.gather(*callers, return_exceptions=True)
+
+        retry = Producer()
+        retry.release.set()
+        return outcomes, await run_once("k", retry, _never_shared)
+
+    outcomes, retried = asyncio.run(scenario())
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert retried == ("strategy", False)
+
+
+def test_cancelled_leader_does_not_fail_its_followers():
+    async def scenario():
+        produce = Producer()
+        leader = asyncio.create_task(run_once("k", produce, _never_shared))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(run_once("k", produce, _never_shared))
+        await asyncio.sleep(0.01)
+        leader.cancel()  # e.g. the leader's client disconnected
+        await asyncio.sleep(0.01)
+        produce.release.set()
+        return produce.runs, leader, await follower
+
+    runs, leader, followed = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert followed == ("strategy", True)
+    assert runs == 1
+
+
+def test_follower_takes_over_when_the_shared_run_is_cancelled():
+    async def scenario():
+        produce = Producer()
+        leader = asyncio.create_task(run_once("k", produce, _never_shared))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(run_once("k", produce, _never_shared))
+        await asyncio.sleep(0.01)
+        singleflight._inflight["k"].cancel()  # the producer itself is gone
+        await asyncio.sleep(0.01)
+        produce.release.set()
+        return produce.runs, await asyncio.gather(leader, return_exceptions=True), await follower
+
+    runs, (leader_outcome,), followed = asyncio.run(scenario())
+    assert isinstance(leader_outcome, asyncio.CancelledError)
+    assert followed == ("strategy", False)  # ran it itself
+    assert runs == 2
+
+
+def test_follower_of_a_deadline_partial_is_upgraded(monkeypatch):
+    partial = {"personas": [], "provisional_sections": ["roi_prediction"]}
+    final = {"personas": [], "roi_prediction": {}}
+    updates, upgraded_leader = [], []
+    crew_done = asyncio.Event()
+
+    async def fake_executor(fn, strategy_input, report, *args, **kwargs):
+        report(("partial", None, {"strategy": partial, "message": "⏱️ Deadline reached"}))
+        await crew_done.wait()
+        return final, "Strategy generated successfully"
+
+    async def leader_saved(strategy_dict, message, generation_time):
+        upgraded_leader.append(strategy_dict)
+
+    monkeypatch.setattr(strategy, "run_in_crew_executor", fake_executor)
+    monkeypatch.setattr(strategy, "set_cached_strategy", lambda *args, **kwargs: None)
+    monkeypatch.setattr(strategy, "update_strategy", lambda strategy_id, strategy_dict, *args, **kwargs:
+                        updates.append((strategy_id, strategy_dict)))
+    monkeypatch.setattr(strategy, "_pending_upgrades", {})
+
+    async def scenario():
+        def produce():
+            return strategy._generate_and_cache(BRIEF, "k", "free", "u1", "full", time.time() + 1, leader_saved)
+
+        leader = asyncio.create_task(run_once("k", produce, _never_shared))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(run_once("k", produce, _never_shared))
+        (leader_dict, _, _), _ = await leader
+        (follower_dict, _, _), coalesced = await follower
+        assert leader_dict is partial and follower_dict is partial and coalesced
+
+        upgrade = strategy._leader_upgrade("k", follower_dict, coalesced)
+        assert upgrade is not None
+        assert strategy._leader_upgrade("k", final, coalesced) is None  # complete results need no upgrade
+        following = asyncio.create_task(strategy._follow_upgrade(upgrade, "follower-id"))
+        crew_done.set()
+        await following
+
+    asyncio.run(scenario())
+    assert updates == [("follower-id", final)]
+    assert upgraded_leader == [final]
@@ -0,0 +1,121 @@
+"""
+Stage cache tests - stage_cache_key inputs and run_stages reuse/regeneration against fakeredis
+Run: pytest test_stage_cache.py   (needs fakeredis)
+"""
+
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.services import cache, crew
+from app.services.cache import LocalLRUCache
+from app.services.crew import run_stages, stage_cache_key
+from app.services.repair import SectionError
+from app.services.similarity import exact_fields
+
+
+def _brief(**fields) -> StrategyInput:
+    return StrategyInput(**{"goal": "Sell coffee on Instagram", "audience": "college students",
+                            "industry": "F&B", "platform": "Instagram", **fields})
+
+
+class FakeTask:
+    def __init__(self, section: str, *upstream: "FakeTask"):
+        self.section = section
+        self.agent = object()
+        self.context = list(upstream)
+        self.runs = 0
+
+    def execute_sync(self, agent=None, context=None):
+        self.runs += 1
+        return json.dumps(f"{self.section} answer {self.runs}")
+
+
+def _tasks() -> dict:
+    personas = FakeTask("personas")
+    gaps = FakeTask("competitor_gaps", personas)
+    guidance = FakeTask("strategic_guidance", personas, gaps)
+    return {task.section: task for task in (personas, gaps, guidance)}
+
+
+def _parse(section: str, raw: str) -> dict:
+    value = json.loads(raw)
+    if isinstance(value, dict) and section in value:
+        value = value[section]  # stored form: the validated {section: ...}
+    if value == "no longer valid":
+        raise SectionError(section, "schema changed")
+    return {section: value}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "REDIS_ENABLED", True)
+    monkeypatch.setattr(cache, "local_cache", LocalLRUCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL))
+    monkeypatch.setattr(settings, "STAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "CREW_CONTEXT_COMPACTION", False)
+    monkeypatch.setattr(crew, "parse_section", _parse)
+    return client
+
+
+def test_stage_key_depends_only_on_the_inputs_a_stage_reads():
+    fields = exact_fields(_brief())
+    personas = stage_cache_key("personas", fields, [])
+
+    # personas never read the goal; guidance does
+    assert stage_cache_key("personas", exact_fields(_brief(goal="Sell tea on TikTok")), []) == personas
+    assert stage_cache_key("personas", exact_fields(_brief(audience="nurses")), []) != personas
+    assert (stage_cache_key("strategic_guidance", exact_fields(_brief(goal="Sell tea")), [personas])
+            != stage_cache_key("strategic_guidance", fields, [personas]))
+    # A different upstream answer means a different downstream key
+    assert stage_cache_key("competitor_gaps", fields, ["a"]) != stage_cache_key("competitor_gaps", fields, ["b"])
+
+
+def test_stage_key_changes_with_the_version_and_the_routed_model(monkeypatch):
+    fields = exact_fields(_brief())
+    key = stage_cache_key("roi_prediction", fields, [])
+
+    monkeypatch.setattr(settings, "LLM_ROUTES", {**settings.LLM_ROUTES, "roi_prediction": {"model": "groq/other"}})
+    assert stage_cache_key("roi_prediction", fields, []) != key
+    monkeypatch.undo()
+    monkeypatch.setattr(crew, "STAGE_CACHE_VERSION", "bumped")
+    assert stage_cache_key("roi_prediction", fields, []) != key
+
+
+def test_changed_goal_reuses_upstream_stages(redis):
+    first = _tasks()
+    run_stages(first, _brief())
+    assert [task.runs for task in first.values()] == [1, 1, 1]
+
+    again = _tasks()
+    result = run_stages(again, _brief(goal="Sell tea on Instagram"))
+
+    assert [task.runs for task in again.values()] == [0, 0, 1]
+    assert result["personas"] == "personas answer 1"
+    assert result["strategic_guidance"] == "strategic_guidance answer 1"  # fresh FakeTask, regenerated
+    assert redis.ttl(f"stage:{stage_cache_key('personas', exact_fields(_brief()), [])}") > 0
+
+
+def test_cached_output_that_no_longer_validates_is_regenerated(redis):
+    key = stage_cache_key("personas", exact_fields(_brief()), [])
+    redis.set(f"stage:{key}", json.dumps({"personas": "no longer valid"}))
+    tasks = _tasks()
+
+    result = run_stages(tasks, _brief())
+
+    assert tasks["personas"].runs == 1
+    assert result["personas"] == "personas answer 1"
+    assert json.loads(redis.get(f"stage:{key}")) == {"personas": "personas answer 1"}
+
+
+def test_disabled_stage_cache_always_runs(redis, monkeypatch):
+    run_stages(_tasks(), _brief())
+    monkeypatch.setattr(settings, "STAGE_CACHE_ENABLED", False)
+    tasks = _tasks()
+    run_stages(tasks, _brief())
+    assert [task.runs for task in tasks.values()] == [1, 1, 1]
@@ -0,0 +1,132 @@
+"""
+Stale-while-revalidate tests - soft/hard TTLs, background refresh and its cooldown against fakeredis
+Run: pytest test_swr.py   (needs fakeredis)
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.models.schemas import StrategyInput
+from app.routers import strategy
+from app.services import cache, singleflight
+from app.services.cache import LocalLRUCache, generate_cache_key, get_cache_entry, get_cached_strategy
+
+BRIEF = StrategyInput(goal="Sell coffee on Instagram", audience="college students",
+                      industry="F&B", platform="Instagram")
+KEY = generate_cache_key(BRIEF, "full")
+USER = {"id": "u1", "tier": "free"}
+OLD = {"personas": ["from last month"]}
+NEW = {"personas": ["regenerated"]}
+
+
+@pytest.fixture
+def crew(monkeypatch):
+    """Fake crew executor: `crew["runs"]` counts generations, `crew["error"]` makes them fail"""
+    state = {"runs": 0, "error": None, "release": None}
+
+    async def executor(fn, strategy_input, *args, **kwargs):
+        state["runs"] += 1
+        if state["release"]:
+            await state["release"].wait()
+        if state["error"]:
+            raise state["error"]
+        return NEW, "Strategy generated successfully"
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "redis_client", client)
+    monkeypatch.setattr(cache, "REDIS_ENABLED", True)
+    monkeypatch.setattr(cache, "local_cache", LocalLRUCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL))
+    monkeypatch.setattr(singleflight, "REDIS_ENABLED", False)
+    monkeypatch.setattr(singleflight, "_inflight", {})
+    monkeypatch.setattr(strategy, "check_rate_limit", lambda user_id, tier: {"exceeded": False})
+    monkeypatch.setattr(strategy, "run_in_crew_executor", executor)
+    state["redis"] = client
+    return state
+
+
+def _cache(strategy_dict: dict, age: float, redis):
+    """An entry written `age` seconds ago, as set_cached_strategy would have"""
+    envelope = {"strategy": strategy_dict, "cached_at": time.time() - age}
+    redis.setex(f"strategy:{KEY}", settings.STRATEGY_CACHE_HARD_TTL, json.dumps(envelope))
+
+
+def _request():
+    return strategy.generate_strategy(BRIEF, mode="full", background=False, speculative=False,
+                                      x_request_deadline=None, current_user=USER)
+
+
+async def _settle():
+    await asyncio.gather(*list(strategy._background_tasks))
+
+
+def test_fresh_entry_is_served_without_a_refresh(crew):
+    _cache(OLD, 60, crew["redis"])
+
+    response = asyncio.run(_request())
+
+    assert response["strategy"] == OLD
+    assert (response["cached"], response["stale"], response["revalidating"]) == (True, False, False)
+    assert crew["runs"] == 0
+
+
+def test_stale_entry_is_served_and_refreshed_once(crew):
+    _cache(OLD, settings.STRATEGY_CACHE_SOFT_TTL + 60, crew["redis"])
+
+    async def scenario():
+        crew["release"] = asyncio.Event()
+        first = await _request()
+        second = await _request()  # still stale while the refresh runs
+        crew["release"].set()
+        await _settle()
+        return first, second, await _request()
+
+    first, second, refreshed = asyncio.run(scenario())
+
+    assert first["strategy"] == second["strategy"] == OLD
+    assert (first["stale"], first["revalidating"]) == (True, True)
+    assert (second["stale"], second["revalidating"]) == (True, False)
+    assert crew["runs"] == 1
+    assert (refreshed["strategy"], refreshed["stale"]) == (NEW, False)
+
+
+def test_failed_refresh_keeps_serving_stale_until_the_cooldown_ends(crew):
+    _cache(OLD, settings.STRATEGY_CACHE_SOFT_TTL + 60, crew["redis"])
+    crew["error"] = RuntimeError("groq down")
+
+    async def scenario():
+        first = await _request()
+        await _settle()
+        return first, await _request()
+
+    first, again = asyncio.run(scenario())
+
+    assert first["revalidating"] and not again["revalidating"]
+    assert again["strategy"] == OLD
+    assert crew["runs"] == 1
+    assert 0 < crew["redis"].ttl(f"revalidate:{KEY}") <= settings.STRATEGY_REVALIDATE_COOLDOWN
+
+
+def test_past_the_hard_ttl_is_a_miss(crew):
+    _cache(OLD, settings.STRATEGY_CACHE_SOFT_TTL + 60, crew["redis"])
+    assert get_cache_entry(KEY)["stale"]
+    assert get_cached_strategy(KEY) is None  # stale counts as a miss where freshness is required
+
+    crew["redis"].delete(f"strategy:{KEY}")  # the Redis expiry
+    cache.local_cache.delete(KEY)
+    assert get_cache_entry(KEY) is None
+
+
+def test_local_copy_expires_with_the_redis_entry(crew):
+    _cache(OLD, settings.STRATEGY_CACHE_HARD_TTL - 0.2, crew["redis"])
+    assert get_cache_entry(KEY)["strategy"] == OLD  # now copied to the local tier
+
+    crew["redis"].delete(f"strategy:{KEY}")
+    time.sleep(0.3)
+
+    assert get_cache_entry(KEY) is None